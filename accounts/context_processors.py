@@ -0,0 +1,15 @@
+# accounts/context_processors.py
+from django.utils.functional import SimpleLazyObject
+
+from .status_summary import summary
+
+
+def contract_status(request):
+    """
+    상단 메뉴 배지용 상태별 건수 (status_counts.draft / submitted / processing / completed)
+    - 템플릿에서 실제로 읽을 때만 조회 (비로그인/미사용 화면은 쿼리 없음)
+    """
+    user = getattr(request, "user", None)
+    if user is None or not user.is_authenticated:
+        return {}
+    return {"status_counts": SimpleLazyObject(lambda: summary(user))}
@@ -0,0 +1,82 @@
+# accounts/kpis.py
+"""
+대시보드 KPI 스냅샷 (상태별 건수 + 이번 달 건수/매출/매입/마진율)
+
+계약 집계는 조건부 집계(COUNT/SUM ... FILTER) 쿼리 1번으로 구하고 (금액은 Contract 합계 칼럼),
+결과를 캐시에 settings.DASHBOARD_KPI_MAX_STALENESS 초 동안 보관한다.
+계약 저장/삭제(상태 변경 포함)·품목 저장·매출처 추가/삭제 시 invalidate() 로 바로 지움.
+locmem 처럼 워커마다 캐시가 따로면 지우는 것은 그 워커 것뿐이고,
+다른 워커는 길어야 DASHBOARD_KPI_MAX_STALENESS 초 뒤에 다시 계산한다.
+"""
+import datetime
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, DecimalField, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from expenses.models import Contract
+from partners.models import SalesPartner
+
+from . import status_summary
+
+CACHE_KEY = "dashboard:kpis"
+CENT = Decimal("0.01")
+_AMOUNT = DecimalField(max_digits=18, decimal_places=2)
+
+
+def _month_range(today):
+    """이번 달 [1일 00:00, 다음달 1일 00:00) — 현재 타임존 기준 aware datetime"""
+    start = today.replace(day=1)
+    end = (start + datetime.timedelta(days=32)).replace(day=1)
+    return (
+        timezone.make_aware(datetime.datetime.combine(start, datetime.time.min)),
+        timezone.make_aware(datetime.datetime.combine(end, datetime.time.min)),
+    )
+
+
+def compute(today=None):
+    """DB 에서 바로 계산 → {"stats": {...}, "monthly_kpis": {...}}"""
+    today = today or timezone.localdate()
+    start, end = _month_range(today)
+    month = Q(created_at__gte=start, created_at__lt=end)
+
+    row = Contract.objects.aggregate(
+        **status_summary.aggregates(),
+        contract_count=Count("id", filter=month),
+        sales_total=Coalesce(Sum("sell_sum", filter=month), Value(Decimal("0"), output_field=_AMOUNT)),
+        buy_total=Coalesce(Sum("buy_sum", filter=month), Value(Decimal("0"), output_field=_AMOUNT)),
+    )
+
+    sales_total = Decimal(row["sales_total"])
+    buy_total = Decimal(row["buy_total"])
+    margin_rate = float(((sales_total - buy_total) / sales_total * 100) if sales_total else 0)
+
+    return {
+        "stats": {
+            "temp": row["draft"],
+            "request_count": row["submitted"],
+            "in_progress": row["processing"],
+            "done": row["completed"],
+            "accounts": SalesPartner.objects.count(),
+        },
+        "monthly_kpis": {
+            "sales_total": sales_total.quantize(CENT, rounding=ROUND_HALF_UP),
+            "buy_total": buy_total.quantize(CENT, rounding=ROUND_HALF_UP),
+            "margin_rate": round(margin_rate, 2),
+            "contract_count": row["contract_count"],
+        },
+    }
+
+
+def snapshot():
+    """캐시된 스냅샷 (없거나 만료되면 다시 계산). 월이 바뀌면 키가 달라져 자동으로 새로 계산"""
+    today = timezone.localdate()
+    key = f"{CACHE_KEY}:{today:%Y-%m}"
+    return cache.get_or_set(key, lambda: compute(today), getattr(settings, "DASHBOARD_KPI_MAX_STALENESS", 300))
+
+
+def invalidate():
+    cache.delete(f"{CACHE_KEY}:{timezone.localdate():%Y-%m}")
@@ -0,0 +1,22 @@
+# accounts/middleware.py
+from django.utils.functional import SimpleLazyObject
+
+from .principal import get_principal
+
+
+class PrincipalMiddleware:
+    """
+    request.principal: 요청 단위 권한 정보 (accounts.principal)
+    - 로그인 사용자는 요청 시작 시 쿼리 1번으로 프로필/그룹을 읽어 두고, 이후 헬퍼/템플릿은 같은 값을 재사용
+      (템플릿 메뉴가 request.user.profile.access 를 바로 읽으므로 지연 로딩하면 쿼리가 따로 나감)
+    - AuthenticationMiddleware 뒤에 둘 것
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.user.is_authenticated:
+            get_principal(request.user)
+        request.principal = SimpleLazyObject(lambda: get_principal(request.user))
+        return self.get_response(request)
@@ -0,0 +1,103 @@
+# accounts/principal.py
+"""
+요청 단위 권한 정보 (프로필 access + 그룹명)
+
+로그인 사용자의 프로필과 그룹명을 쿼리 1번(User ⟕ Profile ⟕ groups)으로 읽어
+user 객체에 붙여 두고, 권한 헬퍼(_get_access, _can_approve, _has_contract_permission 등)는 모두 여기를 본다.
+읽은 프로필은 user.profile 캐시에도 넣어 두므로 템플릿의 request.user.profile.access 도 추가 쿼리가 없다.
+
+    p = get_principal(request.user)   # 또는 request.principal (PrincipalMiddleware)
+    if p.can_approve: ...
+
+세션 캐시는 두지 않음: 다른 관리자가 edit_account 로 바꾼 권한이 바로 반영돼야 하고,
+요청당 인덱스 조회 1번이라 세션에 보관해서 아낄 비용이 크지 않다.
+"""
+from django.contrib.auth import get_user_model
+
+from .models import Profile
+
+MANAGER_MODES = ("사장모드", "실장모드", "관리자모드")
+
+
+class Principal:
+    def __init__(self, user, profile=None, groups=()):
+        self.user = user
+        self.profile = profile
+        self.groups = frozenset(groups)
+
+    @classmethod
+    def load(cls, user):
+        if not getattr(user, "is_authenticated", False):
+            return cls(user)
+
+        rows = list(
+            get_user_model().objects.filter(pk=user.pk)
+            .values_list("profile__id", "profile__role", "profile__department", "profile__access", "groups__name")
+        )
+        profile = None
+        if rows and rows[0][0] is not None:
+            pid, role, department, access = rows[0][:4]
+            profile = Profile(id=pid, user_id=user.pk, role=role, department=department, access=access)
+        # user.profile 캐시 채움 (프로필이 없으면 None → 접근 시 쿼리 없이 DoesNotExist)
+        Profile.user.field.remote_field.set_cached_value(user, profile)
+        return cls(user, profile, (r[4] for r in rows if r[4]))
+
+    # ---- 판정 ----
+    @property
+    def is_superuser(self):
+        return bool(getattr(self.user, "is_superuser", False))
+
+    @property
+    def access(self) -> str:
+        """슈퍼유저는 'SUPER', 비로그인/프로필 없음은 ''"""
+        if not getattr(self.user, "is_authenticated", False):
+            return ""
+        if self.is_superuser:
+            return "SUPER"
+        return ((self.profile.access if self.profile else "") or "").strip()
+
+    @property
+    def is_employee(self):
+        return (not self.is_superuser) and self.access == "직원모드"
+
+    @property
+    def is_manager(self):
+        """사장/실장/관리자 모드 (계약 수정·삭제, 엑셀 내보내기)"""
+        return self.is_superuser or self.access in MANAGER_MODES
+
+    @property
+    def can_manage_accounts(self):
+        if not getattr(self.user, "is_authenticated", False):
+            return False
+        return self.is_superuser or self.access in ("관리자모드", "사장모드")
+
+    @property
+    def can_approve(self):
+        return self.is_superuser or self.access in ("실장모드", "사장모드")
+
+    @property
+    def can_complete(self):
+        return self.is_superuser or self.access in ("사장모드",)
+
+    @property
+    def is_approver(self):
+        """approver 그룹 또는 superuser (기존 보고서 삭제/승인)"""
+        return self.is_superuser or "approver" in self.groups
+
+    def can_edit_contract(self, contract=None):
+        """사장/실장/관리자 모드 또는 작성자"""
+        if self.is_manager:
+            return True
+        return contract is not None and self.user.id == getattr(contract, "writer_id", None)
+
+
+def get_principal(user) -> Principal:
+    """user 객체에 한 번만 만들어 붙여 두고 재사용"""
+    p = getattr(user, "_principal", None)
+    if p is None:
+        p = Principal.load(user)
+        try:
+            user._principal = p
+        except AttributeError:
+            pass
+    return p
@@ -0,0 +1,49 @@
+# accounts/status_summary.py
+"""
+계약 상태별 건수 (임시저장/결재요청/결재처리중/결재완료)
+
+COUNT(*) FILTER (WHERE status=...) 조건부 집계 쿼리 1번으로 네 상태를 한꺼번에 센다.
+직원모드 사용자는 본인이 작성한 계약(writer_id)만 센다 → (status, writer) 인덱스 사용.
+
+결과는 계약 목록 캐시 버전(expenses.pagination.VERSION_KEY)을 키에 넣어 캐시하므로
+계약이 저장/삭제되면(상태 변경 포함) 다음 요청에서 바로 다시 센다.
+
+    counts = summary(request.user)       # {"draft": 3, "submitted": 1, ..., "total": 9}
+    템플릿: {{ status_counts.draft }}     # accounts.context_processors.contract_status
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from expenses.models import Contract
+from expenses.pagination import VERSION_KEY
+
+from .principal import get_principal
+
+STATUSES = [s for s, _ in Contract.STATUS_CHOICES]
+
+
+def aggregates():
+    """상태별 Count(filter=) 식 (다른 집계 쿼리에 섞어 쓸 수 있게)"""
+    return {s: Count("id", filter=Q(status=s)) for s in STATUSES}
+
+
+def compute(writer_id=None):
+    qs = Contract.objects.order_by()
+    if writer_id is not None:
+        qs = qs.filter(writer_id=writer_id)
+    row = qs.aggregate(**aggregates())
+    row["total"] = sum(row[s] for s in STATUSES)
+    return row
+
+
+def summary(user, mine=False):
+    """
+    user 기준 상태별 건수
+    - 직원모드(또는 mine=True)는 본인 작성 계약만
+    """
+    scoped = mine or get_principal(user).is_employee
+    writer_id = user.pk if scoped else None
+    version = cache.get(VERSION_KEY, 0)
+    key = f"contracts:status:{version}:{writer_id or 'all'}"
+    return cache.get_or_set(key, lambda: compute(writer_id), getattr(settings, "CONTRACT_LIST_CACHE_SECONDS", 300))
@@ -1,3 +1,86 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from expenses.items import save_items
+from expenses.models import Contract
+
+from . import kpis
+
+
+def item_row(sell, buy):
+    return {
+        "name": "품목", "qty": Decimal("1"), "spec": "", "vendor": "매입처", "vat_mode": "separate",
+        "sell_unit": Decimal(sell), "sell_total": Decimal(sell),
+        "buy_unit": Decimal(buy), "buy_total": Decimal(buy),
+    }
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                                       "LOCATION": "accounts-tests"}})
+class DashboardKpiCacheTests(TestCase):
+    """대시보드 KPI: locmem 에서도 캐시하고, 계약/품목 저장 시 이 프로세스의 캐시를 지움"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser("admin", "admin@example.com", "pw")
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def load(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/accounts/dashboard/")
+        self.assertEqual(response.status_code, 200)
+        aggregates = [q["sql"] for q in ctx.captured_queries if '"sell_sum"' in q["sql"]]
+        return response.context["monthly_kpis"], len(aggregates)
+
+    def save(self, contract, rows):
+        with self.captureOnCommitCallbacks(execute=True):
+            save_items(contract, rows)
+
+    def test_second_load_uses_cache(self):
+        _kpis, first = self.load()
+        _kpis, second = self.load()
+        self.assertEqual(first, 1)
+        self.assertEqual(second, 0)
+
+    @override_settings(DASHBOARD_KPI_MAX_STALENESS=123)
+    def test_timeout_is_max_staleness(self):
+        with mock.patch.object(kpis.cache, "get_or_set", wraps=kpis.cache.get_or_set) as get_or_set:
+            kpis.snapshot()
+        self.assertEqual(get_or_set.call_args.args[2], 123)
+
+    def test_contract_save_invalidates(self):
+        self.load()
+        with self.captureOnCommitCallbacks(execute=True):
+            contract = Contract.objects.create(writer=self.admin, customer_company="매출처")
+        monthly, aggregates = self.load()
+        self.assertEqual(aggregates, 1)
+        self.assertEqual(monthly["contract_count"], 1)
+
+        self.save(contract, [item_row(1000, 600)])
+        monthly, aggregates = self.load()
+        self.assertEqual(aggregates, 1)
+        self.assertEqual(monthly["sales_total"], Decimal("1000.00"))
+
+    def test_item_edit_and_delete_invalidate(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            contract = Contract.objects.create(writer=self.admin, customer_company="매출처")
+        self.save(contract, [item_row(1000, 600), item_row(500, 100)])
+        self.assertEqual(self.load()[0]["sales_total"], Decimal("1500.00"))
+
+        self.save(contract, [item_row(2000, 600), item_row(500, 100)])
+        self.assertEqual(self.load()[0]["sales_total"], Decimal("2500.00"))
 
-# Create your tests here.
+        self.save(contract, [item_row(2000, 600)])
+        monthly, aggregates = self.load()
+        self.assertEqual(aggregates, 1)
+        self.assertEqual(monthly["sales_total"], Decimal("2000.00"))
+        self.assertEqual(monthly["buy_total"], Decimal("600.00"))
@@ -23,6 +23,8 @@ urlpatterns = [
 
     # 결재완료 목록
     path("contracts/approved/", views.contract_approved_list, name="contract_approved"),
+    # 상태별 건수 (JSON)
+    path("contracts/status-summary/", views.contract_status_summary, name="contract_status_summary"),
 
     # --- 계약 단건 액션/편집 ---
     path("contracts/<int:pk>/edit/", views.contract_edit, name="contract_edit"),
@@ -11,17 +11,21 @@ from django.core.paginator import Paginator
 from django.db import IntegrityError, transaction
 from django.db.models import Q, Sum, Value, DecimalField, F
 from django.db.models.functions import Coalesce
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.utils import timezone
 from django.views.decorators.http import require_POST
 from django.contrib.auth import update_session_auth_hash
 from django.contrib.auth.forms import PasswordChangeForm
 
-# 대시보드 KPI 집계에 사용
-from expenses.models import ContractItem
+from expenses.pagination import KeysetPaginator
+from expenses.search import filter_contracts
 
 from .forms import ProfileEditForm, UserEditForm
+from .kpis import snapshot
 from .models import Profile
+from .principal import get_principal
+from .status_summary import summary as status_summary
 
 # 외부 앱 모델들(없을 수도 있으니 안전하게)
 try:
@@ -53,18 +57,11 @@ except Exception:
 # 유틸/권한 헬퍼
 # ---------------------
 def _get_access(user) -> str:
-    if not getattr(user, "is_authenticated", False):
-        return ""
-    if user.is_superuser:
-        return "SUPER"
-    try:
-        return getattr(getattr(user, "profile", None), "access", "") or ""
-    except Exception:
-        return ""
+    return get_principal(user).access
 
 
 def _is_employee(user) -> bool:
-    return (not user.is_superuser) and _get_access(user) == "직원모드"
+    return get_principal(user).is_employee
 
 
 def _redirect_by_status(status: str) -> str:
@@ -89,18 +86,12 @@ def _pagination_block(page_obj, paginator, block_size=10):
         "prev_block": prev_block,
         "next_block": next_block,
         "num_pages": num_pages,
+        "page_nums": range(start_page, end_page + 1),
     }
 
 def can_manage_accounts(user):
     """'관리자모드' 또는 '사장모드'만 허용 (슈퍼유저는 항상 허용)"""
-    if not user.is_authenticated:
-        return False
-    if user.is_superuser:
-        return True
-    try:
-        return getattr(user, "profile", None) and user.profile.access in ("관리자모드", "사장모드")
-    except Profile.DoesNotExist:
-        return False
+    return get_principal(user).can_manage_accounts
 
 
 def _to_decimal(v, default="0"):
@@ -115,8 +106,9 @@ def _to_decimal(v, default="0"):
 # ---------------------
 @login_required
 def dashboard(request):
-    groups = list(request.user.groups.values_list("name", flat=True))
-    role = getattr(getattr(request.user, "profile", None), "role", None)
+    principal = get_principal(request.user)
+    groups = sorted(principal.groups)
+    role = getattr(principal.profile, "role", None)
 
     recent_reports = []
     if ExpenseReport:
@@ -125,56 +117,10 @@ def dashboard(request):
             .order_by("-created_at")[:5]
         )
 
-    stats = {
-        "temp": 0,
-        "request_count": 0,
-        "in_progress": 0,
-        "done": 0,
-        "accounts": SalesPartner.objects.count() if SalesPartner else 0,
-    }
-    if Contract:
-        qs = Contract.objects.all()
-        stats["temp"] = qs.filter(status="draft").count()
-        stats["request_count"] = qs.filter(status="submitted").count()
-        stats["in_progress"] = qs.filter(status="processing").count()
-        stats["done"] = qs.filter(status="completed").count()
-
-    # ===== 이번 달 합계/마진율 집계 추가 =====
-    today = timezone.localdate()
-    month_start = today.replace(day=1)
-    # 다음달 1일(배타)
-    if month_start.month == 12:
-        month_end_excl = date(month_start.year + 1, 1, 1)
-    else:
-        month_end_excl = date(month_start.year, month_start.month + 1, 1)
-
-    monthly_kpis = {"sales_total": 0, "buy_total": 0, "margin_rate": 0.0, "contract_count": 0}
-    
-    # 이번 달 계약 건수 (Contract 기준)
-    if Contract:
-        monthly_kpis["contract_count"] = Contract.objects.filter(
-            created_at__date__gte=month_start,
-            created_at__date__lt=month_end_excl,
-        ).count()
-
-    # ContractItem 기준으로 합산
-    qi = ContractItem.objects.filter(
-        contract__created_at__date__gte=month_start,
-        contract__created_at__date__lt=month_end_excl,
-    )
-    agg = qi.aggregate(
-        sales_total=Coalesce(Sum("sell_total"), Value(0, output_field=DecimalField(max_digits=18, decimal_places=2))),
-        buy_total=Coalesce(Sum("buy_total"), Value(0, output_field=DecimalField(max_digits=18, decimal_places=2))),
-    )
-    sales_total = Decimal(agg["sales_total"] or 0)
-    buy_total = Decimal(agg["buy_total"] or 0)
-    margin_amt = sales_total - buy_total
-    margin_rate = float((margin_amt / sales_total * 100) if sales_total else 0)
-
-    monthly_kpis["sales_total"] = sales_total.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-    monthly_kpis["buy_total"]   = buy_total.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-    monthly_kpis["margin_rate"] = round(margin_rate, 2) 
-    # ======================================
+    # 상태별 건수 + 이번 달 합계/마진율 (캐시된 스냅샷, accounts.kpis)
+    kpis = snapshot()
+    stats = kpis["stats"]
+    monthly_kpis = kpis["monthly_kpis"]
 
     return render(request, "dashboard.html", {
         "groups": groups,
@@ -322,33 +268,8 @@ def contract_temporary_list(request):
         )
     )
 
-    # ===== 검색/필터 =====
-    date_from   = (request.GET.get("date_from") or "").strip()
-    date_to     = (request.GET.get("date_to") or "").strip()
-    q_customer  = (request.GET.get("q_customer") or "").strip()
-    q_vendor    = (request.GET.get("q_vendor") or "").strip()
-    owner_id    = (request.GET.get("owner") or "").strip()
-    q_item      = (request.GET.get("q_item") or "").strip()
-    contract_no = (request.GET.get("contract_no") or "").strip()
-    # status 필터는 임시저장 화면에선 고정이므로 없음
-
-    if date_from:
-        qs = qs.filter(created_at__date__gte=date_from)
-    if date_to:
-        qs = qs.filter(created_at__date__lte=date_to)
-    if q_customer:
-        qs = qs.filter(customer_company__icontains=q_customer)
-    if q_vendor:
-        qs = qs.filter(items__vendor__icontains=q_vendor).distinct()
-    if owner_id:
-        try:
-            qs = qs.filter(writer_id=int(owner_id))
-        except (TypeError, ValueError):
-            pass
-    if q_item:
-        qs = qs.filter(items__name__icontains=q_item).distinct()
-    if contract_no:
-        qs = qs.filter(contract_no__icontains=contract_no)
+    # ===== 검색/필터 ===== (상태는 화면별 고정)
+    qs = filter_contracts(qs, request.GET, with_status=False)
 
     # ===== per_page & 페이지네이션 =====
     per_page_options = [10, 20, 30, 50, 100]
@@ -359,7 +280,7 @@ def contract_temporary_list(request):
     if per_page not in per_page_options:
         per_page = 10
 
-    paginator = Paginator(qs, per_page)
+    paginator = KeysetPaginator(qs, per_page, cursor=request.GET.get("cursor"))
     page_obj = paginator.get_page(request.GET.get("page") or 1)
 
     block = _pagination_block(page_obj, paginator)
@@ -367,6 +288,7 @@ def contract_temporary_list(request):
     # page 제외 쿼리스트링 (엑셀/페이지 링크에 재사용)
     qs_keep = request.GET.copy()
     qs_keep.pop("page", None)
+    qs_keep.pop("cursor", None)
     qs_without_page = qs_keep.urlencode()
 
     BLOCK_SIZE = 10
@@ -418,32 +340,8 @@ def contract_processing_list(request):
         )
     )
 
-    # ===== 검색 파라미터 =====
-    date_from   = (request.GET.get("date_from") or "").strip()
-    date_to     = (request.GET.get("date_to") or "").strip()
-    q_customer  = (request.GET.get("q_customer") or "").strip()
-    q_vendor    = (request.GET.get("q_vendor") or "").strip()
-    owner_id    = (request.GET.get("owner") or "").strip()
-    q_item      = (request.GET.get("q_item") or "").strip()
-    contract_no = (request.GET.get("contract_no") or "").strip()
-
-    if date_from:
-        qs = qs.filter(created_at__date__gte=date_from)
-    if date_to:
-        qs = qs.filter(created_at__date__lte=date_to)
-    if q_customer:
-        qs = qs.filter(customer_company__icontains=q_customer)
-    if q_vendor:
-        qs = qs.filter(items__vendor__icontains=q_vendor).distinct()
-    if owner_id:
-        try:
-            qs = qs.filter(writer_id=int(owner_id))
-        except (TypeError, ValueError):
-            pass
-    if q_item:
-        qs = qs.filter(items__name__icontains=q_item).distinct()
-    if contract_no:
-        qs = qs.filter(contract_no__icontains=contract_no)
+    # ===== 검색 파라미터 ===== (상태는 화면별 고정)
+    qs = filter_contracts(qs, request.GET, with_status=False)
 
     # ===== 페이지 사이즈 & 페이지네이션 =====
     per_page_options = [10, 20, 30, 50, 100]
@@ -454,7 +352,7 @@ def contract_processing_list(request):
     if per_page not in per_page_options:
         per_page = 10
 
-    paginator = Paginator(qs, per_page)
+    paginator = KeysetPaginator(qs, per_page, cursor=request.GET.get("cursor"))
     page_number = request.GET.get("page") or 1
     page_obj = paginator.get_page(page_number)
     block = _pagination_block(page_obj, paginator)
@@ -462,6 +360,7 @@ def contract_processing_list(request):
     # page 파라미터만 제거한 쿼리스트링 (페이지 번호 링크/엑셀에 사용)
     qs_keep = request.GET.copy()
     qs_keep.pop("page", None)
+    qs_keep.pop("cursor", None)
     qs_without_page = qs_keep.urlencode()
 
     return render(request, "processing.html", {
@@ -502,32 +401,8 @@ def contract_process_page(request):
         )
     )
 
-    # ===== 검색 파라미터 =====
-    date_from   = (request.GET.get("date_from") or "").strip()
-    date_to     = (request.GET.get("date_to") or "").strip()
-    q_customer  = (request.GET.get("q_customer") or "").strip()
-    q_vendor    = (request.GET.get("q_vendor") or "").strip()
-    owner_id    = (request.GET.get("owner") or "").strip()
-    q_item      = (request.GET.get("q_item") or "").strip()
-    contract_no = (request.GET.get("contract_no") or "").strip()
-
-    if date_from:
-        qs = qs.filter(created_at__date__gte=date_from)
-    if date_to:
-        qs = qs.filter(created_at__date__lte=date_to)
-    if q_customer:
-        qs = qs.filter(customer_company__icontains=q_customer)
-    if q_vendor:
-        qs = qs.filter(items__vendor__icontains=q_vendor).distinct()
-    if owner_id:
-        try:
-            qs = qs.filter(writer_id=int(owner_id))
-        except (TypeError, ValueError):
-            pass
-    if q_item:
-        qs = qs.filter(items__name__icontains=q_item).distinct()
-    if contract_no:
-        qs = qs.filter(contract_no__icontains=contract_no)
+    # ===== 검색 파라미터 ===== (상태는 화면별 고정)
+    qs = filter_contracts(qs, request.GET, with_status=False)
 
     # ===== 페이지 사이즈 & 페이지네이션 =====
     per_page_options = [10, 20, 30, 50, 100]
@@ -538,7 +413,7 @@ def contract_process_page(request):
     if per_page not in per_page_options:
         per_page = 10
 
-    paginator = Paginator(qs, per_page)
+    paginator = KeysetPaginator(qs, per_page, cursor=request.GET.get("cursor"))
     page_number = request.GET.get("page") or 1
     page_obj = paginator.get_page(page_number)
     block = _pagination_block(page_obj, paginator)
@@ -546,6 +421,7 @@ def contract_process_page(request):
     # page 파라미터 제거한 쿼리스트링 (페이지 링크/엑셀 유지)
     qs_keep = request.GET.copy()
     qs_keep.pop("page", None)
+    qs_keep.pop("cursor", None)
     qs_without_page = qs_keep.urlencode()
 
     return render(request, "contract_process.html", {
@@ -586,32 +462,8 @@ def contract_approved_list(request):
         )
     )
 
-    # ===== 검색 파라미터 =====
-    date_from   = (request.GET.get("date_from") or "").strip()
-    date_to     = (request.GET.get("date_to") or "").strip()
-    q_customer  = (request.GET.get("q_customer") or "").strip()
-    q_vendor    = (request.GET.get("q_vendor") or "").strip()
-    owner_id    = (request.GET.get("owner") or "").strip()
-    q_item      = (request.GET.get("q_item") or "").strip()
-    contract_no = (request.GET.get("contract_no") or "").strip()
-
-    if date_from:
-        qs = qs.filter(created_at__date__gte=date_from)
-    if date_to:
-        qs = qs.filter(created_at__date__lte=date_to)
-    if q_customer:
-        qs = qs.filter(customer_company__icontains=q_customer)
-    if q_vendor:
-        qs = qs.filter(items__vendor__icontains=q_vendor).distinct()
-    if owner_id:
-        try:
-            qs = qs.filter(writer_id=int(owner_id))
-        except (TypeError, ValueError):
-            pass
-    if q_item:
-        qs = qs.filter(items__name__icontains=q_item).distinct()
-    if contract_no:
-        qs = qs.filter(contract_no__icontains=contract_no)
+    # ===== 검색 파라미터 ===== (상태는 화면별 고정)
+    qs = filter_contracts(qs, request.GET, with_status=False)
 
     # ===== 페이지 사이즈 & 페이지네이션 =====
     per_page_options = [10, 20, 30, 50, 100]
@@ -622,7 +474,7 @@ def contract_approved_list(request):
     if per_page not in per_page_options:
         per_page = 10
 
-    paginator = Paginator(qs, per_page)
+    paginator = KeysetPaginator(qs, per_page, cursor=request.GET.get("cursor"))
     page_number = request.GET.get("page") or 1
     page_obj = paginator.get_page(page_number)
     block = _pagination_block(page_obj, paginator)
@@ -631,6 +483,7 @@ def contract_approved_list(request):
     # page 파라미터 제외한 쿼리스트링 (페이지 링크/엑셀에서 사용)
     qs_keep = request.GET.copy()
     qs_keep.pop("page", None)
+    qs_keep.pop("cursor", None)
     qs_without_page = qs_keep.urlencode()
 
     return render(request, "approved.html", {
@@ -646,6 +499,16 @@ def contract_approved_list(request):
     })
 
 
+@login_required
+def contract_status_summary(request):
+    """
+    상태별 계약 건수 JSON (상단 메뉴 배지/대시보드 갱신용)
+    - 직원모드는 본인 작성 계약만, ?mine=1 이면 누구나 본인 것만
+    """
+    counts = status_summary(request.user, mine=request.GET.get("mine") == "1")
+    return JsonResponse({"counts": counts})
+
+
 # 상태 전환
 @login_required
 @require_POST
@@ -691,15 +554,11 @@ def contract_mark_processing(request, pk: int):
 
 
 def _can_approve(user) -> bool:
-    if user.is_superuser:
-        return True
-    return _get_access(user) in ("실장모드", "사장모드")
+    return get_principal(user).can_approve
 
 
 def _can_complete(user) -> bool:
-    if user.is_superuser:
-        return True
-    return _get_access(user) in ("사장모드",)
+    return get_principal(user).can_complete
 
 
 @login_required
@@ -46,6 +46,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "accounts.middleware.PrincipalMiddleware",   # request.principal (프로필/그룹 요청당 1회 조회)
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -64,6 +65,7 @@ TEMPLATES = [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
+                "accounts.context_processors.contract_status",
             ],
         },
     },
@@ -111,13 +113,49 @@ STATICFILES_DIRS = [BASE_DIR / "static"]
 LOGIN_REDIRECT_URL = "/dashboard/"
 LOGOUT_REDIRECT_URL = "/"
 
+# --- Cache (대시보드 KPI, 계약 목록 건수 등) ---
+# 기본은 프로세스별 메모리 캐시. 여러 워커 프로세스가 무효화를 함께 보게 하려면
+# .env 에 CACHE_LOCATION=/var/tmp/expense_cache 처럼 지정 → 파일 캐시 사용
+CACHE_LOCATION = os.getenv("CACHE_LOCATION", "")
+CACHES = {
+    "default": {
+        "BACKEND": (
+            "django.core.cache.backends.filebased.FileBasedCache" if CACHE_LOCATION
+            else "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": CACHE_LOCATION or "expense-management",
+    }
+}
+# 대시보드 KPI 캐시 최대 유지 시간(초) — 무효화가 닿지 않는 다른 프로세스도 이 시간 안에는 갱신됨
+DASHBOARD_KPI_MAX_STALENESS = int(os.getenv("DASHBOARD_KPI_MAX_STALENESS", "300"))
+# 추이 보고서 메모리 큐브(reports.trendcube) 전체 재적재 주기(초) — 캐시를 공유하지 않는 프로세스 간 변경 반영용
+TREND_CUBE_MAX_STALENESS = int(os.getenv("TREND_CUBE_MAX_STALENESS", "900"))
+
+# 계약 목록 건수는 이만큼(행)까지만 세고 넘으면 "1000+" 로 표시 (expenses.pagination)
+CONTRACT_LIST_COUNT_CAP = int(os.getenv("CONTRACT_LIST_COUNT_CAP", "1000"))
+
+# --- 계약 엑셀 내보내기 (백그라운드 작업, expenses.exportjobs) ---
+# 같은 검색조건이면 이 시간(초) 안에 만든 파일을 재사용 / 만든 파일은 이 시간(초)이 지나면 삭제
+CONTRACT_EXPORT_REUSE_SECONDS = int(os.getenv("CONTRACT_EXPORT_REUSE_SECONDS", "600"))
+CONTRACT_EXPORT_KEEP_SECONDS  = int(os.getenv("CONTRACT_EXPORT_KEEP_SECONDS", str(24 * 60 * 60)))
+# 변경분 내보내기는 이 시간(초) 이전까지의 변경만 담음 (저장 후 늦게 커밋되는 트랜잭션 여유, 가장 긴 저장 요청보다 길게)
+CONTRACT_EXPORT_DELTA_LAG_SECONDS = int(os.getenv("CONTRACT_EXPORT_DELTA_LAG_SECONDS", "600"))
+
 # --- Default PK type ---
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
-# 업로드 관련 제한 완화
+# 업로드 파일을 받으면서 sha256 계산 (사진 중복 저장 방지, expenses.imagestore)
+FILE_UPLOAD_HANDLERS = [
+    "expenses.uploadhandlers.HashingMemoryFileUploadHandler",
+    "expenses.uploadhandlers.HashingTemporaryFileUploadHandler",
+]
+
+# 업로드 관련 제한
+# 계약 사진은 브라우저가 스토리지에 직접 올림(expenses.directupload) → 앱 요청 본문은 폼 값 + 토큰뿐
 DATA_UPLOAD_MAX_NUMBER_FIELDS = 10000
-DATA_UPLOAD_MAX_MEMORY_SIZE   = 100 * 1024 * 1024  # 100MB
-FILE_UPLOAD_MAX_MEMORY_SIZE   = 100 * 1024 * 1024  # 100MB
+DATA_UPLOAD_MAX_MEMORY_SIZE   = 5 * 1024 * 1024    # 5MB
+FILE_UPLOAD_MAX_MEMORY_SIZE   = 2621440            # 2.5MB (넘으면 임시파일로 받음)
+CONTRACT_IMAGE_MAX_UPLOAD_SIZE = int(os.getenv("CONTRACT_IMAGE_MAX_UPLOAD_SIZE", str(8 * 1024 * 1024)))  # 사진 1장 최대
 
 USE_OBJECT_STORAGE = os.getenv("USE_OBJECT_STORAGE", "True").strip().lower() in ("true", "1", "yes")
 
@@ -139,6 +177,8 @@ AWS_DEFAULT_ACL = None
 AWS_S3_FILE_OVERWRITE = False
 AWS_QUERYSTRING_AUTH = True                 # presigned URL 사용
 AWS_QUERYSTRING_EXPIRE = 60 * 60 * 6        # 6시간
+# 서명 URL 캐시(expenses.signedurls): 캐시에서 꺼낸 URL 도 최소 이 시간(초)은 유효하도록 만료 전에 새로 서명
+SIGNED_URL_MIN_VALIDITY = 60 * 60
 AWS_S3_OBJECT_PARAMETERS = {
     "CacheControl": "public, max-age=31536000",
 }
@@ -6,4 +6,4 @@ class ExpensesConfig(AppConfig):
     name = "expenses"
 
     def ready(self):
-        from . import signals  # noqa
\ No newline at end of file
+        from . import exportjobs, signals  # noqa
\ No newline at end of file
@@ -0,0 +1,179 @@
+# expenses/directupload.py
+"""
+계약 사진 직접 업로드 (브라우저 → 스토리지)
+
+    1) POST /expenses/contracts/uploads/  filename, content_type, size, sha256 (파일 수만큼 반복)
+       → {"uploads": [{"url", "fields", "token", "key"}, ...]}
+    2) 브라우저가 url 에 fields + file 을 multipart POST (S3 presigned POST / 로컬은 upload_local)
+    3) 계약 저장 폼에는 파일 대신 upload_tokens[] 만 보냄
+       uploads, errors = verify_uploads(request.POST.getlist("upload_tokens[]"), request.user)
+       imagestore.attach_stored(contract, **upload)
+
+- 업로드 경로는 서버가 정하고(contracts/orig/날짜/uuid) 서명된 토큰에 사용자와 함께 담아 줌
+  → 폼에서 임의의 스토리지 경로나 다른 사람이 올린 파일을 붙일 수 없음
+- 크기/형식 제한은 S3 정책(content-length-range, Content-Type)과 저장 시 확인으로 두 번 막음
+- sha256 은 브라우저가 계산해 보내고 토큰에 서명해 담음. S3 는 presigned POST 의 x-amz-checksum-sha256 으로
+  올라온 내용과 맞는지 직접 확인하므로, 저장할 때는 HeadObject 로 크기/체크섬만 보고 파일을 다시 읽지 않음
+  (같은 내용이면 기존 ImageBlob 재사용, 로컬 업로드는 받으면서 계산해 비교)
+- 올리고 저장하지 않은 파일은 reconcile_storage 가 DB 참조 없는 파일로 정리
+"""
+import base64
+import hashlib
+import os
+import re
+import uuid
+
+from django.conf import settings
+from django.core import signing
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from django.utils import timezone
+
+from .storagegc import _s3_bucket
+
+SALT = "expenses.directupload"
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".gif", ".webp", ".bmp", ".heic")
+
+# 업로드 URL 유효시간 / 토큰으로 저장할 수 있는 기간 (폼을 열어 둔 채 오래 있을 수 있음)
+URL_EXPIRE_SECONDS = 15 * 60
+TOKEN_MAX_AGE = 24 * 60 * 60
+
+_SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+def max_size():
+    return getattr(settings, "CONTRACT_IMAGE_MAX_UPLOAD_SIZE", 8 * 1024 * 1024)
+
+
+def new_key(filename):
+    ext = os.path.splitext(filename or "")[1].lower()
+    if ext not in IMAGE_EXTS:
+        ext = ".jpg"
+    return f"contracts/orig/{timezone.now():%Y/%m/%d}/{uuid.uuid4().hex}{ext}"
+
+
+def _b64(hexdigest):
+    """S3 체크섬 헤더 형식 (sha256 바이트의 base64)"""
+    return base64.b64encode(bytes.fromhex(hexdigest)).decode("ascii")
+
+
+def issue(user, filename, content_type, size=None, sha256=None):
+    """업로드 대상 1건 발급. 반환: {"key", "token", "url", "fields"} (형식/크기/sha256 이 맞지 않으면 ValueError)"""
+    content_type = (content_type or "").strip().lower()
+    sha256 = (sha256 or "").strip().lower()
+    if not content_type.startswith("image/"):
+        raise ValueError(f"{filename}: 이미지 파일만 올릴 수 있습니다.")
+    if size is not None and size > max_size():
+        raise ValueError(f"{filename}: {max_size() // (1024 * 1024)}MB 를 넘는 파일은 올릴 수 없습니다.")
+    if not _SHA256_RE.match(sha256):
+        raise ValueError(f"{filename}: 파일 확인값(sha256)이 올바르지 않습니다.")
+
+    key = new_key(filename)
+    filename = os.path.basename(filename or "")[:255]
+    token = signing.dumps({"k": key, "u": user.pk, "n": filename, "t": content_type, "h": sha256}, salt=SALT)
+    target = {"key": key, "token": token}
+
+    bucket = _s3_bucket(default_storage)
+    if bucket is None:
+        # S3 가 아니면(로컬 개발 등) 같은 형식으로 받아 주는 앱 엔드포인트
+        target.update(url=reverse("expenses:contract_upload_local", args=[token]), fields={})
+        return target
+
+    from storages.utils import clean_name
+
+    # S3 가 올라온 내용의 sha256 을 확인 (다르면 업로드 거부)
+    fields = {"Content-Type": content_type, "x-amz-checksum-sha256": _b64(sha256)}
+    conditions = [
+        ["content-length-range", 1, max_size()],
+        {"Content-Type": content_type},
+        {"x-amz-checksum-sha256": fields["x-amz-checksum-sha256"]},
+    ]
+    cache_control = getattr(settings, "AWS_S3_OBJECT_PARAMETERS", {}).get("CacheControl")
+    if cache_control:
+        fields["Cache-Control"] = cache_control
+        conditions.append({"Cache-Control": cache_control})
+    post = bucket.meta.client.generate_presigned_post(
+        bucket.name,
+        default_storage._normalize_name(clean_name(key)),
+        Fields=fields,
+        Conditions=conditions,
+        ExpiresIn=URL_EXPIRE_SECONDS,
+    )
+    target.update(url=post["url"], fields=post["fields"])
+    return target
+
+
+def load_token(token, user, max_age=TOKEN_MAX_AGE):
+    """토큰 → 내용 dict (위조/만료/다른 사용자면 ValueError)"""
+    try:
+        data = signing.loads(token, salt=SALT, max_age=max_age)
+    except signing.SignatureExpired:
+        raise ValueError("업로드 유효시간이 지났습니다. 사진을 다시 선택해 주세요.")
+    except signing.BadSignature:
+        raise ValueError("잘못된 업로드 정보입니다.")
+    if data.get("u") != user.pk:
+        raise ValueError("잘못된 업로드 정보입니다.")
+    return data
+
+
+def save_local(token, user, upload):
+    """S3 가 아닐 때의 업로드 대상 (upload_local 뷰). 토큰이 정한 경로 그대로 저장"""
+    data = load_token(token, user, max_age=URL_EXPIRE_SECONDS)
+    if not (upload.content_type or "").lower().startswith("image/"):
+        raise ValueError("이미지 파일만 올릴 수 있습니다.")
+    if upload.size > max_size():
+        raise ValueError(f"{max_size() // (1024 * 1024)}MB 를 넘는 파일은 올릴 수 없습니다.")
+    h = hashlib.sha256()
+    for chunk in upload.chunks():
+        h.update(chunk)
+    if h.hexdigest() != data["h"]:
+        raise ValueError("파일 내용이 확인값(sha256)과 다릅니다.")
+    if default_storage.exists(data["k"]):
+        raise ValueError("이미 올린 파일입니다.")
+    name = default_storage.save(data["k"], upload)
+    if name != data["k"]:
+        default_storage.delete(name)
+        raise ValueError("업로드 경로가 맞지 않습니다.")
+    return name
+
+
+def _stored(name):
+    """
+    업로드된 파일의 (크기, base64 sha256 체크섬) — 내용은 읽지 않음
+    S3 는 HeadObject(ChecksumMode=ENABLED), 그 밖의 스토리지는 크기만 (체크섬은 save_local 에서 확인함)
+    """
+    bucket = _s3_bucket(default_storage)
+    if bucket is None:
+        return default_storage.size(name), None
+
+    from storages.utils import clean_name
+
+    head = bucket.meta.client.head_object(
+        Bucket=bucket.name, Key=default_storage._normalize_name(clean_name(name)), ChecksumMode="ENABLED",
+    )
+    return head["ContentLength"], head.get("ChecksumSHA256") or ""
+
+
+def verify_uploads(tokens, user):
+    """
+    폼의 upload_tokens[] 확인 → (attach_stored 인자 목록, 오류 dict)
+    parse_item_rows 처럼 오류는 {"images": [...]} 로 모아 폼 오류와 함께 표시
+    """
+    uploads, errors = [], []
+    for token in dict.fromkeys(t for t in tokens if t):
+        try:
+            data = load_token(token, user)
+            name = data["k"]
+            label = data["n"] or name
+            try:
+                size, checksum = _stored(name)
+            except Exception:
+                raise ValueError(f"{label}: 업로드가 끝나지 않았습니다. 다시 올려 주세요.")
+            if size > max_size():
+                raise ValueError(f"{label}: {max_size() // (1024 * 1024)}MB 를 넘는 파일입니다.")
+            if checksum is not None and checksum != _b64(data["h"]):
+                raise ValueError(f"{label}: 파일 내용이 확인값과 다릅니다. 다시 올려 주세요.")
+            uploads.append({"name": name, "digest": data["h"], "filename": data["n"], "size": size})
+        except ValueError as e:
+            errors.append(str(e))
+    return uploads, ({"images": errors} if errors else {})
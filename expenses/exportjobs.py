@@ -0,0 +1,178 @@
+# expenses/exportjobs.py
+"""
+계약 엑셀 내보내기 백그라운드 처리
+
+요청은 검색조건(쿼리스트링)을 ContractExport 로 남기고 작업(expenses.jobs)만 등록한다.
+워커(run_jobs)가 xlsx 를 만들어 default_storage 에 올리면, 화면은 상태 URL 을 폴링하다가 내려받는다.
+같은 검색조건(정규화한 쿼리스트링 해시)은 CONTRACT_EXPORT_REUSE_SECONDS 안에서는 기존 파일을 그대로 쓴다.
+
+변경분 내보내기(?delta=1): 검색조건별 ExportSnapshot 의 watermark 이후 updated_at 이 바뀐 계약만
+- 범위 (since, until] 는 등록할 때 고정 → 워커가 중간에 죽으면 작업 lease 가 풀린 뒤 같은 범위로 다시 만듦
+  (사진 PNG 는 스토리지에 캐시돼 있어 재실행은 그만큼 빠름)
+- until 은 등록 시각 - CONTRACT_EXPORT_DELTA_LAG_SECONDS: updated_at 은 커밋이 아니라 save() 시각이라
+  그보다 늦게 커밋되는 변경(같은 트랜잭션에서 사진 처리 등)이 있음 → 최근 변경은 다음 변경분 내보내기로 넘김
+- 파일이 다 만들어진 뒤에만 watermark 를 until 로 올리므로, 실패/중단된 내보내기 때문에 건너뛰는 변경은 없음
+- 계약 updated_at 은 계약 저장/상태 변경/품목 합계 변경 때 갱신 (품목 저장은 항상 계약 저장과 함께)
+- 삭제된 계약은 변경분에 나오지 않음
+
+    export, created = request_export(request.GET, request.user)
+"""
+import datetime
+import hashlib
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.db.models import F, Q
+from django.http import QueryDict
+from django.utils import timezone
+
+from . import jobs, storagegc
+from .exports import write_contracts_xlsx
+from .models import Contract, ContractExport, ExportSnapshot
+from .search import filter_contracts
+
+EXPORT_JOB = "contract.export"
+
+# 검색조건이 아닌 파라미터 (화면 페이지 이동용 / 변경분 여부)
+IGNORED_PARAMS = ("page", "per_page", "delta")
+
+
+def _reuse_seconds():
+    return getattr(settings, "CONTRACT_EXPORT_REUSE_SECONDS", 600)
+
+
+def _keep_seconds():
+    return getattr(settings, "CONTRACT_EXPORT_KEEP_SECONDS", 24 * 60 * 60)
+
+
+def _delta_lag_seconds():
+    return getattr(settings, "CONTRACT_EXPORT_DELTA_LAG_SECONDS", 10 * 60)
+
+
+def parse_ids(params):
+    """?ids=1,2,3 / ?ids=1&ids=2 → 중복 없는 정렬된 id 목록"""
+    ids = set()
+    for t in params.getlist("ids"):
+        for piece in str(t).split(","):
+            piece = piece.strip()
+            if piece.isdigit():
+                ids.add(int(piece))
+    return sorted(ids)
+
+
+def normalize(params):
+    """검색조건 파라미터만 정렬해 쿼리스트링으로 (빈 값/페이지/delta 제외)"""
+    q = QueryDict(mutable=True)
+    for k in sorted(params):
+        if k in IGNORED_PARAMS or k == "ids":
+            continue
+        values = sorted(v.strip() for v in params.getlist(k) if v.strip())
+        if values:
+            q.setlist(k, values)
+    ids = parse_ids(params)
+    if ids:
+        q["ids"] = ",".join(map(str, ids))
+    return q.urlencode()
+
+
+def export_queryset(params):
+    """contract_list 와 같은 정렬 + 선택 id + 검색필터(엑셀은 영업담당 기준)"""
+    qs = Contract.objects.order_by(
+        "-created_at",
+        "-id",
+        F("collect_invoice_date").desc(nulls_last=True),
+    )
+    ids = parse_ids(params)
+    if ids:
+        qs = qs.filter(id__in=ids)
+    return filter_contracts(qs, params, owner_field="sales_owner_id")
+
+
+def _hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def request_export(params, user=None):
+    """
+    같은 조건으로 유효시간 안에 만든(또는 만드는 중인) 파일이 있으면 그것을, 없으면 새로 등록
+    - ?delta=1 이면 변경분 내보내기 (만드는 중인 것만 재사용, 완료된 것은 watermark 가 이미 지나감)
+    반환: (ContractExport, 새로 등록했는지)
+    """
+    query = normalize(params)
+    delta = params.get("delta") == "1"
+    key = _hash(query + ("|delta" if delta else ""))
+    fresh_after = timezone.now() - datetime.timedelta(seconds=_reuse_seconds())
+
+    existing = ContractExport.objects.filter(key=key, created_at__gte=fresh_after).exclude(status="failed")
+    if delta:
+        existing = existing.filter(status="pending")
+    existing = existing.order_by("-created_at").first()
+    if existing:
+        return existing, False
+
+    with transaction.atomic():
+        export = ContractExport(key=key, query=query, requested_by=user)
+        if delta:
+            snapshot, _ = ExportSnapshot.objects.get_or_create(key=_hash(query), defaults={"query": query})
+            export.snapshot = snapshot
+            export.since = snapshot.watermark
+            # 아직 커밋되지 않은 변경이 끝날 여유만큼 앞에서 자름 (모듈 설명 참고)
+            export.until = timezone.now() - datetime.timedelta(seconds=_delta_lag_seconds())
+            if export.since is not None and export.until < export.since:
+                export.until = export.since
+        export.save()
+        export.job = jobs.enqueue(EXPORT_JOB, export_id=export.pk)
+        export.save(update_fields=["job"])
+    return export, True
+
+
+def export_rows(export):
+    """내보낼 계약 쿼리셋 (변경분이면 등록 때 고정한 범위 (since, until])"""
+    qs = export_queryset(QueryDict(export.query))
+    if export.until is not None:
+        qs = qs.filter(updated_at__lte=export.until)
+    if export.since is not None:
+        qs = qs.filter(updated_at__gt=export.since)
+    return qs
+
+
+def _mark_failed(export_id):
+    ContractExport.objects.filter(pk=export_id).update(status="failed", finished_at=timezone.now())
+
+
+@jobs.handler(EXPORT_JOB, on_failure=_mark_failed)
+def build_export(export_id):
+    export = ContractExport.objects.filter(pk=export_id).first()
+    if export is None or export.status == "ready":
+        return
+
+    qs = export_rows(export)
+    with tempfile.TemporaryFile() as tmp:
+        write_contracts_xlsx(qs, tmp)
+        tmp.seek(0)
+        export.file.save(f"contract_export_{export.pk}.xlsx", File(tmp), save=False)
+
+    export.status = "ready"
+    export.finished_at = timezone.now()
+    with transaction.atomic():  # 작업 큐는 트랜잭션 없이 호출 → 파일 생성이 끝난 뒤 DB 반영만 묶음
+        export.save(update_fields=["file", "status", "finished_at"])
+
+        if export.snapshot_id and export.until is not None:
+            # 더 최근 변경분 내보내기가 먼저 끝났으면 watermark 를 되돌리지 않음
+            ExportSnapshot.objects.filter(pk=export.snapshot_id).filter(
+                Q(watermark__isnull=True) | Q(watermark__lt=export.until)
+            ).update(watermark=export.until)
+
+    purge_expired()
+
+
+def purge_expired():
+    """보관 기간(CONTRACT_EXPORT_KEEP_SECONDS)이 지난 행 삭제 + 파일은 커밋 후 일괄 삭제. 삭제한 행 수 반환"""
+    cutoff = timezone.now() - datetime.timedelta(seconds=_keep_seconds())
+    with transaction.atomic():
+        old = list(ContractExport.objects.filter(created_at__lt=cutoff).values_list("pk", "file"))
+        storagegc.orphan(name for _pk, name in old)
+        ContractExport.objects.filter(pk__in=[pk for pk, _name in old]).delete()
+    return len(old)
@@ -0,0 +1,282 @@
+# expenses/exports.py
+"""
+계약 목록 엑셀(xlsx) 작성
+
+openpyxl write-only 워크시트로 행을 바로바로 흘려 쓰고,
+사진은 임시 폴더의 PNG 파일 경로로만 붙여 두었다가 저장 시점에 읽는다.
+계약은 chunk 단위로 조회하므로 내보내는 건수와 상관없이 메모리 사용량이 거의 일정하다.
+"""
+import io
+import logging
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.drawing.image import Image as XLImage
+from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+from openpyxl.utils import get_column_letter
+from PIL import Image as PILImage
+
+from .signals import export_name_for
+
+logger = logging.getLogger(__name__)
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+CHUNK_SIZE = 200
+
+# A~I: 계약 공통 / J~Q: 품목 / R: 사진
+HEADERS = [
+    "계약번호","상태","매출처","담당자",
+    "작성자","작성일","마감월",
+    "이익금액","이익율",
+    "품목","규격","수량",
+    "매출단가","매출금액",
+    "매입단가","매입금액",
+    "매입처",
+    "사진",
+]
+WIDTHS = [13,10,18,12,12,11,10,13,9,28,16,9,13,14,13,14,16,12]
+
+PHOTO_COL = 18
+MERGED_COLS = list(range(1, 10)) + [PHOTO_COL]
+LEFT_COLS = (1,2,3,4,5,6,7,10,11,17)
+MONEY_COLS = (13,14,15,16,8)  # 금액 계열 + 이익금액
+
+IMAGE_ROW_HEIGHT = 120
+IMAGE_MAX_SIDE = 200
+
+header_fill = PatternFill("solid", fgColor="7EA0B8")
+line_color = "6F8EA6"
+thin = Side(style="thin", color=line_color)
+border = Border(left=thin, right=thin, top=thin, bottom=thin)
+
+center = Alignment(horizontal="center", vertical="center", wrap_text=True)
+left   = Alignment(horizontal="left", vertical="center", wrap_text=True)
+right  = Alignment(horizontal="right", vertical="center")
+
+
+def _render_png(data):
+    """이미지 바이트 → 엑셀용(최대 200px) PNG 바이트"""
+    img = PILImage.open(io.BytesIO(data)).convert("RGB")
+    img.thumbnail((IMAGE_MAX_SIDE, IMAGE_MAX_SIDE))
+    bio = io.BytesIO()
+    img.save(bio, format="PNG")
+    return bio.getvalue()
+
+
+def _read(name):
+    with default_storage.open(name, "rb") as f:
+        return f.read()
+
+
+def export_png_bytes(source_names, cache_name):
+    """
+    이미지 1장 → 엑셀에 넣을 PNG 바이트
+    1) 캐시(contracts/export/..._200.png)가 있으면 그대로 사용 (다운로드/리사이즈 생략)
+    2) 없으면 thumb → medium → original 순으로 읽어 리사이즈 후 캐시에 저장
+       (같은 사진을 동시에 만든 경우 먼저 저장한 쪽만 남기고, 접미사 붙은 사본은 바로 지움)
+    스토리지만 사용하므로(DB 접근 없음) 스레드에서 호출해도 안전
+    """
+    if cache_name:
+        try:
+            return _read(cache_name)
+        except Exception:
+            pass
+
+    for name in source_names:
+        if not name:
+            continue
+        try:
+            png = _render_png(_read(name))
+        except Exception:
+            continue
+        if cache_name:
+            try:
+                if not default_storage.exists(cache_name):
+                    saved = default_storage.save(cache_name, ContentFile(png))
+                    if saved != cache_name:
+                        default_storage.delete(saved)
+            except Exception as e:
+                logger.warning("export cache save failed: %s (%s)", cache_name, e)
+        return png
+    return None
+
+
+def _image_job(ci):
+    sources = tuple(getattr(getattr(ci, f, None), "name", None) for f in ("thumb", "medium", "original"))
+    return sources, export_name_for(getattr(ci.original, "name", None))
+
+
+class ImagePrefetcher:
+    """
+    계약 chunk 의 사진을 스레드 풀로 미리 받아 두는 단계
+    - 작성기가 계약을 순서대로 쓰는 동안 뒤쪽 계약 사진이 병렬로 준비됨
+    """
+
+    def __init__(self, max_workers=None):
+        self.pool = ThreadPoolExecutor(
+            max_workers=max_workers or getattr(settings, "CONTRACT_EXPORT_IMAGE_WORKERS", 8),
+            thread_name_prefix="contract-export-img",
+        )
+
+    def submit(self, contract):
+        return [self.pool.submit(export_png_bytes, *_image_job(ci)) for ci in contract.images.all()]
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+
+class ContractSheetWriter:
+    """write-only 워크시트에 계약 단위로 행을 추가하는 작성기"""
+
+    def __init__(self, workdir):
+        self.workdir = workdir
+        self.wb = Workbook(write_only=True)
+        self.ws = self.wb.create_sheet("계약목록")
+        self.row = 1
+        self._n_images = 0
+
+        # 돈 서식
+        money = NamedStyle(name="krw")
+        money.number_format = '#,##0.00"원"'
+        self.wb.add_named_style(money)
+
+        # 열 너비/헤더는 행을 쓰기 전에 지정해야 함
+        for i, w in enumerate(WIDTHS, start=1):
+            self.ws.column_dimensions[get_column_letter(i)].width = w
+        self.ws.row_dimensions[1].height = 22
+
+        header = []
+        for h in HEADERS:
+            cell = WriteOnlyCell(self.ws, value=h)
+            cell.font = Font(bold=True, color="FFFFFF")
+            cell.fill = header_fill
+            cell.alignment = center
+            cell.border = border
+            header.append(cell)
+        self._append(header)
+
+    def _append(self, cells):
+        self.ws.append(cells)
+        self.row += 1
+
+    def _cell(self, col, value, merged_away=False):
+        """스타일/정렬/테두리/금액 서식 (병합될 아래쪽 칸은 테두리만)"""
+        if merged_away:
+            cell = WriteOnlyCell(self.ws)
+            cell.border = border
+            return cell
+        cell = WriteOnlyCell(self.ws, value=value)
+        cell.border = border
+        if col in LEFT_COLS:
+            cell.alignment = left
+        elif col in (12,):
+            cell.alignment = center
+        else:
+            cell.alignment = right
+        if col in MONEY_COLS and isinstance(value, (int, float, Decimal)):
+            cell.style = "krw"
+            if isinstance(value, Decimal):
+                cell.value = float(value)
+        return cell
+
+    def add_contract(self, c, items, png_list):
+        """
+        계약 1건 기록
+        - 한 계약에 품목이 여러 개면: 계약 공통 칼럼은 세로 병합, 품목/수량 등만 행별 기재
+        - 사진: 여러 장이면 모두 삽입(세로 병합된 '사진' 칸에 세로로 쌓음)
+        """
+        profit, margin_rate = c.profit, c.margin_rate  # 계약에 저장된 합계 (expenses.totals)
+        items = items or [None]  # 품목이 없으면 빈 한 줄 보장
+        start_row = self.row
+        end_row = start_row + len(items) - 1
+
+        # 행 높이는 행을 쓰기 전에 잡아야 반영됨
+        if png_list:
+            for r in range(start_row, end_row + 1):
+                self.ws.row_dimensions[r].height = IMAGE_ROW_HEIGHT
+
+        base_vals = [
+            (c.contract_no or c.id),
+            c.get_status_display(),
+            (c.customer_company or c.title or ""),
+            (c.customer_manager or ""),
+            (c.writer.first_name or c.writer.username) if c.writer_id else "",
+            c.created_at.strftime("%Y-%m-%d") if c.created_at else "",
+            c.margin_month or "",
+            profit if profit is not None else "",
+            (f"{margin_rate:.2f}%") if margin_rate is not None else "",
+        ]
+        for idx, it in enumerate(items):
+            values = (base_vals if idx == 0 else [""] * 9) + [
+                it.name if it else "",
+                it.spec if it else "",
+                it.qty if it else "",
+                it.sell_unit if it else "",
+                it.sell_total if it else "",
+                it.buy_unit if it else "",
+                it.buy_total if it else "",
+                it.vendor if it else "",
+                "",  # 사진 (아래서 이미지 넣음)
+            ]
+            self._append([
+                self._cell(col, v, merged_away=(idx > 0 and col in MERGED_COLS))
+                for col, v in enumerate(values, start=1)
+            ])
+
+        # 세로 병합: A~I(공통) + R(사진)
+        if end_row > start_row:
+            for col_idx in MERGED_COLS:
+                col_letter = get_column_letter(col_idx)
+                self.ws.merged_cells.add(f"{col_letter}{start_row}:{col_letter}{end_row}")
+
+        # 이미지 모두 삽입(병합된 사진 칼럼에) — 파일 경로만 들고 있다가 저장 시 읽음
+        for png in png_list:
+            self._n_images += 1
+            path = os.path.join(self.workdir, f"img{self._n_images}.png")
+            with open(path, "wb") as fh:
+                fh.write(png)
+            self.ws.add_image(XLImage(path), f"{get_column_letter(PHOTO_COL)}{start_row}")
+
+    def save(self, fp):
+        self.wb.save(fp)
+
+
+def write_contracts_xlsx(qs, fp, chunk_size=CHUNK_SIZE):
+    """
+    계약 쿼리셋을 xlsx 로 fp(파일 객체)에 기록
+    - qs 는 chunk 단위로 조회 (images/items prefetch 도 chunk 마다)
+    - 사진은 chunk 단위로 ImagePrefetcher 에 먼저 맡겨 병렬로 받아 둠
+    """
+    qs = qs.select_related("writer", "sales_owner").prefetch_related("images", "items")
+    prefetcher = ImagePrefetcher()
+    try:
+        with tempfile.TemporaryDirectory(prefix="contract_export_") as workdir:
+            writer = ContractSheetWriter(workdir)
+            for chunk in _chunked(qs.iterator(chunk_size=chunk_size), chunk_size):
+                pending = [(c, prefetcher.submit(c)) for c in chunk]
+                for c, futures in pending:
+                    png_list = [p for p in (f.result() for f in futures) if p]
+                    writer.add_contract(c, list(c.items.all()), png_list)
+            writer.save(fp)
+    finally:
+        prefetcher.close()
+
+
+def _chunked(iterable, size):
+    chunk = []
+    for obj in iterable:
+        chunk.append(obj)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
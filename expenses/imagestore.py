@@ -0,0 +1,115 @@
+# expenses/imagestore.py
+"""
+계약 사진 내용 기준(sha256) 저장 + 참조 수 관리
+
+    img = attach(contract, request.FILES["..."])   # add_contract / contract_edit
+    img = attach_stored(contract, name, digest)    # 브라우저가 직접 올린 파일 (expenses.directupload)
+
+- 같은 내용의 ImageBlob 이 있으면 업로드/파생본 생성 없이 그 파일을 그대로 참조 (refcount + 1)
+- 없으면 contracts/orig/<sha 앞 2글자>/<sha>-<토큰>.<확장자> 로 한 번만 올리고 파생본 작업 등록
+  (토큰: 마지막 참조가 지워져 파일 삭제가 커밋 뒤로 미뤄진 사이 같은 내용을 다시 올려도 경로가 겹치지 않게)
+- ContractImage 가 삭제되면(post_delete) release() 로 refcount - 1, 0 이 되면 커밋 후 스토리지 파일 삭제 (storagegc)
+
+sha256 은 업로드 핸들러(expenses.uploadhandlers)가 받으면서 계산해 둔 값을 쓰고, 없으면 여기서 읽어 계산.
+blob 이 없는 예전 사진은 지금처럼 행이 파일을 단독 소유한다.
+"""
+import hashlib
+import os
+import uuid
+
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from . import storagegc
+from .models import ContractImage, ImageBlob
+
+
+def sha256_of(upload):
+    digest = getattr(upload, "sha256", None)
+    if digest:
+        return digest
+    h = hashlib.sha256()
+    for chunk in upload.chunks():
+        h.update(chunk)
+    upload.seek(0)
+    return h.hexdigest()
+
+
+def blob_name(digest, filename):
+    ext = os.path.splitext(filename or "")[1].lower()[:10] or ".jpg"
+    return f"contracts/orig/{digest[:2]}/{digest}-{uuid.uuid4().hex[:8]}{ext}"
+
+
+def _reuse(contract, blob, filename):
+    ImageBlob.objects.filter(pk=blob.pk).update(refcount=F("refcount") + 1)
+    img = ContractImage(contract=contract, blob=blob, filename=filename, deriv_status=blob.deriv_status)
+    img.original.name = blob.original
+    img.thumb.name = blob.thumb
+    img.medium.name = blob.medium
+    if blob.deriv_status != "failed":
+        img._skip_derivatives = True  # 파생본이 이미 있거나 다른 사진의 작업이 만드는 중 (그 경우 복사 작업만 등록)
+    else:
+        img.deriv_status = "pending"
+    img.save()
+    return img
+
+
+def attach(contract, upload):
+    """업로드 파일 → ContractImage (같은 내용이면 기존 파일 재사용)"""
+    digest = sha256_of(upload)
+    filename = os.path.basename(upload.name or "")[:255]
+
+    with transaction.atomic():
+        blob = ImageBlob.objects.select_for_update().filter(sha256=digest).first()
+        if blob is not None:
+            return _reuse(contract, blob, filename)
+
+    name = default_storage.save(blob_name(digest, filename), upload)
+    return _attach_new(contract, digest, name, filename, upload.size or 0)
+
+
+def attach_stored(contract, name, digest, filename="", size=0):
+    """브라우저가 스토리지에 직접 올린 파일(expenses.directupload) → ContractImage"""
+    with transaction.atomic():
+        blob = ImageBlob.objects.select_for_update().filter(sha256=digest).first()
+        if blob is not None:
+            if blob.original != name:
+                storagegc.orphan([name])  # 같은 내용이 이미 있음 → 방금 올린 파일은 버림
+            return _reuse(contract, blob, filename)
+    return _attach_new(contract, digest, name, filename, size)
+
+
+def _attach_new(contract, digest, name, filename, size):
+    try:
+        with transaction.atomic():
+            blob = ImageBlob.objects.create(sha256=digest, original=name, size=size, refcount=1)
+    except IntegrityError:
+        # 같은 내용이 동시에 올라와 다른 요청이 먼저 blob 을 만듦 → 방금 올린 파일은 버리고 재사용
+        storagegc.orphan([name])
+        with transaction.atomic():
+            blob = ImageBlob.objects.select_for_update().get(sha256=digest)
+            return _reuse(contract, blob, filename)
+
+    img = ContractImage(contract=contract, blob=blob, filename=filename)
+    img.original.name = name
+    img.save()  # post_save → 파생본 작업 등록
+    return img
+
+
+def release(blob_id):
+    """ContractImage 하나가 blob 참조를 놓음. 마지막 참조면 커밋 후 스토리지 파일까지 삭제"""
+    from .signals import _image_names
+
+    with transaction.atomic():
+        ImageBlob.objects.filter(pk=blob_id).update(refcount=F("refcount") - 1)
+        blob = ImageBlob.objects.select_for_update().filter(pk=blob_id, refcount__lte=0).first()
+        if blob is None:
+            return
+        remaining = ContractImage.objects.filter(blob_id=blob_id).count()
+        if remaining:
+            # 참조 수가 어긋나 있음 → 실제 행 수로 바로잡고 파일은 유지
+            ImageBlob.objects.filter(pk=blob_id).update(refcount=remaining)
+            return
+        storagegc.orphan(_image_names(blob))
+        blob.delete()
@@ -0,0 +1,143 @@
+# expenses/items.py
+"""
+계약 품목 저장 (add_contract / contract_edit 공통)
+
+    rows, errors = parse_item_rows(request.POST)   # 트랜잭션 밖에서 먼저 파싱/검증
+    ...
+    save_items(contract, rows)                      # 트랜잭션 안에서 기존 품목과 비교해 반영
+
+품목 수와 상관없이 쿼리 수가 일정하도록
+- 기존 품목과 화면 순서대로 짝지어 바뀐 행만 bulk_update
+- 남는 새 행은 bulk_create, 줄어든 행은 DELETE 한 번
+- 보고서 일자별 집계(reports.rollup), 검색 색인, 계약 합계(expenses.totals)도 여기서 한 번에 반영
+"""
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from accounts import kpis
+from reports import rollup
+
+from . import searchindex, totals
+from .models import ContractItem
+
+# POST 배열 이름 → ContractItem 필드
+POST_ARRAYS = {
+    "name":       "item_name[]",
+    "qty":        "qty[]",
+    "spec":       "spec[]",
+    "sell_unit":  "sell_unit[]",
+    "sell_total": "sell_total[]",
+    "buy_unit":   "buy_unit[]",
+    "buy_total":  "buy_total[]",
+    "vendor":     "vendor[]",
+    "vat_mode":   "item_vat_mode[]",
+}
+FIELDS = tuple(POST_ARRAYS)
+MONEY_FIELDS = {"sell_unit": "매출단가", "sell_total": "매출금액", "buy_unit": "매입단가", "buy_total": "매입금액"}
+CENT = Decimal("0.01")
+
+
+def _d(v):
+    """'1,234' -> Decimal('1234'); blanks -> Decimal('0')"""
+    s = (str(v) if v is not None else "").replace(",", "").strip()
+    try:
+        return Decimal(s) if s else Decimal("0")
+    except InvalidOperation:
+        return Decimal("0")
+
+
+def _i(v):
+    """int parser that tolerates commas/blank"""
+    try:
+        return int(_d(v))
+    except Exception:
+        return 0
+
+
+def parse_item_rows(post):
+    """
+    병렬 POST 배열 → 품목 dict 리스트 + 오류 dict({"품목 N행": [...]})
+    - 품목명이 없거나 수량이 0 이하인 행은 건너뜀 (기존과 동일)
+    - 금액은 소수 둘째 자리로 반올림 후 DecimalField 자릿수(14,2) 검증
+    """
+    arrays = {f: post.getlist(key) or [] for f, key in POST_ARRAYS.items()}
+
+    def get(f, i, default=""):
+        lst = arrays[f]
+        return lst[i] if i < len(lst) else default
+
+    rows, errors = [], {}
+    for i in range(len(arrays["name"])):
+        name = (get("name", i) or "").strip()
+        qty  = _i(get("qty", i, 0))
+        if not name or qty <= 0:
+            continue  # 서버에서도 최소 검증
+
+        row = {
+            "name": name,
+            "qty": qty,
+            "spec": get("spec", i) or "",
+            "vendor": get("vendor", i) or "",
+            "vat_mode": get("vat_mode", i, "separate") or "separate",
+        }
+        row_errors = []
+        for f, label in MONEY_FIELDS.items():
+            value = _d(get(f, i, 0)).quantize(CENT, rounding=ROUND_HALF_UP)
+            try:
+                row[f] = ContractItem._meta.get_field(f).clean(value, None)
+            except ValidationError as e:
+                row_errors.append(f"{label}: {' '.join(e.messages)}")
+        if row_errors:
+            errors[f"품목 {i + 1}행"] = row_errors
+        rows.append(row)
+    return rows, errors
+
+
+def _changed(item, row):
+    return any(getattr(item, f) != row[f] for f in FIELDS)
+
+
+def save_items(contract, rows):
+    """
+    contract 의 품목을 rows 와 같게 맞춤 (트랜잭션 안에서 호출)
+    - 호출하는 쪽이 같은 트랜잭션에서 contract.save() 를 하므로 계약 updated_at 은 이미 갱신된 상태
+    반환: (추가, 수정, 삭제) 건수
+    """
+    before = rollup.contribution(contract.pk)
+    existing = list(ContractItem.objects.filter(contract=contract).order_by("id"))
+
+    now = timezone.now()
+    to_update, to_create = [], []
+    for item, row in zip(existing, rows):
+        if _changed(item, row):
+            for f in FIELDS:
+                setattr(item, f, row[f])
+            item.updated_at = now  # bulk_update 는 auto_now 를 채우지 않음
+            to_update.append(item)
+    for row in rows[len(existing):]:
+        to_create.append(ContractItem(contract=contract, **row))
+    to_delete = [item.pk for item in existing[len(rows):]]
+
+    if to_update:
+        ContractItem.objects.bulk_update(to_update, FIELDS + ("updated_at",))
+    if to_create:
+        ContractItem.objects.bulk_create(to_create)
+    if to_delete:
+        ContractItem.objects.filter(pk__in=to_delete).delete()
+
+    if to_update or to_create or to_delete:
+        # 품목 색인은 행 단위 시그널 없이 여기서 계약당 한 번만
+        searchindex.reindex("item.vendor", contract.pk)
+        searchindex.reindex("item.name", contract.pk)
+        # 보고서 일자별 집계 증분 반영
+        rollup.apply_delta(contract, before, rollup.contribution(contract.pk))
+
+    # 계약 합계 칼럼 (저장 후 품목 == rows 이므로 rows 로 바로 계산)
+    values = totals.from_rows(rows)
+    if any(getattr(contract, f) != v for f, v in values.items()):
+        totals.store(contract, values)
+        transaction.on_commit(kpis.invalidate)  # 대시보드 이번 달 매출/매입
+    return len(to_create), len(to_update), len(to_delete)
@@ -0,0 +1,166 @@
+# expenses/jobs.py
+"""
+DB 기반 백그라운드 작업 큐 (외부 브로커 없음)
+
+    # 작업 등록 (요청 트랜잭션 안에서 호출하면 커밋될 때 함께 보임)
+    jobs.enqueue("contract_image.derivatives", image_id=img.pk)
+
+    # 작업 처리기 등록
+    @jobs.handler("contract_image.derivatives")
+    def generate(image_id): ...
+
+    # 워커 실행
+    python manage.py run_jobs
+
+처리기는 트랜잭션 밖에서 실행되고, 도는 동안 heartbeat 로 lease 를 연장한다.
+heartbeat 가 LEASE_SECONDS 동안 끊긴 작업만 다른 워커가 다시 가져간다.
+"""
+import datetime
+import logging
+import threading
+import traceback
+
+from django.db import connection
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# 처리중(running)인데 이 시간 동안 heartbeat 가 없으면 워커가 죽은 것으로 보고 다시 가져감
+LEASE_SECONDS = 10 * 60
+# 실행 중인 워커가 lease 를 연장하는 간격
+HEARTBEAT_SECONDS = LEASE_SECONDS / 5
+
+_handlers = {}
+
+
+def handler(kind, on_failure=None):
+    """작업 처리기 등록. on_failure(**payload) 는 재시도를 모두 소진했을 때 호출"""
+    def deco(fn):
+        _handlers[kind] = (fn, on_failure)
+        return fn
+    return deco
+
+
+def enqueue(kind, max_attempts=3, run_after=None, **payload):
+    """run_after 를 주면 그 시각 이후에 실행"""
+    return Job.objects.create(
+        kind=kind, payload=payload, max_attempts=max_attempts, run_after=run_after or timezone.now(),
+    )
+
+
+def _backoff(attempts):
+    return datetime.timedelta(seconds=min(300, 10 * 2 ** max(0, attempts - 1)))
+
+
+def claim_next(kinds=None):
+    """
+    실행할 작업 1건을 가져와 running 으로 표시
+    - 조건부 UPDATE(status/locked_at 이 그대로일 때만)로 선점하므로 워커 여러 개가 동시에 돌아도 중복 실행 없음
+    - locked_at 은 이번 실행의 선점 토큰: 끝낼 때도 토큰이 그대로일 때만 상태를 씀
+    """
+    now = timezone.now()
+    stale = now - datetime.timedelta(seconds=LEASE_SECONDS)
+    ready = (
+        Q(status="pending", run_after__lte=now)
+        | Q(status="running", heartbeat_at__lt=stale)
+        | Q(status="running", heartbeat_at__isnull=True, locked_at__lt=stale)
+    )
+    qs = Job.objects.filter(ready)
+    if kinds:
+        qs = qs.filter(kind__in=kinds)
+
+    for job in qs.order_by("run_after", "id")[:10]:
+        claimed = (
+            Job.objects.filter(pk=job.pk, status=job.status, locked_at=job.locked_at)
+            .update(status="running", locked_at=now, heartbeat_at=now, attempts=F("attempts") + 1)
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+    return None
+
+
+def _owned(job):
+    """이번 실행이 아직 작업을 소유하고 있을 때만 걸리는 조건 (lease 를 잃었으면 0건)"""
+    return Job.objects.filter(pk=job.pk, status="running", locked_at=job.locked_at)
+
+
+class _Heartbeat(threading.Thread):
+    """처리기가 도는 동안 HEARTBEAT_SECONDS 마다 heartbeat_at 갱신 (별도 DB 연결)"""
+
+    def __init__(self, job):
+        super().__init__(name=f"job-heartbeat-{job.pk}", daemon=True)
+        self.job = job
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self.stopped.wait(HEARTBEAT_SECONDS):
+                try:
+                    if not _owned(self.job).update(heartbeat_at=timezone.now()):
+                        logger.warning("job lease lost: %s", self.job)
+                        return
+                except Exception:
+                    logger.warning("job heartbeat failed: %s", self.job, exc_info=True)
+        finally:
+            connection.close()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def run_job(job):
+    """
+    작업 1건 실행 → 완료/재시도/실패 처리
+    - 처리기는 트랜잭션 밖에서 호출 (파일 업로드/엑셀 생성 동안 DB 트랜잭션을 잡고 있지 않도록,
+      필요한 곳에서 처리기가 직접 짧은 transaction.atomic() 을 씀)
+    - 상태 기록은 선점 토큰(locked_at)이 그대로일 때만 → lease 를 잃은 늦은 워커가 새 실행을 덮어쓰지 않음
+    """
+    fn, on_failure = _handlers.get(job.kind, (None, None))
+    heartbeat = _Heartbeat(job)
+    heartbeat.start()
+    try:
+        if fn is None:
+            raise LookupError(f"등록되지 않은 작업 종류: {job.kind}")
+        fn(**job.payload)
+    except Exception:
+        heartbeat.stop()
+        error = traceback.format_exc()[-4000:]
+        retry = fn is not None and job.attempts < job.max_attempts
+        changes = {"locked_at": None, "heartbeat_at": None, "last_error": error, "updated_at": timezone.now()}
+        if retry:
+            changes.update(status="pending", run_after=timezone.now() + _backoff(job.attempts))
+        else:
+            changes.update(status="failed")
+        if not _owned(job).update(**changes):
+            logger.warning("job lease lost before failure was recorded: %s", job)
+            return False
+        if not retry and on_failure:
+            try:
+                on_failure(**job.payload)
+            except Exception:
+                logger.warning("job on_failure failed: %s", job, exc_info=True)
+        return False
+
+    heartbeat.stop()
+    done = _owned(job).update(status="done", locked_at=None, heartbeat_at=None, updated_at=timezone.now())
+    if not done:
+        logger.warning("job lease lost before completion was recorded: %s", job)
+        return False
+    return True
+
+
+def run_pending(limit=None, kinds=None):
+    """대기 중인 작업을 limit 건까지 처리. 처리한 건수 반환"""
+    n = 0
+    while limit is None or n < limit:
+        job = claim_next(kinds)
+        if job is None:
+            break
+        run_job(job)
+        n += 1
+    return n
@@ -0,0 +1,96 @@
+# expenses/management/commands/bench_image_derivatives.py
+"""
+계약 이미지 파생본 생성 벤치마크 (12MP 휴대폰 사진 기준)
+
+기존 방식: 크기마다 원본을 다시 열어 exif 보정 → RGB 변환 → thumbnail (240, 1200, 엑셀용 200)
+새 방식:   expenses.signals.render_ladder — 원본 1회 읽기 + JPEG draft 축소 디코드 + 단계적 축소
+
+    python manage.py bench_image_derivatives --photos 5
+"""
+import io
+import time
+
+from django.core.management.base import BaseCommand
+from PIL import Image, ImageOps
+
+from expenses.signals import EXPORT_SIZE, render_ladder
+
+
+class _CountingReader(io.BytesIO):
+    """읽은 바이트 수를 세는 파일 객체 (스토리지에서 받아오는 양 대신 측정)"""
+
+    bytes_read = 0
+
+    def read(self, *args):
+        data = super().read(*args)
+        type(self).bytes_read += len(data)
+        return data
+
+    def readinto(self, b):
+        n = super().readinto(b)
+        type(self).bytes_read += n or 0
+        return n
+
+
+def _legacy_resize(data, max_side, fmt):
+    """기존 _resize_to_jpeg: 호출마다 원본 전체를 다시 열고 디코드"""
+    img = Image.open(_CountingReader(data))
+    img = ImageOps.exif_transpose(img)
+    img = img.convert("RGB")
+    img.thumbnail((max_side, max_side))
+    buf = io.BytesIO()
+    if fmt == "PNG":
+        img.save(buf, format="PNG")
+    else:
+        img.save(buf, format="JPEG", quality=82, optimize=True)
+    return buf.getvalue()
+
+
+def _make_photo(seed, size=(4000, 3000)):
+    """12MP 휴대폰 사진 비슷한(노이즈 섞인) JPEG 생성"""
+    base = Image.radial_gradient("L").resize(size)
+    noise = Image.effect_noise(size, 40 + seed)
+    img = Image.merge("RGB", (base, noise, Image.linear_gradient("L").resize(size)))
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=92)
+    return buf.getvalue()
+
+
+class Command(BaseCommand):
+    help = "파생본 생성: 크기별 재디코드(기존) vs 1회 디코드 사다리(render_ladder) CPU/읽기량 비교"
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("--photos", type=int, default=5, help="테스트할 사진 수 (기본 5)")
+
+    def handle(self, *args, **opts):
+        ladder = [(1200, "JPEG"), (240, "JPEG"), (EXPORT_SIZE, "PNG")]
+        photos = [_make_photo(i) for i in range(opts["photos"])]
+        self.stdout.write(
+            f"사진 {len(photos)}장 (4000x3000, 평균 {sum(map(len, photos)) / len(photos) / 1e6:.1f} MB)"
+        )
+
+        _CountingReader.bytes_read = 0
+        t0 = time.process_time()
+        for data in photos:
+            for side, fmt in ladder:
+                _legacy_resize(data, side, fmt)
+        legacy_cpu, legacy_bytes = time.process_time() - t0, _CountingReader.bytes_read
+
+        _CountingReader.bytes_read = 0
+        t0 = time.process_time()
+        for data in photos:
+            render_ladder(_CountingReader(data), ladder)
+        ladder_cpu, ladder_bytes = time.process_time() - t0, _CountingReader.bytes_read
+
+        n = len(photos)
+        self.stdout.write(
+            f"기존   CPU {legacy_cpu / n * 1000:7.1f} ms/장 | 원본 읽기 {legacy_bytes / n / 1e6:5.1f} MB/장"
+        )
+        self.stdout.write(
+            f"사다리 CPU {ladder_cpu / n * 1000:7.1f} ms/장 | 원본 읽기 {ladder_bytes / n / 1e6:5.1f} MB/장"
+        )
+        if ladder_cpu:
+            self.stdout.write(self.style.SUCCESS(
+                f"CPU x{legacy_cpu / ladder_cpu:.1f}, 읽기량 x{legacy_bytes / max(1, ladder_bytes):.1f} 절감"
+            ))
@@ -0,0 +1,31 @@
+# expenses/management/commands/rebuild_contract_totals.py
+"""
+계약 합계 칼럼(sell_sum/buy_sum/profit/margin_rate) 재계산 + 품목 대조
+
+    python manage.py rebuild_contract_totals            # 전체 재계산 후 검증
+    python manage.py rebuild_contract_totals --verify   # 재계산 없이 검증만
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from expenses import totals
+
+
+class Command(BaseCommand):
+    help = "Contract 합계 칼럼을 품목에서 다시 계산하고, 품목과 일치하는지 검증"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--verify", action="store_true", help="재계산하지 않고 검증만 수행")
+
+    def handle(self, *args, **opts):
+        if not opts["verify"]:
+            with transaction.atomic():
+                n = totals.rebuild()
+            self.stdout.write(f"계약 {n}건 합계 재계산")
+
+        diffs = totals.verify()
+        for pk, raw, stored in diffs[:50]:
+            self.stderr.write(f"불일치 계약 #{pk}: 품목={raw} 저장={stored}")
+        if diffs:
+            raise CommandError(f"합계 불일치 {len(diffs)}건")
+        self.stdout.write(self.style.SUCCESS("계약 합계가 품목과 일치합니다."))
@@ -0,0 +1,30 @@
+# expenses/management/commands/rebuild_search_index.py
+"""
+부분일치 검색 색인(SearchGram) 재구성 — PostgreSQL(pg_trgm) 환경에서는 할 일 없음
+
+    python manage.py rebuild_search_index
+    python manage.py rebuild_search_index --key item.vendor --key item.name
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from expenses import searchindex
+
+
+class Command(BaseCommand):
+    help = "계약/품목/거래처 부분일치 검색용 n-gram 색인을 다시 만듦"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--key", action="append", help=f"대상 ({', '.join(searchindex.SOURCES)})")
+
+    def handle(self, *args, **opts):
+        if searchindex.use_trigram():
+            self.stdout.write("PostgreSQL pg_trgm 인덱스를 사용하므로 재구성할 색인이 없습니다.")
+            return
+        keys = opts["key"] or list(searchindex.SOURCES)
+        unknown = [k for k in keys if k not in searchindex.SOURCES]
+        if unknown:
+            raise CommandError(f"알 수 없는 대상: {', '.join(unknown)}")
+        with transaction.atomic():
+            n = searchindex.rebuild(keys)
+        self.stdout.write(self.style.SUCCESS(f"색인 {n}건 재구성"))
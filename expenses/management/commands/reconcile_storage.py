@@ -0,0 +1,63 @@
+# expenses/management/commands/reconcile_storage.py
+"""
+스토리지와 DB 대조 — DB 행 없이 남은 파일 찾기/정리 (expenses.storagegc)
+
+    python manage.py reconcile_storage                  # 목록만 출력
+    python manage.py reconcile_storage --delete         # 삭제 대기(StorageOrphan)에 올리고 일괄 삭제
+    python manage.py reconcile_storage --retry          # 자동 재시도 한도를 넘긴 삭제 대기 파일 다시 시도
+"""
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from expenses import storagegc
+from expenses.models import StorageOrphan
+
+
+class Command(BaseCommand):
+    help = "스토리지에만 있고 DB 에서 참조하지 않는 파일을 찾아 보고/삭제"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--delete", action="store_true", help="찾은 파일 삭제")
+        parser.add_argument("--retry", action="store_true", help="삭제 대기 중인 파일 전부 다시 삭제 시도")
+        parser.add_argument(
+            "--prefix", action="append", dest="prefixes",
+            help=f"대상 경로 (기본: {', '.join(storagegc.PREFIXES)})",
+        )
+        parser.add_argument(
+            "--older-than", type=float, default=24,
+            help="이 시간(시간 단위)보다 오래된 파일만 대상 (업로드 중인 파일 보호, 기본 24)",
+        )
+
+    def handle(self, *args, **opts):
+        if opts["retry"]:
+            n = StorageOrphan.objects.update(attempts=0)
+            deleted, failed = storagegc.sweep()
+            self.stdout.write(f"삭제 대기 {n}건 재시도: 삭제 {deleted}건, 실패 {failed}건")
+            if failed:
+                raise CommandError(f"삭제 실패 {failed}건 (StorageOrphan.last_error 참고)")
+            return
+
+        if opts["older_than"] < 0:
+            raise CommandError("--older-than 은 0 이상이어야 합니다.")
+        names = storagegc.find_unreferenced(
+            prefixes=opts["prefixes"] or storagegc.PREFIXES,
+            older_than=datetime.timedelta(hours=opts["older_than"]),
+        )
+        for name in names[:200]:
+            self.stdout.write(name)
+        if len(names) > 200:
+            self.stdout.write(f"... 외 {len(names) - 200}건")
+
+        if not names:
+            self.stdout.write(self.style.SUCCESS("DB 에서 참조하지 않는 파일이 없습니다."))
+            return
+        if not opts["delete"]:
+            self.stdout.write(f"참조 없는 파일 {len(names)}건 (--delete 로 삭제)")
+            return
+
+        StorageOrphan.objects.bulk_create(
+            [StorageOrphan(name=n) for n in names], batch_size=storagegc.BATCH, ignore_conflicts=True,
+        )
+        deleted, failed = storagegc.sweep(names)
+        self.stdout.write(self.style.SUCCESS(f"참조 없는 파일 {deleted}건 삭제") + (f", 실패 {failed}건" if failed else ""))
@@ -0,0 +1,33 @@
+# expenses/management/commands/run_jobs.py
+"""
+백그라운드 작업 워커 (expenses.jobs)
+
+    python manage.py run_jobs            # 계속 돌면서 대기 작업 처리
+    python manage.py run_jobs --once     # 대기 작업만 처리하고 종료 (cron 용)
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from expenses import jobs
+
+
+class Command(BaseCommand):
+    help = "DB 작업 큐(expenses.Job)의 대기 작업을 처리하는 로컬 워커"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="대기 작업을 모두 처리하면 종료")
+        parser.add_argument("--sleep", type=float, default=2.0, help="작업이 없을 때 대기 시간(초)")
+        parser.add_argument("--kind", action="append", dest="kinds", help="처리할 작업 종류 (여러 번 지정 가능)")
+
+    def handle(self, *args, **opts):
+        while True:
+            close_old_connections()
+            n = jobs.run_pending(kinds=opts["kinds"])
+            if n:
+                self.stdout.write(f"작업 {n}건 처리")
+            if opts["once"]:
+                break
+            if not n:
+                time.sleep(opts["sleep"])
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.5 on 2026-10-17 05:59
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def mark_existing_images(apps, schema_editor):
+    """기존 이미지: 파생본이 있으면 완료, 없으면 생성 작업 등록"""
+    ContractImage = apps.get_model("expenses", "ContractImage")
+    Job = apps.get_model("expenses", "Job")
+    ContractImage.objects.exclude(thumb="").update(deriv_status="ready")
+    Job.objects.bulk_create([
+        Job(kind="contract_image.derivatives", payload={"image_id": pk})
+        for pk in ContractImage.objects.filter(thumb="").values_list("pk", flat=True)
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contractimage',
+            name='deriv_status',
+            field=models.CharField(choices=[('pending', '생성대기'), ('ready', '생성완료'), ('failed', '생성실패')], default='pending', max_length=10),
+        ),
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=50)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('pending', '대기'), ('running', '처리중'), ('done', '완료'), ('failed', '실패')], default='pending', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('max_attempts', models.PositiveIntegerField(default=3)),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'run_after'], name='expenses_jo_status_403560_idx')],
+            },
+        ),
+        migrations.RunPython(mark_existing_images, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-17 06:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0002_contractimage_deriv_status_job'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contract',
+            index=models.Index(fields=['created_at', 'id'], name='contract_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contract',
+            index=models.Index(fields=['status', 'created_at', 'id'], name='contract_status_created_idx'),
+        ),
+    ]
@@ -0,0 +1,99 @@
+# Generated by Django 5.2.5 on 2026-10-17 06:05
+
+from django.db import migrations, models
+
+# 마이그레이션 시점의 색인 대상 (expenses.searchindex 를 import 하지 않고 그대로 옮겨 둠)
+N = 2
+
+# key -> (app_label, model, 색인 대상 id 칼럼, 텍스트 칼럼)
+SOURCES = {
+    "contract.customer": ("expenses", "Contract",               "id",         "customer_company"),
+    "item.vendor":       ("expenses", "ContractItem",           "contract_id", "vendor"),
+    "item.name":         ("expenses", "ContractItem",           "contract_id", "name"),
+    "sales.name":        ("partners", "SalesPartner",           "id",         "name"),
+    "sales.contact":     ("partners", "SalesPartnerContact",    "partner_id", "name"),
+    "purchase.name":     ("partners", "PurchasePartner",        "id",         "name"),
+    "purchase.contact":  ("partners", "PurchasePartnerContact", "partner_id", "name"),
+}
+
+TRIGRAM_COLUMNS = [
+    ("expenses_contract", "customer_company"),
+    ("expenses_contractitem", "vendor"),
+    ("expenses_contractitem", "name"),
+    ("partners_salespartner", "name"),
+    ("partners_salespartner_contact", "name"),
+    ("partners_purchasepartner", "name"),
+    ("partners_purchasepartner_contact", "name"),
+]
+
+
+def _grams(text):
+    s = (text or "").lower()
+    return {s[i:i + N] for i in range(len(s) - N + 1)}
+
+
+def _trgm_index_name(table, column):
+    return f"{table}_{column}_trgm"
+
+
+def _rebuild(apps, batch_size=2000):
+    """SearchGram 전체 채우기 (당시 searchindex.rebuild 와 같은 동작)"""
+    SearchGram = apps.get_model("expenses", "SearchGram")
+    batch = []
+    for key, (app_label, model_name, id_field, text_field) in SOURCES.items():
+        model = apps.get_model(app_label, model_name)
+        per_obj = {}
+        for obj_id, text in model.objects.values_list(id_field, text_field).iterator():
+            if obj_id is not None:
+                per_obj.setdefault(obj_id, set()).update(_grams(text))
+        for obj_id, gs in per_obj.items():
+            batch.extend(SearchGram(key=key, obj_id=obj_id, gram=g) for g in gs)
+            if len(batch) >= batch_size:
+                SearchGram.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+    if batch:
+        SearchGram.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def build_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        # icontains 는 UPPER(col) LIKE UPPER(%q%) 로 나가므로 같은 식에 인덱스를 건다
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for table, column in TRIGRAM_COLUMNS:
+            schema_editor.execute(
+                f'CREATE INDEX IF NOT EXISTS "{_trgm_index_name(table, column)}" '
+                f'ON "{table}" USING gin (UPPER("{column}") gin_trgm_ops)'
+            )
+    else:
+        _rebuild(apps)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        for table, column in TRIGRAM_COLUMNS:
+            schema_editor.execute(f'DROP INDEX IF EXISTS "{_trgm_index_name(table, column)}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0003_contract_search_indexes'),
+        ('partners', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchGram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=32)),
+                ('obj_id', models.PositiveBigIntegerField()),
+                ('gram', models.CharField(max_length=8)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['key', 'obj_id'], name='expenses_se_key_e688df_idx')],
+                'constraints': [models.UniqueConstraint(fields=('key', 'gram', 'obj_id'), name='uniq_searchgram_key_gram_obj')],
+            },
+        ),
+        migrations.RunPython(build_index, drop_index),
+    ]
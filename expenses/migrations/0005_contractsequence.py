@@ -0,0 +1,37 @@
+# Generated by Django 5.2.5 on 2026-10-17 06:07
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def seed(apps, schema_editor):
+    """기존 계약의 연도별 최대 seq 로 카운터 시작값 설정"""
+    Contract = apps.get_model("expenses", "Contract")
+    ContractSequence = apps.get_model("expenses", "ContractSequence")
+    rows = (
+        Contract.objects.filter(year__isnull=False)
+        .order_by()
+        .values("year")
+        .annotate(m=Max("seq"))
+    )
+    ContractSequence.objects.bulk_create(
+        [ContractSequence(year=r["year"], last=r["m"] or 0) for r in rows]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0004_searchgram'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContractSequence',
+            fields=[
+                ('year', models.PositiveIntegerField(primary_key=True, serialize=False)),
+                ('last', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(seed, migrations.RunPython.noop),
+    ]
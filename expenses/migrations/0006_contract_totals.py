@@ -0,0 +1,64 @@
+# Generated by Django 5.2.5 on 2026-10-17 06:09
+
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import migrations, models
+from django.db.models import DecimalField, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill(apps, schema_editor):
+    """기존 계약의 품목 합계로 sell_sum/buy_sum/profit/margin_rate 채움 (당시 expenses.totals.compute 와 같은 계산)"""
+    Contract = apps.get_model("expenses", "Contract")
+    ContractItem = apps.get_model("expenses", "ContractItem")
+    amount = DecimalField(max_digits=18, decimal_places=2)
+    zero = Value(Decimal("0"), output_field=amount)
+
+    sums = {
+        r["contract_id"]: (r["sell"], r["buy"])
+        for r in ContractItem.objects.filter(contract__isnull=False).order_by().values("contract_id").annotate(
+            sell=Coalesce(Sum("sell_total", output_field=amount), zero),
+            buy=Coalesce(Sum("buy_total", output_field=amount), zero),
+        )
+    }
+    objs = []
+    for pk in Contract.objects.filter(pk__in=sums).values_list("pk", flat=True):
+        sell_sum, buy_sum = sums[pk]
+        profit = sell_sum - buy_sum
+        margin_rate = (
+            (profit / sell_sum * Decimal("100")).quantize(Decimal("0.0001"), rounding=ROUND_HALF_UP)
+            if sell_sum > 0 else None
+        )
+        objs.append(Contract(pk=pk, sell_sum=sell_sum, buy_sum=buy_sum, profit=profit, margin_rate=margin_rate))
+    Contract.objects.bulk_update(objs, ["sell_sum", "buy_sum", "profit", "margin_rate"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0005_contractsequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contract',
+            name='buy_sum',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=18),
+        ),
+        migrations.AddField(
+            model_name='contract',
+            name='margin_rate',
+            field=models.DecimalField(blank=True, decimal_places=4, editable=False, max_digits=20, null=True),
+        ),
+        migrations.AddField(
+            model_name='contract',
+            name='profit',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=18),
+        ),
+        migrations.AddField(
+            model_name='contract',
+            name='sell_sum',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=18),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
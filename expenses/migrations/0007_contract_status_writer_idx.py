@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-17 06:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0006_contract_totals'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contract',
+            index=models.Index(fields=['status', 'writer'], name='contract_status_writer_idx'),
+        ),
+    ]
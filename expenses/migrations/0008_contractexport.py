@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-17 06:19
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0007_contract_status_writer_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContractExport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64)),
+                ('query', models.TextField(blank=True)),
+                ('status', models.CharField(choices=[('pending', '생성중'), ('ready', '완료'), ('failed', '실패')], default='pending', max_length=10)),
+                ('file', models.FileField(blank=True, max_length=255, upload_to='exports/contracts/%Y/%m/%d/')),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('job', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='expenses.job')),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['key', 'created_at'], name='expenses_co_key_814b50_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.5 on 2026-10-17 06:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery
+
+
+def backfill(apps, schema_editor):
+    """기존 행의 updated_at 은 마이그레이션 시각 대신 계약 등록일로"""
+    Contract = apps.get_model("expenses", "Contract")
+    ContractItem = apps.get_model("expenses", "ContractItem")
+    Contract.objects.update(updated_at=F("created_at"))
+    ContractItem.objects.filter(contract__isnull=False).update(
+        updated_at=Subquery(Contract.objects.filter(pk=OuterRef("contract_id")).values("created_at")[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0008_contractexport'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('query', models.TextField(blank=True)),
+                ('watermark', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='contract',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='contractexport',
+            name='since',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='contractexport',
+            name='until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='contractitem',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='contractexport',
+            name='snapshot',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='exports', to='expenses.exportsnapshot'),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-17 06:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0009_change_tracking'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('original', models.CharField(max_length=255)),
+                ('thumb', models.CharField(blank=True, max_length=255)),
+                ('medium', models.CharField(blank=True, max_length=255)),
+                ('size', models.BigIntegerField(default=0)),
+                ('refcount', models.IntegerField(default=0)),
+                ('deriv_status', models.CharField(choices=[('pending', '생성대기'), ('ready', '생성완료'), ('failed', '생성실패')], default='pending', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='contractimage',
+            name='blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='images', to='expenses.imageblob'),
+        ),
+    ]
@@ -4,7 +4,8 @@ from django.db import models
 from django.db import models, transaction
 from django.db.models import Max
 from django.utils import timezone
-from django.core.files.storage import default_storage
+
+from . import signedurls
 
 # ---------------- 기존 보고서 모델 ----------------
 class ExpenseReport(models.Model):
@@ -82,32 +83,45 @@ class Contract(models.Model):
 
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="draft")
     created_at = models.DateTimeField(auto_now_add=True)
+    # 변경분 엑셀(expenses.exportjobs) 기준 — save(update_fields=...) 로 상태만 바꿔도 함께 갱신
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     # ✅ 처음엔 null 허용으로 추가 (마이그레이션/백필 후 원하면 null=False로 변경)
     contract_no = models.CharField(max_length=32, unique=True, blank=True, null=True)
     year = models.PositiveIntegerField(editable=False, db_index=True, null=True, blank=True)
     seq  = models.PositiveIntegerField(editable=False, null=True, blank=True)
 
+    # 품목 합계 (expenses.totals 가 품목 저장 시 함께 갱신)
+    sell_sum    = models.DecimalField(max_digits=18, decimal_places=2, default=0, editable=False)
+    buy_sum     = models.DecimalField(max_digits=18, decimal_places=2, default=0, editable=False)
+    profit      = models.DecimalField(max_digits=18, decimal_places=2, default=0, editable=False)
+    margin_rate = models.DecimalField(max_digits=20, decimal_places=4, null=True, blank=True, editable=False)  # 매출 0이면 None
+
     class Meta:
         constraints = [
             models.UniqueConstraint(fields=['year', 'seq'], name='uniq_contract_year_seq'),
         ]
+        # 목록/검색 정렬(-created_at, -id) + 상태별 목록용 + 상태별 건수(직원모드 본인 것)
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="contract_created_idx"),
+            models.Index(fields=["status", "created_at", "id"], name="contract_status_created_idx"),
+            models.Index(fields=["status", "writer"], name="contract_status_writer_idx"),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.pk and not self.contract_no:
+            from .sequences import next_contract_seq
+
             y = timezone.localdate().year
             self.year = y
+            # 번호 발급과 INSERT 를 한 트랜잭션으로 → INSERT 가 실패하면 번호도 되돌아가 빈 번호가 생기지 않음
             with transaction.atomic():
-                last_seq = (
-                    Contract.objects
-                    .filter(year=y)
-                    .select_for_update()
-                    .order_by('-seq')
-                    .values_list('seq', flat=True)
-                    .first() or 0
-                )
-                self.seq = last_seq + 1
+                self.seq = next_contract_seq(y)
                 self.contract_no = f"{y}DJ{self.seq}"
+                super().save(*args, **kwargs)
+            return
+        if kwargs.get("update_fields"):
+            kwargs["update_fields"] = {*kwargs["update_fields"], "updated_at"}
         super().save(*args, **kwargs)
 
     @property
@@ -121,13 +135,6 @@ class Contract(models.Model):
     def __str__(self):
         return f"[{self.get_status_display()}] {self.title} (#{self.pk})"
     
-    def delete(self, *args, **kwargs):
-        # 연결된 이미지 전부 개별 삭제 (S3 파일까지)
-        for img in list(self.images.all()):
-            img.delete()
-        # 그 다음 계약 자체 삭제
-        super().delete(*args, **kwargs)
-
     
 class ContractItem(models.Model):
     VAT_CHOICES = [
@@ -146,6 +153,7 @@ class ContractItem(models.Model):
     buy_total  = models.DecimalField(max_digits=14, decimal_places=2, default=0)
     vendor     = models.CharField(max_length=200, blank=True)
     vat_mode   = models.CharField(max_length=10, choices=VAT_CHOICES, default="separate")
+    updated_at = models.DateTimeField(auto_now=True)
 
     def margin_month(self):
         """세금계산서 발행일 기준 YYYY-MM 문자열 반환"""
@@ -159,8 +167,38 @@ class ContractItem(models.Model):
     def __str__(self):
         return f"{self.name} x{self.qty}"
     
+DERIV_STATUS_CHOICES = [
+    ("pending", "생성대기"),
+    ("ready",   "생성완료"),
+    ("failed",  "생성실패"),
+]
+
+
+class ImageBlob(models.Model):
+    """
+    내용(sha256) 기준 사진 원본 + 파생본 (expenses.imagestore)
+    - 같은 파일을 여러 계약에 올려도 스토리지에는 한 벌만 두고 ContractImage 들이 함께 참조
+    - refcount: 참조하는 ContractImage 수. 0 이 되면 스토리지 파일과 함께 삭제
+    """
+    sha256   = models.CharField(max_length=64, unique=True)
+    original = models.CharField(max_length=255)          # 스토리지 경로
+    thumb    = models.CharField(max_length=255, blank=True)
+    medium   = models.CharField(max_length=255, blank=True)
+    size     = models.BigIntegerField(default=0)
+    refcount = models.IntegerField(default=0)
+    deriv_status = models.CharField(max_length=10, choices=DERIV_STATUS_CHOICES, default="pending")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.sha256[:12]} x{self.refcount}"
+
+
 class ContractImage(models.Model):
+    DERIV_STATUS_CHOICES = DERIV_STATUS_CHOICES
+
     contract = models.ForeignKey(Contract, on_delete=models.CASCADE, related_name="images")
+    # 내용 기준 공유 저장소 (없으면 예전 방식: 이 행이 파일을 단독 소유)
+    blob     = models.ForeignKey(ImageBlob, on_delete=models.PROTECT, null=True, blank=True, related_name="images")
 
     original = models.ImageField(upload_to="contracts/orig/%Y/%m/%d/")
     thumb    = models.ImageField(upload_to="contracts/thumb/%Y/%m/%d/", blank=True)
@@ -171,6 +209,9 @@ class ContractImage(models.Model):
     height   = models.IntegerField(null=True, blank=True)
     content_type = models.CharField(max_length=50, blank=True)
 
+    # 썸네일/중간 크기 파생본은 백그라운드 작업(expenses.jobs)에서 생성
+    deriv_status = models.CharField(max_length=10, choices=DERIV_STATUS_CHOICES, default="pending")
+
     uploaded_at  = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -179,13 +220,172 @@ class ContractImage(models.Model):
     def __str__(self):
         return self.filename or self.original.name
 
-    # ✅ 파일 삭제 로직 (S3, Naver, 로컬 모두 자동 지원)
-    def delete(self, *args, **kwargs):
-        for field_name in ["original", "medium", "thumb"]:
-            f = getattr(self, field_name, None)
-            if f and f.name and default_storage.exists(f.name):
-                try:
-                    default_storage.delete(f.name)
-                except Exception as e:
-                    print(f"[WARN] 파일 삭제 실패: {f.name} ({e})")
-        super().delete(*args, **kwargs)
\ No newline at end of file
+    # ---- 파일 교체 감지 (signals.cleanup_files_on_replace) ----
+    # DB 에서 읽은/마지막으로 저장한 시점의 파일 경로를 기억해 두고, 저장할 때 다시 조회하지 않고 비교
+    FILE_ATTNAMES = ("original", "thumb", "medium", "blob_id")
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_files()
+        return instance
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._remember_files(kwargs.get("fields"))
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._remember_files(kwargs.get("update_fields"))
+
+    def _remember_files(self, fields=None):
+        """fields(필드명/attname) 가 주어지면 그 필드만 갱신, 지연 로딩(defer) 필드는 기록하지 않음"""
+        loaded = getattr(self, "_loaded_files", None)
+        if loaded is None or fields is None:
+            loaded = self._loaded_files = {}
+        deferred = self.get_deferred_fields()
+        fields = None if fields is None else {f if f != "blob" else "blob_id" for f in fields}
+        for name in self.FILE_ATTNAMES:
+            if name in deferred or (fields is not None and name not in fields):
+                continue
+            value = getattr(self, name)
+            loaded[name] = value if name == "blob_id" else (value.name or "")
+
+    # 파생본이 아직 없으면(생성대기/실패) 원본으로 대체
+    # 서명 URL 은 만료 전까지 재사용 (expenses.signedurls)
+    @property
+    def thumb_url(self):
+        f = self.thumb or self.original
+        return signedurls.url(f.name) if f else ""
+
+    @property
+    def medium_url(self):
+        f = self.medium or self.original
+        return signedurls.url(f.name) if f else ""
+
+
+# ---------------- 계약번호 연도별 카운터 (expenses.sequences) ----------------
+class ContractSequence(models.Model):
+    year = models.PositiveIntegerField(primary_key=True)
+    last = models.PositiveIntegerField(default=0)  # 마지막으로 발급한 seq
+
+    def __str__(self):
+        return f"{self.year}: {self.last}"
+
+
+# ---------------- 백그라운드 작업 큐 (expenses.jobs) ----------------
+class Job(models.Model):
+    STATUS_CHOICES = [
+        ("pending", "대기"),
+        ("running", "처리중"),
+        ("done",    "완료"),
+        ("failed",  "실패"),
+    ]
+
+    kind    = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict, blank=True)
+    status  = models.CharField(max_length=10, choices=STATUS_CHOICES, default="pending")
+
+    attempts     = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after    = models.DateTimeField(default=timezone.now)
+    locked_at    = models.DateTimeField(null=True, blank=True)   # 가져간 시각 = 그 실행의 선점 토큰
+    heartbeat_at = models.DateTimeField(null=True, blank=True)   # 실행 중 워커가 주기적으로 갱신 (lease 연장)
+    last_error   = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "run_after"])]
+
+    def __str__(self):
+        return f"[{self.get_status_display()}] {self.kind} #{self.pk}"
+
+
+# ---------------- 지울 스토리지 파일 목록 (expenses.storagegc) ----------------
+class StorageOrphan(models.Model):
+    """
+    DB 에서 참조가 끊긴 스토리지 파일 이름
+    - 삭제하는 트랜잭션 안에서 기록 → 커밋 후 한꺼번에 삭제 (S3 는 DeleteObjects 1회/1000개)
+    - 삭제에 실패한 이름은 남겨 두고 백그라운드 작업이 다시 시도
+    """
+    name       = models.CharField(max_length=255, unique=True)
+    attempts   = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+
+# ---------------- 엑셀 내보내기 결과 파일 (expenses.exportjobs) ----------------
+class ContractExport(models.Model):
+    """
+    백그라운드로 만든 계약 엑셀 파일
+    - key: 정규화한 검색조건(쿼리스트링)의 해시 → 같은 조건은 유효시간 안에서 파일 재사용
+    """
+    STATUS_CHOICES = [
+        ("pending", "생성중"),
+        ("ready",   "완료"),
+        ("failed",  "실패"),
+    ]
+
+    key    = models.CharField(max_length=64)
+    query  = models.TextField(blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="pending")
+    file   = models.FileField(upload_to="exports/contracts/%Y/%m/%d/", max_length=255, blank=True)
+    error  = models.TextField(blank=True)
+
+    requested_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    job          = models.ForeignKey(Job, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+
+    # 변경분(delta) 내보내기: (since, until] 사이에 updated_at 이 바뀐 계약만
+    # until 은 등록 시점에 고정 → 워커가 중간에 죽어 다시 실행해도 같은 범위
+    snapshot = models.ForeignKey("ExportSnapshot", on_delete=models.SET_NULL, null=True, blank=True, related_name="exports")
+    since    = models.DateTimeField(null=True, blank=True)
+    until    = models.DateTimeField(null=True, blank=True)
+
+    created_at  = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["key", "created_at"])]
+
+    def __str__(self):
+        return f"[{self.get_status_display()}] export #{self.pk}"
+
+
+class ExportSnapshot(models.Model):
+    """
+    검색조건별 마지막 변경분 내보내기 기준 시각
+    - 변경분 내보내기가 완료되면 watermark 를 그 내보내기의 until 로 올림
+    """
+    key       = models.CharField(max_length=64, unique=True)
+    query     = models.TextField(blank=True)
+    watermark = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"snapshot {self.query or '(전체)'} @ {self.watermark}"
+
+
+# ---------------- 부분일치 검색 색인 (expenses.searchindex) ----------------
+class SearchGram(models.Model):
+    """
+    n-gram 사이드 테이블 (PostgreSQL 이 아닐 때만 사용, PostgreSQL 은 pg_trgm 인덱스)
+    - key   : 검색 대상 (예: "contract.customer", "item.vendor", "sales.name")
+    - obj_id: 검색 결과로 돌려줄 객체 id (품목/담당자 검색은 계약/거래처 id)
+    """
+    key    = models.CharField(max_length=32)
+    obj_id = models.PositiveBigIntegerField()
+    gram   = models.CharField(max_length=8)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["key", "gram", "obj_id"], name="uniq_searchgram_key_gram_obj"),
+        ]
+        indexes = [models.Index(fields=["key", "obj_id"])]
+
+    def __str__(self):
+        return f"{self.key}:{self.gram}#{self.obj_id}"
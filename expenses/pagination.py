@@ -0,0 +1,131 @@
+# expenses/pagination.py
+"""
+계약 목록용 키셋(커서) 페이지네이션
+
+계약 목록은 항상 (-created_at, -id) 순서라서, 페이지 링크에 현재 페이지 마지막 행의
+(created_at, id)를 커서(?cursor=)로 함께 넣는다. 그 링크로 들어온 N 페이지는
+WHERE (created_at, id) < 커서 로 바로 찾아가므로 몇 페이지를 넘겨 가도 1 페이지와 같은 비용이다.
+(앞쪽 페이지는 커서 이상인 행을 반대 순서로 읽어 뒤집음, 커서 없이 주소로 들어오면 OFFSET)
+캐시에 기대지 않으므로 워커마다 캐시가 따로여도(locmem) 똑같이 동작한다.
+
+전체 건수는 정확히 세지 않고 현재 페이지 블록 다음이 있는지 알 만큼만 센다
+(COUNT(*) FROM (... LIMIT n), n 은 CONTRACT_LIST_COUNT_CAP 이상) → 다 세지 못했으면 count_text 가 "1000+".
+템플릿/ _pagination_block 은 기존 Paginator 와 똑같이 쓰고, 페이지 링크에 page_obj.cursor 만 붙인다.
+"""
+import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+VERSION_KEY = "contracts:list:version"
+
+# 화면의 숫자 페이지 묶음 크기 (views._pagination_block 의 block_size 와 같게)
+BLOCK_SIZE = 10
+
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+_US = datetime.timedelta(microseconds=1)
+
+
+def _count_cap():
+    return getattr(settings, "CONTRACT_LIST_COUNT_CAP", 1000)
+
+
+def bump_version():
+    """계약이 추가/수정/삭제되면 호출 → 버전을 키에 넣은 캐시(상태별 건수 등) 전부 무효화"""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 1, None)
+
+
+def encode_cursor(page, row):
+    """page 가 row(직전 페이지 마지막 행) 바로 다음부터 시작한다는 커서 문자열"""
+    return f"{page}.{(row.created_at - _EPOCH) // _US}.{row.pk}"
+
+
+def decode_cursor(value):
+    """커서 문자열 → (page, created_at, pk). 형식이 틀리면 None"""
+    try:
+        page, micros, pk = (int(v) for v in (value or "").split("."))
+    except ValueError:
+        return None
+    if page < 1:
+        return None
+    return page, _EPOCH + datetime.timedelta(microseconds=micros), pk
+
+
+class KeysetPaginator(Paginator):
+    """
+    (-created_at, -id) 정렬 쿼리셋 전용 Paginator
+
+        paginator = KeysetPaginator(qs, per_page, cursor=request.GET.get("cursor"))
+        page_obj = paginator.get_page(request.GET.get("page") or 1)
+        page_obj.cursor   # 이 페이지에서 만드는 페이지 링크에 붙일 커서
+    """
+
+    def __init__(self, object_list, per_page, cursor=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.cursor = decode_cursor(cursor)
+        self.count_capped = False
+        self._wanted = 1
+
+    def _after(self, created_at, pk):
+        return Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+
+    def _from(self, created_at, pk):
+        return Q(created_at__gt=created_at) | Q(created_at=created_at, id__gte=pk)
+
+    @cached_property
+    def count(self):
+        """
+        요청한 페이지가 속한 블록 끝 + 1 행까지만 (최소 CONTRACT_LIST_COUNT_CAP 행) 센다
+        커서가 있으면 커서 앞은 (page-1)*per_page 행으로 보고 커서 뒤만 셈
+        """
+        block_end = ((self._wanted - 1) // BLOCK_SIZE + 1) * BLOCK_SIZE
+        need = max(_count_cap(), block_end * self.per_page + 1)
+        qs = self.object_list.order_by()
+        before = 0
+        if self.cursor is not None:
+            page, created_at, pk = self.cursor
+            before = (page - 1) * self.per_page
+            qs = qs.filter(self._after(created_at, pk))
+        limit = max(need - before, self.per_page + 1)
+        n = qs.values("pk")[:limit].count()
+        self.count_capped = n == limit
+        return before + n
+
+    def page(self, number):
+        try:
+            self._wanted = max(int(number), 1)
+        except (TypeError, ValueError):
+            pass
+        number = self.validate_number(number)
+        qs = self.object_list
+        per_page = self.per_page
+
+        rows = None
+        if self.cursor is not None:
+            page, created_at, pk = self.cursor
+            # 커서에서 건너뛸 행이 처음부터 건너뛸 행보다 적을 때만 커서 사용
+            if number >= page and (number - page) < (number - 1):
+                skip = (number - page) * per_page
+                rows = list(qs.filter(self._after(created_at, pk))[skip:skip + per_page])
+            elif number < page and (page - 1 - number) < (number - 1):
+                skip = (page - 1 - number) * per_page
+                rows = list(qs.filter(self._from(created_at, pk)).reverse()[skip:skip + per_page])
+                rows.reverse()
+        if rows is None:
+            skip = (number - 1) * per_page
+            rows = list(qs[skip:skip + per_page])
+
+        page_obj = self._get_page(rows, number, self)
+        page_obj.cursor = encode_cursor(number + 1, rows[-1]) if rows else ""
+        return page_obj
+
+    @property
+    def count_text(self):
+        """화면 표시용 건수 (다 세지 않았으면 "1000+")"""
+        return f"{self.count - 1}+" if self.count_capped else str(self.count)
@@ -0,0 +1,46 @@
+# expenses/projections.py
+"""
+계약 목록 화면용 조회 (표에 그리는 칼럼만)
+
+- 계약: .only() 로 목록에 나오는 칼럼만 (배송/수금 메모 등 긴 TextField 제외)
+- 품목: 페이지 전체를 쿼리 1번으로, 표에 나오는 칼럼만
+- 사진: ContractImage 행을 prefetch 하지 않고 장수만 서브쿼리로 주석
+"""
+from django.db.models import Count, IntegerField, OuterRef, Prefetch, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import ContractImage, ContractItem
+
+LIST_FIELDS = (
+    "id", "title", "contract_no", "status",
+    "customer_company", "customer_manager", "customer_phone", "customer_email",
+    "special_note", "collect_invoice_date", "created_at",
+    "profit", "margin_rate",
+    "writer_id", "writer__first_name", "writer__username",
+)
+
+ITEM_FIELDS = (
+    "id", "contract_id", "name", "spec", "qty",
+    "sell_unit", "sell_total", "buy_unit", "buy_total", "vendor",
+)
+
+
+def _images():
+    return ContractImage.objects.filter(contract=OuterRef("pk")).order_by()
+
+
+def contract_list_rows(qs):
+    """
+    계약 쿼리셋(검색/정렬 적용된 것) → 목록 표시용 쿼리셋
+    - c.items.all  : ITEM_FIELDS 만 로드된 품목
+    - c.image_count: 사진 장수
+    """
+    image_count = _images().values("contract").annotate(n=Count("id")).values("n")
+    return (
+        qs.select_related("writer")
+        .only(*LIST_FIELDS)
+        .prefetch_related(Prefetch("items", queryset=ContractItem.objects.only(*ITEM_FIELDS)))
+        .annotate(
+            image_count=Coalesce(Subquery(image_count, output_field=IntegerField()), Value(0)),
+        )
+    )
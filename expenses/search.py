@@ -0,0 +1,78 @@
+# expenses/search.py
+"""
+계약 목록 검색 필터 (계약목록/엑셀/임시저장/결재대기/결재처리중/결재완료 공통)
+
+    qs = filter_contracts(qs, request.GET)                             # 작성자(writer) 기준
+    qs = filter_contracts(qs, request.GET, owner_field="sales_owner_id")  # 엑셀: 영업담당 기준
+    qs = filter_contracts(qs, request.GET, with_status=False)          # 상태 고정 화면
+
+인덱스를 탈 수 있는 형태로 바꿔서 적용한다.
+- 날짜: created_at__date(컬럼에 함수 적용) 대신 [그날 00:00, 다음날 00:00) 시각 범위
+- 품목 매입처/품목명: items 조인 + distinct 대신 EXISTS 서브쿼리 (계약 행이 중복되지 않음)
+- 매출처/매입처/품목명 부분일치: searchindex 로 후보 계약을 먼저 좁힘 (pg_trgm 또는 n-gram 색인)
+"""
+import datetime
+
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from . import searchindex
+from .models import ContractItem
+
+SEARCH_PARAMS = ("date_from", "date_to", "q_customer", "q_vendor", "owner", "q_item", "contract_no", "status")
+
+
+def search_params(data):
+    """GET(QueryDict) → 앞뒤 공백 제거한 검색값 dict"""
+    return {k: (data.get(k) or "").strip() for k in SEARCH_PARAMS}
+
+
+def _day_start(value):
+    """'YYYY-MM-DD' → 그날 00:00 (현재 타임존 aware). 형식이 틀리면 None"""
+    try:
+        d = parse_date(value)
+    except ValueError:
+        return None
+    if d is None:
+        return None
+    return timezone.make_aware(datetime.datetime.combine(d, datetime.time.min))
+
+
+def _item_exists(**lookup):
+    return Exists(ContractItem.objects.filter(contract=OuterRef("pk"), **lookup))
+
+
+def filter_contracts(qs, data, owner_field="writer_id", with_status=True):
+    """
+    계약 쿼리셋에 검색조건 적용
+    - data        : request.GET 등 (search_params 참고)
+    - owner_field : 'owner' 파라미터를 비교할 칼럼 (목록은 writer_id, 엑셀은 sales_owner_id)
+    - with_status : 상태가 고정된 화면이면 False
+    """
+    p = search_params(data)
+
+    if p["date_from"]:
+        start = _day_start(p["date_from"])
+        if start:
+            qs = qs.filter(created_at__gte=start)
+    if p["date_to"]:
+        start = _day_start(p["date_to"])
+        if start:
+            qs = qs.filter(created_at__lt=start + datetime.timedelta(days=1))
+    if p["q_customer"]:
+        qs = qs.filter(searchindex.contains("contract.customer", p["q_customer"], "customer_company"))
+    if p["q_vendor"]:
+        qs = qs.filter(searchindex.narrow("item.vendor", p["q_vendor"]), _item_exists(vendor__icontains=p["q_vendor"]))
+    if p["owner"]:
+        try:
+            qs = qs.filter(**{owner_field: int(p["owner"])})
+        except (TypeError, ValueError):
+            pass
+    if p["q_item"]:
+        qs = qs.filter(searchindex.narrow("item.name", p["q_item"]), _item_exists(name__icontains=p["q_item"]))
+    if p["contract_no"]:
+        qs = qs.filter(contract_no__icontains=p["contract_no"])
+    if with_status and p["status"]:
+        qs = qs.filter(status=p["status"])
+    return qs
@@ -0,0 +1,162 @@
+# expenses/searchindex.py
+"""
+매출처/매입처/품목명 부분일치(icontains) 검색용 색인
+
+- PostgreSQL: pg_trgm GIN 인덱스(UPPER(칼럼) gin_trgm_ops, 마이그레이션에서 생성)가
+  icontains 의 UPPER(...) LIKE '%..%' 를 그대로 받아 주므로 별도 작업 없음
+- 그 외(SQLite/MySQL): SearchGram 사이드 테이블에 2-gram 을 저장해 두고,
+  검색어의 2-gram 을 모두 가진 id 로 먼저 좁힌 뒤 그 행들에만 icontains 를 적용
+
+    qs = qs.filter(searchindex.contains("contract.customer", q, "customer_company"))
+
+색인 동기화는 저장/삭제 시그널(expenses.signals, partners.signals)에서 reindex() 호출.
+품목은 행 단위 시그널 없이 품목 저장(expenses.items.save_items) 끝에서 계약당 한 번만 reindex,
+계약 삭제 시에는 drop_contract_search 가 계약/품목 색인을 함께 지움.
+전체 재구성: python manage.py rebuild_search_index
+"""
+import threading
+from contextlib import contextmanager
+
+from django.apps import apps as django_apps
+from django.db import connection
+from django.db.models import Count, Q
+
+N = 2
+
+# key -> (app_label, model, 색인 대상 id 칼럼, 텍스트 칼럼)
+SOURCES = {
+    "contract.customer": ("expenses", "Contract",               "id",         "customer_company"),
+    "item.vendor":       ("expenses", "ContractItem",           "contract_id", "vendor"),
+    "item.name":         ("expenses", "ContractItem",           "contract_id", "name"),
+    "sales.name":        ("partners", "SalesPartner",           "id",         "name"),
+    "sales.contact":     ("partners", "SalesPartnerContact",    "partner_id", "name"),
+    "purchase.name":     ("partners", "PurchasePartner",        "id",         "name"),
+    "purchase.contact":  ("partners", "PurchasePartnerContact", "partner_id", "name"),
+}
+
+# PostgreSQL pg_trgm 인덱스 대상 (테이블, 칼럼)
+TRIGRAM_COLUMNS = [
+    ("expenses_contract", "customer_company"),
+    ("expenses_contractitem", "vendor"),
+    ("expenses_contractitem", "name"),
+    ("partners_salespartner", "name"),
+    ("partners_salespartner_contact", "name"),
+    ("partners_purchasepartner", "name"),
+    ("partners_purchasepartner_contact", "name"),
+]
+
+
+_state = threading.local()
+
+
+@contextmanager
+def paused():
+    """
+    블록 안에서는 reindex() 를 건너뜀 (대량 저장 후 호출하는 쪽에서 한 번만 reindex 하기 위해)
+    """
+    _state.paused = getattr(_state, "paused", 0) + 1
+    try:
+        yield
+    finally:
+        _state.paused -= 1
+
+
+def use_trigram(conn=None):
+    return (conn or connection).vendor == "postgresql"
+
+
+def grams(text):
+    """소문자 기준 2-gram 집합 (2글자 미만이면 빈 집합)"""
+    s = (text or "").lower()
+    return {s[i:i + N] for i in range(len(s) - N + 1)}
+
+
+def candidates(key, text):
+    """검색어의 2-gram 을 모두 가진 obj_id 서브쿼리"""
+    from .models import SearchGram
+
+    g = grams(text)
+    return (
+        SearchGram.objects.filter(key=key, gram__in=g)
+        .values("obj_id")
+        .annotate(n=Count("id"))
+        .filter(n=len(g))
+        .values("obj_id")
+    )
+
+
+def narrow(key, text, pk_field="pk"):
+    """
+    색인으로 후보 id 만 남기는 Q (정확한 부분일치 조건은 호출하는 쪽에서 함께 적용)
+    PostgreSQL 이거나 검색어가 2글자 미만이면 빈 Q
+    """
+    if use_trigram() or len(text or "") < N:
+        return Q()
+    return Q(**{f"{pk_field}__in": candidates(key, text)})
+
+
+def contains(key, text, field, pk_field="pk"):
+    """field__icontains=text + 색인 후보 제한"""
+    return narrow(key, text, pk_field) & Q(**{f"{field}__icontains": text})
+
+
+def _source(key, get_model):
+    app_label, model_name, id_field, text_field = SOURCES[key]
+    return get_model(app_label, model_name), id_field, text_field
+
+
+def reindex(key, obj_id, get_model=django_apps.get_model):
+    """obj_id 한 건의 색인을 현재 값 기준으로 다시 맞춤 (바뀐 gram 만 추가/삭제)"""
+    if use_trigram() or obj_id is None or getattr(_state, "paused", 0):
+        return
+    SearchGram = get_model("expenses", "SearchGram")
+    model, id_field, text_field = _source(key, get_model)
+
+    want = set()
+    for text in model.objects.filter(**{id_field: obj_id}).values_list(text_field, flat=True):
+        want |= grams(text)
+
+    rows = SearchGram.objects.filter(key=key, obj_id=obj_id)
+    have = set(rows.values_list("gram", flat=True))
+    if have - want:
+        rows.filter(gram__in=have - want).delete()
+    if want - have:
+        SearchGram.objects.bulk_create(
+            [SearchGram(key=key, obj_id=obj_id, gram=g) for g in want - have],
+            ignore_conflicts=True,
+        )
+
+
+def drop(keys, obj_id, get_model=django_apps.get_model):
+    """객체가 삭제되었을 때 색인 제거"""
+    if use_trigram():
+        return
+    get_model("expenses", "SearchGram").objects.filter(key__in=keys, obj_id=obj_id).delete()
+
+
+def rebuild(keys=None, get_model=django_apps.get_model, batch_size=2000):
+    """전체 재구성 (마이그레이션/관리 명령에서 사용). 생성한 gram 수 반환"""
+    if use_trigram():
+        return 0
+    SearchGram = get_model("expenses", "SearchGram")
+    total = 0
+    for key in keys or SOURCES:
+        model, id_field, text_field = _source(key, get_model)
+        SearchGram.objects.filter(key=key).delete()
+
+        per_obj = {}
+        for obj_id, text in model.objects.values_list(id_field, text_field).iterator():
+            if obj_id is not None:
+                per_obj.setdefault(obj_id, set()).update(grams(text))
+
+        batch = []
+        for obj_id, gs in per_obj.items():
+            batch.extend(SearchGram(key=key, obj_id=obj_id, gram=g) for g in gs)
+            if len(batch) >= batch_size:
+                SearchGram.objects.bulk_create(batch, ignore_conflicts=True)
+                total += len(batch)
+                batch = []
+        if batch:
+            SearchGram.objects.bulk_create(batch, ignore_conflicts=True)
+            total += len(batch)
+    return total
@@ -0,0 +1,88 @@
+# expenses/sequences.py
+"""
+계약번호(YYYYDJ{seq}) 연도별 일련번호 발급
+
+연도마다 ContractSequence 카운터 행 하나를 두고
+UPDATE ... SET last = last + 1 한 뒤 같은 트랜잭션에서 값을 읽는다.
+- UPDATE 가 그 행만 잠그므로 계약 테이블/연도 인덱스를 잠그지 않음 (MySQL gap lock 없음)
+- SQLite 처럼 select_for_update 가 없는 DB 에서도 UPDATE 자체가 직렬화됨
+- 호출한 트랜잭션이 롤백되면 카운터도 함께 롤백 → 빈 번호 없음
+
+블록 예약 모드 (settings.CONTRACT_SEQ_BLOCK_SIZE > 1):
+  프로세스가 번호를 N개씩 미리 가져가 메모리에서 나눠 준다. 카운터 행을 건드리는 횟수가 1/N 로 줄지만,
+  프로세스가 쓰지 못하고 끝난 번호는 비게 되고 프로세스 간 발급 순서가 작성 순서와 어긋날 수 있다.
+  (기본값 1 = 사용 안 함, 빈 번호 없음)
+"""
+import logging
+import threading
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Max
+
+from .models import Contract, ContractSequence
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_blocks = {}  # year -> [next, end]  (이 프로세스가 예약해 둔 [next, end] 구간)
+
+
+def _block_size():
+    return max(1, int(getattr(settings, "CONTRACT_SEQ_BLOCK_SIZE", 1)))
+
+
+def _reserve(year, n):
+    """카운터를 n 만큼 올리고 예약한 구간의 마지막 번호 반환 (호출한 트랜잭션 안에서 유효)"""
+    with transaction.atomic():
+        if not ContractSequence.objects.filter(year=year).update(last=F("last") + n):
+            # 그 해 첫 발급: 기존 계약의 최대 seq 에서 이어서 시작
+            start = Contract.objects.filter(year=year).aggregate(m=Max("seq"))["m"] or 0
+            try:
+                with transaction.atomic():
+                    ContractSequence.objects.create(year=year, last=start)
+            except IntegrityError:
+                pass  # 다른 요청이 먼저 만듦
+            ContractSequence.objects.filter(year=year).update(last=F("last") + n)
+        return ContractSequence.objects.filter(year=year).values_list("last", flat=True).get()
+
+
+def next_contract_seq(year):
+    """year 의 다음 seq 발급. 호출하는 쪽이 계약 INSERT 와 같은 트랜잭션으로 감싸야 빈 번호가 없음"""
+    size = _block_size()
+    if size == 1:
+        return _reserve(year, 1)
+
+    with _lock:
+        block = _blocks.get(year)
+        if block is None or block[0] > block[1]:
+            # 예약은 요청 트랜잭션과 따로 바로 커밋 (요청이 롤백돼도 같은 구간이 다시 발급되지 않게)
+            end = _reserve_committed(year, size)
+            block = _blocks[year] = [end - size + 1, end]
+        seq = block[0]
+        block[0] += 1
+        return seq
+
+
+def _reserve_committed(year, n):
+    """
+    블록 모드 예약: 별도 스레드(= 별도 DB 커넥션)에서 예약하고 바로 커밋
+    SQLite 는 쓰기 잠금이 DB 전체라서, 요청 트랜잭션이 이미 쓰기를 했다면 여기서 잠금 대기 후 실패할 수 있음
+    → 블록 모드는 PostgreSQL/MySQL 용
+    """
+    result = {}
+
+    def run():
+        try:
+            result["end"] = _reserve(year, n)
+        except Exception as e:
+            logger.warning("contract seq block reserve failed: %s (%s)", year, e)
+        finally:
+            connection.close()
+
+    t = threading.Thread(target=run)
+    t.start()
+    t.join()
+    if "end" not in result:
+        raise RuntimeError("계약번호 블록 예약 실패")
+    return result["end"]
@@ -1,32 +1,48 @@
 # expenses/signals.py
+import datetime
 import io, os
 from PIL import Image, ImageOps
+from django.conf import settings
 from django.core.files.base import ContentFile
 from django.core.files.storage import default_storage
+from django.db import transaction
 from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
-from .models import ContractImage
+from django.utils import timezone
+from accounts import kpis
+
+from . import imagestore, jobs, pagination, searchindex, storagegc
+from .models import Contract, ContractImage, ContractItem, ImageBlob
 
 # ---------- 공통 유틸 ----------
-def _delete_storage_file(name: str):
-    """스토리지(S3 등)에서 안전하게 삭제"""
-    if not name:
-        return
-    try:
-        if default_storage.exists(name):
-            default_storage.delete(name)
-    except Exception as e:
-        # 로깅만 하고 무시(실패해도 트랜잭션 막지 않음)
-        print(f"[WARN] storage delete failed: {name} ({e})")
-
-def _resize_to_jpeg(file, max_side):
+def _encode(img, fmt):
+    buf = io.BytesIO()
+    if fmt == "PNG":
+        img.save(buf, format="PNG")
+    else:
+        img.save(buf, format="JPEG", quality=82, optimize=True)
+    return buf.getvalue()
+
+def render_ladder(file, ladder):
+    """
+    원본을 한 번만 읽고 디코드해서 여러 크기를 한꺼번에 생성
+    - ladder: [(max_side, "JPEG"|"PNG"), ...]
+    - JPEG 원본은 draft 모드로 필요한 최대 크기 근처까지만 축소 디코드 (12MP → 1/2~1/8 스케일)
+    - 큰 크기부터 차례로 thumbnail 해 나가므로 작은 크기는 이미 줄어든 이미지에서 만든다
+    반환: {max_side: 인코딩된 바이트}
+    """
     img = Image.open(file)
+    largest = max(side for side, _fmt in ladder)
+    if img.format == "JPEG":
+        img.draft("RGB", (largest, largest))  # 정사각 박스라 회전 보정 전에 걸어도 안전
     img = ImageOps.exif_transpose(img)  # 회전 보정
     img = img.convert("RGB")
-    img.thumbnail((max_side, max_side))
-    buf = io.BytesIO()
-    img.save(buf, format="JPEG", quality=82, optimize=True)
-    return ContentFile(buf.getvalue())
+
+    out = {}
+    for side, fmt in sorted(ladder, key=lambda x: -x[0]):
+        img.thumbnail((side, side))
+        out[side] = _encode(img, fmt)
+    return out
 
 def _derive_names_from_original(orig_name: str):
     """
@@ -43,54 +59,221 @@ def _derive_names_from_original(orig_name: str):
     medium = base.replace("/orig/", "/medium/") + "_1200.jpg"
     return thumb, medium
 
+# 엑셀 내보내기용 사진 크기 (expenses.exports 가 이 크기의 PNG 를 캐시해 둠)
+EXPORT_SIZE = 200
+
+def export_name_for(orig_name: str):
+    """
+    원본 경로 -> 엑셀 내보내기용 PNG 캐시 경로
+    ex) contracts/orig/2025/10/09/abc.png -> contracts/export/2025/10/09/abc_200.png
+    """
+    if not orig_name:
+        return None
+    base, _ext = os.path.splitext(orig_name)
+    return base.replace("/orig/", "/export/") + f"_{EXPORT_SIZE}.png"
+
+def rendition_name_for(orig_name: str, size: int):
+    """
+    설정(CONTRACT_IMAGE_EXTRA_SIZES)으로 추가한 크기의 파생 경로
+    ex) contracts/orig/2025/10/09/abc.png -> contracts/r480/2025/10/09/abc_480.jpg
+    """
+    if not orig_name:
+        return None
+    base, _ext = os.path.splitext(orig_name)
+    return base.replace("/orig/", f"/r{size}/") + f"_{size}.jpg"
+
+def extra_sizes():
+    builtin = {240, 1200, EXPORT_SIZE}
+    return [n for n in (int(x) for x in getattr(settings, "CONTRACT_IMAGE_EXTRA_SIZES", [])) if n not in builtin]
+
+def _extra_names(orig_name: str):
+    """thumb/medium 필드에 기록되지 않는 파생본 경로들 (엑셀용 + 추가 크기)"""
+    if not orig_name:
+        return []
+    return [export_name_for(orig_name)] + [rendition_name_for(orig_name, n) for n in extra_sizes()]
+
+def _image_names(obj):
+    """사진(ContractImage/ImageBlob) 하나가 스토리지에 남기는 모든 파일 경로"""
+    names = []
+    for field_name in ("original", "thumb", "medium"):
+        f = getattr(obj, field_name, None)
+        names.append(getattr(f, "name", f))
+    return [n for n in names if n] + _extra_names(names[0])
+
+
+# ---------- 파생본 생성 (백그라운드 작업) ----------
+DERIVATIVES_JOB = "contract_image.derivatives"
+# 같은 내용(ImageBlob)의 파생본을 다른 사진 작업이 만드는 중일 때, 끝나면 복사만 하는 작업
+COPY_DERIVATIVES_JOB = "contract_image.copy_derivatives"
+COPY_RETRY_SECONDS = 10
+COPY_MAX_ROUNDS = 60  # 이만큼 기다려도 안 끝나면 직접 생성
 
-# ---------- 파생본 생성 ----------
 @receiver(post_save, sender=ContractImage)
 def make_derivatives(sender, instance: ContractImage, created, **kwargs):
+    """업로드 요청에서는 작업만 등록하고, 실제 리사이즈/업로드는 워커(run_jobs)가 처리"""
     if not created or not instance.original:
         return
+    if getattr(instance, "_skip_derivatives", False):
+        # 같은 내용의 사진(ImageBlob) 재사용 → 파생본은 이미 있거나 만드는 중
+        # 만드는 중이면 그 작업의 일괄 갱신이 이 행 커밋 전에 지나갈 수 있으므로 끝난 뒤 복사할 작업을 따로 등록
+        if instance.deriv_status == "pending":
+            _enqueue_copy(instance.pk)
+        return
+    jobs.enqueue(DERIVATIVES_JOB, image_id=instance.pk)
+
+
+def _enqueue_copy(image_id, rounds=0):
+    jobs.enqueue(
+        COPY_DERIVATIVES_JOB,
+        run_after=timezone.now() + datetime.timedelta(seconds=COPY_RETRY_SECONDS if rounds else 0),
+        image_id=image_id, rounds=rounds,
+    )
+
+
+@jobs.handler(COPY_DERIVATIVES_JOB)
+def copy_derivatives(image_id, rounds=0):
+    """blob 파생본이 준비되면 이 사진에 복사, 아직이면 잠시 뒤 다시, 실패했거나 너무 오래 걸리면 직접 생성"""
+    instance = ContractImage.objects.select_related("blob").filter(pk=image_id).first()
+    if instance is None or instance.deriv_status == "ready":
+        return
+    blob = instance.blob
+    if blob is not None and blob.deriv_status == "ready":
+        ContractImage.objects.filter(pk=image_id).update(thumb=blob.thumb, medium=blob.medium, deriv_status="ready")
+    elif blob is not None and blob.deriv_status == "pending" and rounds < COPY_MAX_ROUNDS:
+        _enqueue_copy(image_id, rounds + 1)
+    else:
+        jobs.enqueue(DERIVATIVES_JOB, image_id=image_id)
+
+
+def _derivatives_failed(image_id):
+    instance = ContractImage.objects.filter(pk=image_id).first()
+    if instance is None:
+        return
+    if instance.blob_id:
+        with transaction.atomic():
+            ImageBlob.objects.filter(pk=instance.blob_id).update(deriv_status="failed")
+            ContractImage.objects.filter(blob_id=instance.blob_id).update(deriv_status="failed")
+    else:
+        ContractImage.objects.filter(pk=image_id).update(deriv_status="failed")
+
+
+@jobs.handler(DERIVATIVES_JOB, on_failure=_derivatives_failed)
+def generate_derivatives(image_id):
+    instance = ContractImage.objects.select_related("blob").filter(pk=image_id).first()
+    if instance is None or not instance.original:
+        return  # 그 사이 삭제됨
+
+    blob = instance.blob
+    if blob is not None and blob.deriv_status == "ready":
+        # 같은 내용의 다른 사진 작업이 먼저 만들어 둠
+        ContractImage.objects.filter(pk=instance.pk).update(thumb=blob.thumb, medium=blob.medium, deriv_status="ready")
+        return
 
     # 파생 경로 계산
-    thumb_name, medium_name = _derive_names_from_original(instance.original.name)
+    orig_name = instance.original.name
+    thumb_name, medium_name = _derive_names_from_original(orig_name)
 
-    # 저장 (upload_to 가 붙은 '절대 경로'로 저장하므로 name 인자로 경로를 넘겨도 OK)
-    instance.thumb.save(thumb_name,  _resize_to_jpeg(instance.original, 240),  save=False)
-    instance.medium.save(medium_name, _resize_to_jpeg(instance.original, 1200), save=False)
+    # 원본은 한 번만 읽고, 크기 사다리 전체를 한 번의 디코드로 생성
+    ladder = [(1200, "JPEG"), (240, "JPEG"), (EXPORT_SIZE, "PNG")] + [(n, "JPEG") for n in extra_sizes()]
+    with default_storage.open(orig_name, "rb") as f:
+        rendered = render_ladder(f, ladder)
 
-    # 원본 파일명만 기록
-    instance.filename = os.path.basename(instance.original.name)
-    instance.save(update_fields=["thumb", "medium", "filename"])
+    # 파생 경로 그대로 저장 (FieldFile.save 는 upload_to 를 한 번 더 붙이므로 스토리지에 직접 저장)
+    instance.thumb.name  = default_storage.save(thumb_name,  ContentFile(rendered[240]))
+    instance.medium.name = default_storage.save(medium_name, ContentFile(rendered[1200]))
+    default_storage.save(export_name_for(orig_name), ContentFile(rendered[EXPORT_SIZE]))
+    for n in extra_sizes():
+        default_storage.save(rendition_name_for(orig_name, n), ContentFile(rendered[n]))
+
+    # 원본 파일명만 기록 (업로드할 때 받은 이름이 있으면 그대로)
+    instance.filename = instance.filename or os.path.basename(instance.original.name)
+    instance.deriv_status = "ready"
+    with transaction.atomic():  # 작업 큐는 트랜잭션 없이 호출 → DB 반영만 짧게 묶음
+        instance.save(update_fields=["thumb", "medium", "filename", "deriv_status"])
+
+        if blob is not None:
+            # 같은 blob 을 참조하는 다른 사진들도 파생본 공유
+            ImageBlob.objects.filter(pk=blob.pk).update(thumb=instance.thumb.name, medium=instance.medium.name, deriv_status="ready")
+            ContractImage.objects.filter(blob_id=blob.pk).exclude(pk=instance.pk).update(
+                thumb=instance.thumb.name, medium=instance.medium.name, deriv_status="ready",
+            )
 
 
 # ---------- 원본/파생본 교체 시 이전 파일 정리 ----------
 @receiver(pre_save, sender=ContractImage)
-def cleanup_files_on_replace(sender, instance: ContractImage, **kwargs):
-    if not instance.pk:
-        return  # 새 객체
+def cleanup_files_on_replace(sender, instance: ContractImage, update_fields=None, raw=False, **kwargs):
+    if not instance.pk or raw:
+        return  # 새 객체 / fixture 적재
+    if update_fields is not None and not {"original", "thumb", "medium", "blob", "blob_id"} & set(update_fields):
+        return  # 파일과 무관한 필드만 저장 (상태값 등)
+
+    # 읽어 올 때 기억해 둔 경로와 비교 (직접 만든 인스턴스/지연 로딩 필드가 있으면 한 번 조회)
+    old = getattr(instance, "_loaded_files", {})
+    if len(old) < len(ContractImage.FILE_ATTNAMES):
+        old = ContractImage.objects.filter(pk=instance.pk).values(*ContractImage.FILE_ATTNAMES).first()
+        if old is None:
+            return
+    old_original, old_thumb, old_medium = old["original"], old["thumb"], old["medium"]
 
-    try:
-        old = ContractImage.objects.get(pk=instance.pk)
-    except ContractImage.DoesNotExist:
+    if old["blob_id"]:
+        # 공유 파일(ImageBlob)은 직접 지우지 않음. 원본을 바꾸면 참조만 놓고 이 행은 새 파일을 단독 소유
+        if old_original != instance.original.name:
+            imagestore.release(old["blob_id"])
+            instance.blob = None
         return
 
-    # 원본이 바뀌면 예전 파생본/원본 삭제
-    if old.original and instance.original and old.original.name != instance.original.name:
-        # 예전 파생 경로 계산 후 삭제
-        old_thumb, old_medium = _derive_names_from_original(old.original.name)
-        _delete_storage_file(old_thumb)
-        _delete_storage_file(old_medium)
-        _delete_storage_file(old.original.name)
+    # 원본이 바뀌면 예전 파생본/원본 삭제 (커밋 후 한꺼번에)
+    names = []
+    if old_original and instance.original and old_original != instance.original.name:
+        names += list(_derive_names_from_original(old_original))
+        names += _extra_names(old_original)
+        names.append(old_original)
 
     # 파생 필드가 수동 갱신되었을 때도 안전 삭제
-    if old.thumb and instance.thumb and old.thumb.name != instance.thumb.name:
-        _delete_storage_file(old.thumb.name)
-    if old.medium and instance.medium and old.medium.name != instance.medium.name:
-        _delete_storage_file(old.medium.name)
+    if old_thumb and instance.thumb and old_thumb != instance.thumb.name:
+        names.append(old_thumb)
+    if old_medium and instance.medium and old_medium != instance.medium.name:
+        names.append(old_medium)
+    storagegc.orphan(names)
 
 
-# ---------- 어떤 경로로든 객체가 삭제될 때 S3 파일도 삭제 ----------
+# ---------- 어떤 경로로든 객체가 삭제될 때 S3 파일도 삭제 (계약 삭제의 CASCADE 포함) ----------
 @receiver(post_delete, sender=ContractImage)
 def delete_files_with_record(sender, instance: ContractImage, **kwargs):
-    _delete_storage_file(getattr(instance, "thumb", None) and instance.thumb.name)
-    _delete_storage_file(getattr(instance, "medium", None) and instance.medium.name)
-    _delete_storage_file(getattr(instance, "original", None) and instance.original.name)
\ No newline at end of file
+    if instance.blob_id:
+        imagestore.release(instance.blob_id)  # 마지막 참조일 때만 파일 삭제
+        return
+    storagegc.orphan(_image_names(instance))
+
+# ---------- 계약 상태별 건수 캐시 + 대시보드 KPI 무효화 ----------
+@receiver(post_save, sender=Contract)
+@receiver(post_delete, sender=Contract)
+def invalidate_contract_lists(sender, **kwargs):
+    # 품목까지 다 저장된 뒤에 무효화되도록 커밋 시점에 (상태 변경 save(update_fields=["status"]) 포함)
+    transaction.on_commit(pagination.bump_version)
+    transaction.on_commit(kpis.invalidate)
+
+
+@receiver(post_save, sender=ContractItem)
+@receiver(post_delete, sender=ContractItem)
+def invalidate_kpis_on_item(sender, instance: ContractItem, origin=None, **kwargs):
+    if isinstance(origin, Contract):
+        return  # 계약 삭제의 CASCADE → invalidate_contract_lists 가 한 번 처리
+    if instance.contract_id:
+        transaction.on_commit(kpis.invalidate)
+
+
+# ---------- 부분일치 검색 색인 동기화 (PostgreSQL 이면 내부에서 바로 반환) ----------
+@receiver(post_save, sender=Contract)
+def reindex_contract_search(sender, instance: Contract, update_fields=None, **kwargs):
+    if update_fields is not None and "customer_company" not in update_fields:
+        return  # 상태 변경 등은 색인과 무관
+    searchindex.reindex("contract.customer", instance.pk)
+
+
+@receiver(post_delete, sender=Contract)
+def drop_contract_search(sender, instance: Contract, **kwargs):
+    searchindex.drop(["contract.customer", "item.vendor", "item.name"], instance.pk)
+
+# 품목 색인은 품목 저장 경로(expenses.items.save_items)에서 계약당 한 번만 reindex
+# (행마다 시그널로 하면 품목 N개 저장/계약 CASCADE 삭제 때 계약 전체 재색인이 N번 반복됨)
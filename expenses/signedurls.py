@@ -0,0 +1,111 @@
+# expenses/signedurls.py
+"""
+스토리지 서명 URL(presigned URL) 캐시
+
+AWS_QUERYSTRING_AUTH=True 이면 FieldFile.url 이 부를 때마다 SigV4 서명을 새로 계산한다.
+사진이 많은 화면(계약 상세/수정)에서는 그림 수만큼 HMAC 계산이 매 요청 반복되므로,
+파일 이름별로 서명한 URL 을 만료 전까지 재사용한다.
+
+    url(name)                 # 1건
+    urls([name, ...])         # 여러 건을 한 번에 (캐시 조회/저장 1회씩)
+    {% load signed_urls %}{% sign_image_urls contract.images.all %}   # 템플릿에서 미리 일괄 서명
+
+- 프로세스 메모리 LRU → 공유 캐시(default cache) → 서명 순서로 찾음
+- 캐시 유지 시간은 서명 유효시간(AWS_QUERYSTRING_EXPIRE)보다 짧게 잡아,
+  캐시에서 꺼낸 URL 도 화면에 나간 뒤 최소 SIGNED_URL_MIN_VALIDITY 초는 유효함
+- 서명하지 않는 스토리지(로컬 파일 등)는 캐시 없이 storage.url() 그대로
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+
+LRU_SIZE = 5000
+
+_lock = threading.Lock()
+_lru = OrderedDict()   # 캐시 키 → (url, 만료 시각 epoch)
+
+
+def _signs(storage):
+    return bool(getattr(storage, "querystring_auth", False))
+
+
+def _ttl(storage):
+    """서명 유효시간 - 최소 유효 여유 (여유가 유효시간의 절반을 넘으면 절반)"""
+    expire = int(getattr(storage, "querystring_expire", 3600))
+    margin = min(getattr(settings, "SIGNED_URL_MIN_VALIDITY", 60 * 60), expire // 2)
+    return expire - margin
+
+
+def _key(storage, name):
+    bucket = getattr(storage, "bucket_name", "") or ""
+    return "signedurl:" + hashlib.sha1(f"{bucket}\0{name}".encode("utf-8")).hexdigest()
+
+
+def _lru_get(key, now):
+    with _lock:
+        hit = _lru.get(key)
+        if hit is None:
+            return None
+        if hit[1] <= now:
+            del _lru[key]
+            return None
+        _lru.move_to_end(key)
+        return hit[0]
+
+
+def _lru_put(items, expires_at):
+    with _lock:
+        for key, value in items.items():
+            _lru[key] = (value, expires_at)
+            _lru.move_to_end(key)
+        while len(_lru) > LRU_SIZE:
+            _lru.popitem(last=False)
+
+
+def urls(names, storage=None):
+    """{이름: URL}. 빈 이름은 건너뜀"""
+    storage = storage or default_storage
+    names = [n for n in dict.fromkeys(names) if n]
+    if not _signs(storage):
+        return {n: storage.url(n) for n in names}
+
+    now = time.time()
+    keys = {n: _key(storage, n) for n in names}
+    out, missing = {}, []
+    for n in names:
+        hit = _lru_get(keys[n], now)
+        if hit is None:
+            missing.append(n)
+        else:
+            out[n] = hit
+    if not missing:
+        return out
+
+    # 공유 캐시에는 (url, 만료 시각) 으로 저장 → 꺼낸 프로세스도 남은 시간만큼만 LRU 에 둠
+    shared = cache.get_many([keys[n] for n in missing])
+    fresh = {}
+    for n in missing:
+        hit = shared.get(keys[n])
+        if hit and hit[1] > now:
+            out[n] = hit[0]
+            _lru_put({keys[n]: hit[0]}, hit[1])
+        else:
+            fresh[n] = storage.url(n)
+    if fresh:
+        ttl = _ttl(storage)
+        expires_at = now + ttl
+        cache.set_many({keys[n]: (u, expires_at) for n, u in fresh.items()}, ttl)
+        _lru_put({keys[n]: u for n, u in fresh.items()}, expires_at)
+        out.update(fresh)
+    return out
+
+
+def url(name, storage=None):
+    if not name:
+        return ""
+    return urls([name], storage).get(name, "")
@@ -0,0 +1,211 @@
+# expenses/storagegc.py
+"""
+스토리지 파일 일괄 삭제 (계약/사진/내보내기 파일 정리)
+
+    storagegc.orphan([thumb, medium, original, ...])   # 삭제하는 트랜잭션 안에서 호출
+
+- 이름을 StorageOrphan 에 기록만 하고, 커밋되면 그 트랜잭션에서 모인 이름을 한 번에 삭제
+  (계약 하나에 사진 50장이어도 S3 DeleteObjects 1회, 로컬은 unlink 만)
+- 트랜잭션이 롤백되면 기록도 함께 사라지므로 아직 참조 중인 파일은 지우지 않음
+- 삭제에 실패한 이름은 남겨 두고 백그라운드 작업(storage.sweep)이 다시 시도
+- DB 행 없이 스토리지에만 남은 파일은 reconcile_storage 명령으로 찾아서 정리
+"""
+import datetime
+import logging
+import threading
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import jobs
+from .models import Job, StorageOrphan
+
+logger = logging.getLogger(__name__)
+
+SWEEP_JOB = "storage.sweep"
+
+# S3 DeleteObjects 한 번에 보낼 수 있는 최대 개수
+BATCH = 1000
+
+# 삭제 실패 시 재시도 간격(초) / 이만큼 실패한 이름은 자동 재시도 중단 (reconcile_storage --retry 로 다시 시도)
+RETRY_SECONDS = 5 * 60
+MAX_ATTEMPTS = 10
+
+_local = threading.local()
+
+
+def _pending():
+    if not hasattr(_local, "names"):
+        _local.names = set()
+    return _local.names
+
+
+def orphan(names):
+    """참조가 끊긴 파일 이름 기록 → 커밋 후 삭제"""
+    names = {n for n in names if n}
+    if not names:
+        return
+    StorageOrphan.objects.bulk_create([StorageOrphan(name=n) for n in sorted(names)], ignore_conflicts=True)
+    _pending().update(names)
+    transaction.on_commit(_flush)
+
+
+def _flush():
+    """
+    커밋 시점에 모인 이름 삭제 (같은 트랜잭션의 나머지 호출은 빈 목록이라 바로 끝남)
+    롤백된 트랜잭션에서 모인 이름이 섞여 있어도 StorageOrphan 행이 남아 있는 것만 지움
+    """
+    names = sorted(_pending())
+    _pending().clear()
+    if names:
+        sweep(names)
+
+
+# ---------------- 스토리지 삭제 ----------------
+def _s3_bucket(storage):
+    """django-storages S3Storage 면 boto3 Bucket, 아니면 None"""
+    if not hasattr(storage, "_normalize_name"):
+        return None
+    return getattr(storage, "bucket", None)
+
+
+def delete_many(names, storage=None):
+    """
+    파일 여러 개 삭제. 반환: {실패한 이름: 오류 메시지}
+    - S3: DeleteObjects (최대 1000개씩), 없는 키는 성공으로 취급
+    - 그 밖의 스토리지: 이름마다 storage.delete (FileSystemStorage 는 unlink)
+    """
+    storage = storage or default_storage
+    failed = {}
+    bucket = _s3_bucket(storage)
+    if bucket is None:
+        for name in names:
+            try:
+                storage.delete(name)
+            except Exception as e:
+                failed[name] = str(e)
+        return failed
+
+    from storages.utils import clean_name
+
+    for i in range(0, len(names), BATCH):
+        chunk = names[i:i + BATCH]
+        keys = {storage._normalize_name(clean_name(n)): n for n in chunk}
+        try:
+            resp = bucket.delete_objects(
+                Delete={"Objects": [{"Key": k} for k in keys], "Quiet": True},
+            )
+        except Exception as e:
+            failed.update({n: str(e) for n in chunk})
+            continue
+        for err in resp.get("Errors", []):
+            name = keys.get(err.get("Key"), err.get("Key"))
+            failed[name] = f"{err.get('Code')}: {err.get('Message')}"
+    return failed
+
+
+def sweep(names=None, limit=None):
+    """
+    StorageOrphan 에 기록된 파일 삭제 (names 를 주면 그 이름만, 아니면 재시도 한도 안의 전부)
+    성공한 행은 지우고, 실패한 행은 attempts/last_error 기록 후 재시도 작업 등록
+    반환: (삭제 수, 실패 수)
+    """
+    qs = StorageOrphan.objects.order_by("id").values_list("id", "name")
+    if names is not None:
+        names = list(names)
+        rows = []
+        for i in range(0, len(names), BATCH):
+            rows += qs.filter(name__in=names[i:i + BATCH])
+    else:
+        qs = qs.filter(attempts__lt=MAX_ATTEMPTS)
+        rows = list(qs[:limit] if limit else qs)
+    if not rows:
+        return 0, 0
+
+    failed = delete_many([name for _pk, name in rows])
+    done = [pk for pk, name in rows if name not in failed]
+    for i in range(0, len(done), BATCH):
+        StorageOrphan.objects.filter(pk__in=done[i:i + BATCH]).delete()
+    for name, error in failed.items():
+        logger.warning("storage delete failed: %s (%s)", name, error)
+        StorageOrphan.objects.filter(name=name).update(attempts=F("attempts") + 1, last_error=error[:1000])
+    if failed:
+        schedule_sweep(RETRY_SECONDS)
+    return len(done), len(failed)
+
+
+def schedule_sweep(delay=0):
+    """재시도 작업이 이미 대기 중이 아니면 delay 초 뒤로 등록"""
+    if Job.objects.filter(kind=SWEEP_JOB, status="pending").exists():
+        return
+    jobs.enqueue(SWEEP_JOB, run_after=timezone.now() + datetime.timedelta(seconds=delay))
+
+
+@jobs.handler(SWEEP_JOB)
+def sweep_job():
+    # 실패한 이름은 sweep() 이 다음 작업을 등록하므로 여기서는 예외로 되돌리지 않음
+    sweep()
+
+
+# ---------------- DB 와 대조 (reconcile_storage) ----------------
+# 이 앱이 스토리지에 쓰는 경로 (사진 원본/파생본, 엑셀 내보내기)
+PREFIXES = ("contracts/", "exports/")
+
+
+def list_objects(prefix, storage=None):
+    """prefix 아래 (이름, 수정 시각) — S3 는 ListObjectsV2 페이지 단위, 그 밖은 listdir 재귀"""
+    storage = storage or default_storage
+    bucket = _s3_bucket(storage)
+    if bucket is not None:
+        from storages.utils import clean_name
+
+        root = storage._normalize_name(clean_name(""))
+        root = root.rstrip("/") + "/" if root else ""
+        for obj in bucket.objects.filter(Prefix=storage._normalize_name(clean_name(prefix))):
+            yield obj.key[len(root):], obj.last_modified
+        return
+
+    try:
+        dirs, files = storage.listdir(prefix)
+    except FileNotFoundError:
+        return
+    for f in files:
+        name = f"{prefix.rstrip('/')}/{f}"
+        yield name, storage.get_modified_time(name)
+    for d in dirs:
+        yield from list_objects(f"{prefix.rstrip('/')}/{d}/", storage)
+
+
+def referenced_names():
+    """DB 행이 참조하는 스토리지 경로 전부 (사진 파생본 규칙 경로 포함) + 이미 삭제 대기 중인 이름"""
+    from .models import ContractExport, ContractImage, ImageBlob
+    from .signals import _extra_names
+
+    names = set()
+    for model in (ContractImage, ImageBlob):
+        for row in model.objects.values_list("original", "thumb", "medium").iterator():
+            names.update(n for n in row if n)
+            names.update(_extra_names(row[0]))
+    names.update(ContractExport.objects.exclude(file="").values_list("file", flat=True).iterator())
+    names.update(StorageOrphan.objects.values_list("name", flat=True).iterator())
+    return names
+
+
+def find_unreferenced(prefixes=PREFIXES, older_than=None):
+    """
+    스토리지에만 있고 DB 행이 없는 파일 이름 목록
+    older_than(timedelta) 보다 최근 파일은 제외 (업로드 직후 DB 행이 아직 커밋되지 않은 파일 보호)
+    """
+    cutoff = timezone.now() - older_than if older_than else None
+    refs = referenced_names()
+    out = []
+    for prefix in prefixes:
+        for name, modified in list_objects(prefix):
+            if name in refs:
+                continue
+            if cutoff is not None and modified is not None and modified > cutoff:
+                continue
+            out.append(name)
+    return out
@@ -0,0 +1,23 @@
+# expenses/templatetags/signed_urls.py
+from django import template
+
+from expenses import signedurls
+
+register = template.Library()
+
+
+@register.simple_tag
+def sign_image_urls(images):
+    """
+    사진 목록의 thumb_url / medium_url 을 한 번에 서명해 캐시에 올려 둠 (출력 없음)
+    이후 {{ img.thumb_url }} 는 메모리 캐시에서 바로 꺼냄
+
+        {% load signed_urls %}
+        {% sign_image_urls contract.images.all %}
+    """
+    names = []
+    for img in images:
+        names.append((img.thumb or img.original).name)
+        names.append((img.medium or img.original).name)
+    signedurls.urls(names)
+    return ""
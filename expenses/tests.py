@@ -1,3 +1,1145 @@
-from django.test import TestCase
+import base64
+import contextlib
+import datetime
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core import signing
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, connections, transaction
+from django.db.models import F
+from django.http import QueryDict
+from django.utils import timezone
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from openpyxl import load_workbook
+from openpyxl.utils import get_column_letter
+from PIL import Image as PILImage
+
+from . import directupload, exportjobs, exports, imagestore, jobs, sequences, signals, signedurls, storagegc, totals
+from .items import save_items
+from .models import Contract, ContractImage, ContractItem, ImageBlob, Job, SearchGram, StorageOrphan
+from .pagination import KeysetPaginator
+
+MEDIA = tempfile.mkdtemp()
+LOCAL_STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
+
+def tearDownModule():
+    shutil.rmtree(MEDIA, ignore_errors=True)
+
+
+def item_row(name="품목", vendor="매입처", qty=1, sell=1000, buy=500, vat_mode="separate"):
+    return {
+        "name": name, "qty": qty, "spec": "", "vendor": vendor, "vat_mode": vat_mode,
+        "sell_unit": sell, "sell_total": sell, "buy_unit": buy, "buy_total": buy,
+    }
+
+
+def make_contract(writer, customer="매출처", rows=(), **fields):
+    contract = Contract.objects.create(writer=writer, customer_company=customer, title=customer, **fields)
+    if rows:
+        save_items(contract, list(rows))
+    return contract
+
+
+@override_settings(MEDIA_ROOT=MEDIA, STORAGES=LOCAL_STORAGES)
+class BaseTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser("admin", "admin@example.com", "pw")
+
+    def setUp(self):
+        cache.clear()  # 상태별 건수/KPI 캐시는 커밋 시점 무효화라 TestCase 에서는 직접 비움
+        self.client.force_login(self.admin)
+
+    def list_ids(self, url, params):
+        response = self.client.get(url, {**params, "per_page": 100})
+        self.assertEqual(response.status_code, 200)
+        return [c.pk for c in response.context["page_obj"].object_list]
+
+
+class SearchIndexTests(BaseTestCase):
+    def test_item_grams_follow_save_items(self):
+        contract = make_contract(self.admin, rows=[item_row(name="노트북", vendor="삼성전자")])
+        self.assertTrue(SearchGram.objects.filter(key="item.vendor", obj_id=contract.pk, gram="삼성").exists())
+
+        save_items(contract, [item_row(name="노트북", vendor="엘지전자")])
+        grams = set(SearchGram.objects.filter(key="item.vendor", obj_id=contract.pk).values_list("gram", flat=True))
+        self.assertIn("엘지", grams)
+        self.assertNotIn("삼성", grams)
+
+    def test_cascade_delete_does_not_reindex_per_item(self):
+        contract = make_contract(self.admin, rows=[item_row(name=f"품목{i}") for i in range(150)])
+        self.assertEqual(ContractItem.objects.filter(contract=contract).count(), 150)
+        pk = contract.pk
+
+        with CaptureQueriesContext(connection) as ctx:
+            contract.delete()
+        gram_selects = [q for q in ctx.captured_queries
+                        if q["sql"].startswith("SELECT") and "expenses_searchgram" in q["sql"]]
+        self.assertEqual(gram_selects, [])
+        self.assertLess(len(ctx.captured_queries), 30, len(ctx.captured_queries))
+        self.assertFalse(SearchGram.objects.filter(obj_id=pk).exists())
+
+
+class DeltaExportTests(BaseTestCase):
+    def _ids(self, export):
+        return set(exportjobs.export_rows(export).values_list("id", flat=True))
+
+    def _request(self, now=None):
+        with mock.patch("expenses.exportjobs.timezone.now", return_value=now or timezone.now()):
+            export, created = exportjobs.request_export(QueryDict("delta=1"), self.admin)
+        self.assertTrue(created)
+        return export
+
+    def test_late_commit_with_older_updated_at_is_not_skipped(self):
+        lag = exportjobs._delta_lag_seconds()
+        old = make_contract(self.admin, customer="예전")
+        Contract.objects.filter(pk=old.pk).update(updated_at=timezone.now() - datetime.timedelta(seconds=lag * 3))
+
+        first = self._request()
+        self.assertEqual(self._ids(first), {old.pk})
+        exportjobs.build_export(first.pk)
+
+        # 등록 직전에 save() 됐지만 워커가 파일을 만든 뒤에야 커밋된 계약
+        second = self._request()
+        exportjobs.build_export(second.pk)
+        late = make_contract(self.admin, customer="늦은 커밋")
+        Contract.objects.filter(pk=late.pk).update(updated_at=second.created_at - datetime.timedelta(seconds=5))
+
+        third = self._request(now=second.created_at + datetime.timedelta(seconds=lag))
+        self.assertEqual(third.since, second.until)
+        self.assertIn(late.pk, self._ids(third))
+        self.assertNotIn(old.pk, self._ids(third))
+
+
+_handler_calls = []
+
+
+@jobs.handler("test.record")
+def _record_job(sleep=0, **kwargs):
+    _handler_calls.append(connection.in_atomic_block)
+    time.sleep(sleep)
+    _handler_calls.append(Job.objects.values_list("heartbeat_at", flat=True).get(kind="test.record"))
+
+
+class JobQueueTests(TransactionTestCase):
+    def setUp(self):
+        _handler_calls.clear()
+
+    def test_handler_runs_outside_a_transaction(self):
+        jobs.enqueue("test.record")
+        self.assertEqual(jobs.run_pending(), 1)
+        self.assertFalse(_handler_calls[0])
+        self.assertEqual(Job.objects.get().status, "done")
+
+    @mock.patch.object(jobs, "HEARTBEAT_SECONDS", 0.05)
+    def test_heartbeat_extends_lease_while_running(self):
+        jobs.enqueue("test.record", sleep=0.3)
+        job = jobs.claim_next()
+        self.assertTrue(jobs.run_job(job))
+        self.assertGreater(_handler_calls[1], job.heartbeat_at)
+        self.assertEqual(Job.objects.get(pk=job.pk).status, "done")
+
+    def test_heartbeat_keeps_long_job_from_being_reclaimed(self):
+        jobs.enqueue("test.record")
+        job = jobs.claim_next()
+        Job.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now())
+        self.assertIsNone(jobs.claim_next())
+
+    def test_stale_worker_cannot_overwrite_new_owner(self):
+        jobs.enqueue("test.record")
+        first = jobs.claim_next()
+        stale = timezone.now() - datetime.timedelta(seconds=jobs.LEASE_SECONDS + 1)
+        Job.objects.filter(pk=first.pk).update(heartbeat_at=stale, locked_at=stale)
+        first.locked_at = stale
+
+        second = jobs.claim_next()
+        self.assertEqual(second.pk, first.pk)
+        self.assertNotEqual(second.locked_at, first.locked_at)
+
+        # 늦게 끝난 첫 번째 실행은 상태를 기록하지 못함
+        with self.assertLogs("expenses.jobs", "WARNING"):
+            self.assertFalse(jobs.run_job(first))
+        row = Job.objects.get(pk=first.pk)
+        self.assertEqual(row.status, "running")
+        self.assertEqual(row.locked_at, second.locked_at)
+
+        self.assertTrue(jobs.run_job(second))
+        self.assertEqual(Job.objects.get(pk=first.pk).status, "done")
+
+
+def legacy_filter(qs, data, owner_field="writer_id", with_status=True):
+    """통합 전 각 화면에 있던 검색 블록 그대로 (filter_contracts 결과 비교용)"""
+    g = {k: (data.get(k) or "").strip() for k in
+         ("date_from", "date_to", "q_customer", "q_vendor", "owner", "q_item", "contract_no", "status")}
+    if g["date_from"]:
+        qs = qs.filter(created_at__date__gte=g["date_from"])
+    if g["date_to"]:
+        qs = qs.filter(created_at__date__lte=g["date_to"])
+    if g["q_customer"]:
+        qs = qs.filter(customer_company__icontains=g["q_customer"])
+    if g["q_vendor"]:
+        qs = qs.filter(items__vendor__icontains=g["q_vendor"]).distinct()
+    if g["owner"]:
+        qs = qs.filter(**{owner_field: int(g["owner"])})
+    if g["q_item"]:
+        qs = qs.filter(items__name__icontains=g["q_item"]).distinct()
+    if g["contract_no"]:
+        qs = qs.filter(contract_no__icontains=g["contract_no"])
+    if with_status and g["status"]:
+        qs = qs.filter(status=g["status"])
+    return list(qs.values_list("id", flat=True))
+
+
+def _ordered(qs):
+    return qs.order_by("-created_at", "-id", F("collect_invoice_date").desc(nulls_last=True))
+
+
+class ContractSearchTests(BaseTestCase):
+    """목록 6곳(계약목록/엑셀/임시저장/결재요청/결재처리중/결재완료)이 통합 전 필터와 같은 결과인지"""
+
+    STATUS_LISTS = {
+        "draft": "/accounts/contracts/temporary/",
+        "submitted": "/accounts/contracts/processing/",
+        "processing": "/accounts/contracts/in-progress/",
+        "completed": "/accounts/contracts/approved/",
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.kim = User.objects.create_user("kim", password="pw", first_name="김")
+        cls.lee = User.objects.create_user("lee", password="pw", first_name="이")
+        utc = datetime.timezone.utc
+        fixtures = [
+            # (작성자, 영업담당, 매출처, 상태, 등록시각(UTC), 품목[(품목명, 매입처)])
+            (cls.kim, cls.lee, "ACME 상사", "draft", datetime.datetime(2025, 3, 1, 0, 0, 0, tzinfo=utc),
+             [("노트북", "삼성전자"), ("마우스", "로지텍")]),
+            (cls.kim, None, "acme corp", "submitted", datetime.datetime(2025, 3, 1, 23, 59, 59, tzinfo=utc),
+             [("모니터", "엘지전자")]),
+            (cls.lee, cls.kim, "베타 산업", "processing", datetime.datetime(2025, 2, 28, 23, 59, 59, tzinfo=utc),
+             [("노트북 가방", "삼성물산"), ("노트북", "삼성전자")]),
+            (cls.lee, cls.lee, "감마", "completed", datetime.datetime(2025, 3, 2, 0, 0, 0, tzinfo=utc),
+             [("키보드", "로지텍")]),
+            (cls.admin, cls.kim, "델타 ACME", "completed", datetime.datetime(2025, 3, 1, 15, 30, tzinfo=utc), []),
+            (cls.kim, cls.kim, "엡실론", "draft", datetime.datetime(2025, 2, 28, 15, 0, tzinfo=utc),
+             [("노트북", "엘지전자")]),
+        ]
+        for writer, owner, customer, status, created, items in fixtures:
+            c = make_contract(writer, customer=customer, status=status, sales_owner=owner,
+                              rows=[item_row(name=n, vendor=v) for n, v in items])
+            Contract.objects.filter(pk=c.pk).update(created_at=created)
+        cls.first_no = Contract.objects.order_by("id").first().contract_no
+
+    def cases(self):
+        return [
+            {},
+            {"date_from": "2025-03-01"},
+            {"date_to": "2025-03-01"},
+            {"date_from": "2025-03-01", "date_to": "2025-03-01"},
+            {"date_from": "2025-02-28", "date_to": "2025-03-02"},
+            {"q_customer": "acme"},
+            {"q_customer": "ACME"},
+            {"q_customer": "상사"},
+            {"q_vendor": "삼성"},
+            {"q_vendor": "로지"},
+            {"q_item": "노트북"},
+            {"q_item": "노트북", "q_vendor": "삼성전자"},
+            {"owner": str(self.kim.pk)},
+            {"owner": str(self.lee.pk), "q_item": "키보드"},
+            {"contract_no": self.first_no},
+            {"contract_no": "DJ"},
+            {"status": "completed"},
+            {"status": "draft", "q_customer": "acme", "date_to": "2025-03-01"},
+            {"q_customer": "없는 거래처"},
+        ]
+
+    def assert_all_call_sites(self):
+        for params in self.cases():
+            with self.subTest(params=params):
+                data = QueryDict(mutable=True)
+                data.update(params)
+                base = _ordered(Contract.objects.all())
+
+                self.assertEqual(
+                    self.list_ids("/expenses/contracts/list/", params),
+                    legacy_filter(base, data),
+                )
+                self.assertEqual(
+                    list(exportjobs.export_queryset(data).values_list("id", flat=True)),
+                    legacy_filter(base, data, owner_field="sales_owner_id"),
+                )
+                for status, url in self.STATUS_LISTS.items():
+                    self.assertEqual(
+                        self.list_ids(url, params),
+                        legacy_filter(base.filter(status=status), data, with_status=False),
+                        url,
+                    )
+
+    def test_same_results_as_legacy_filters(self):
+        self.assert_all_call_sites()
+
+    def test_date_boundaries_follow_current_timezone(self):
+        with override_settings(TIME_ZONE="Asia/Seoul"):
+            self.assert_all_call_sites()
+
+    def test_export_owner_is_sales_owner(self):
+        data = QueryDict(f"owner={self.lee.pk}")
+        ids = set(exportjobs.export_queryset(data).values_list("id", flat=True))
+        self.assertEqual(ids, set(Contract.objects.filter(sales_owner=self.lee).values_list("id", flat=True)))
+        self.assertNotEqual(ids, set(Contract.objects.filter(writer=self.lee).values_list("id", flat=True)))
+
+
+def _create_contracts(writer_id, count, errors):
+    try:
+        for _ in range(count):
+            for attempt in range(50):
+                try:
+                    Contract.objects.create(writer_id=writer_id, customer_company="동시성")
+                    break
+                except Exception as e:
+                    # SQLite 공유 메모리 DB 는 쓰기 잠금 충돌을 대기 없이 바로 돌려줌 → 재시도
+                    if "locked" not in str(e) or attempt == 49:
+                        raise
+                    time.sleep(0.01)
+    except Exception as e:
+        errors.append(repr(e))
+    finally:
+        connections.close_all()
+
+
+def _create_contracts_process(writer_id, count, queue):
+    errors = []
+    _create_contracts(writer_id, count, errors)
+    queue.put(errors)
+
+
+@contextlib.contextmanager
+def _shared_test_db():
+    """
+    프로세스끼리 같은 DB 를 보게 함
+    SQLite 테스트 DB 는 보통 메모리 DB 라 fork 한 자식 프로세스가 볼 수 없음
+    → 임시 파일로 복사해 default 커넥션이 그 파일을 쓰게 하고, 끝나면 메모리 DB 로 되돌림
+    """
+    if connection.vendor != "sqlite" or not connection.is_in_memory_db():
+        yield
+        return
+    tmpdir = tempfile.mkdtemp()
+    path = os.path.join(tmpdir, "test.sqlite3")
+    connection.ensure_connection()
+    target = sqlite3.connect(path)
+    connection.connection.backup(target)
+    target.close()
+    # 메모리 DB 커넥션은 닫으면 DB 가 사라지므로 따로 들고 있다가 되돌림
+    name, memory = connection.settings_dict["NAME"], connection.connection
+    connection.connection = None
+    connection.settings_dict["NAME"] = path
+    try:
+        yield
+    finally:
+        connection.close()
+        connection.settings_dict["NAME"] = name
+        connection.connection = memory
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+class ContractSeqConcurrencyTests(TransactionTestCase):
+    """여러 스레드/프로세스가 동시에 계약을 만들어도 번호가 겹치거나 비지 않는지"""
+
+    WORKERS = 8
+    PER_WORKER = 10
+
+    def setUp(self):
+        self.writer = User.objects.create_user("writer", password="pw")
+
+    def assert_sequential(self, expected):
+        year = timezone.localdate().year
+        seqs = sorted(Contract.objects.filter(year=year).values_list("seq", flat=True))
+        self.assertEqual(seqs, list(range(1, expected + 1)))
+        nos = list(Contract.objects.values_list("contract_no", flat=True))
+        self.assertEqual(len(nos), len(set(nos)))
+
+    def test_threads(self):
+        errors = []
+        threads = [
+            threading.Thread(target=_create_contracts, args=(self.writer.pk, self.PER_WORKER, errors))
+            for _ in range(self.WORKERS)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(errors, [])
+        self.assert_sequential(self.WORKERS * self.PER_WORKER)
+
+    def test_processes(self):
+        with _shared_test_db():
+            connections.close_all()  # fork 한 자식이 부모 커넥션을 같이 쓰지 않게
+            ctx = multiprocessing.get_context("fork")
+            queue = ctx.Queue()
+            procs = [
+                ctx.Process(target=_create_contracts_process, args=(self.writer.pk, self.PER_WORKER, queue))
+                for _ in range(self.WORKERS)
+            ]
+            for p in procs:
+                p.start()
+            errors = [e for _ in procs for e in queue.get(timeout=60)]
+            for p in procs:
+                p.join()
+            self.assertEqual(errors, [])
+            self.assertTrue(all(p.exitcode == 0 for p in procs))
+            self.assert_sequential(self.WORKERS * self.PER_WORKER)
+
+    def test_block_reserve_failure_is_logged(self):
+        with override_settings(CONTRACT_SEQ_BLOCK_SIZE=5), \
+                mock.patch.object(sequences, "_reserve", side_effect=RuntimeError("boom")), \
+                self.assertLogs("expenses.sequences", "WARNING"):
+            sequences._blocks.clear()
+            with self.assertRaises(RuntimeError):
+                sequences.next_contract_seq(2099)
+
+
+class ContractListQueryTests(BaseTestCase):
+    """계약 목록 쿼리 수가 행/품목/사진 수와 무관하게 일정하고, 표에 없는 칼럼/사진 행은 읽지 않는지"""
+
+    def make_rows(self, n):
+        for i in range(n):
+            c = make_contract(self.admin, customer=f"매출처{i}", collect_note="메모" * 5000, ship_addr="주소" * 100,
+                              rows=[item_row(name=f"품목{j}") for j in range(3)])
+            ContractImage.objects.create(contract=c, original=f"contracts/orig/{c.pk}.jpg")
+
+    def test_query_count_is_constant(self):
+        # 세션, 사용자, 프로필, 건수, 계약 페이지, 품목 prefetch, 상태별 건수, 담당자 목록
+        for n, expected in ((2, 2), (20, 22), (78, 100)):
+            self.make_rows(n)
+            cache.clear()
+            with self.subTest(rows=expected), self.assertNumQueries(8):
+                ids = self.list_ids("/expenses/contracts/list/", {})
+            self.assertEqual(len(ids), expected)
+
+    def test_long_text_and_image_rows_are_not_loaded(self):
+        self.make_rows(100)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/expenses/contracts/list/", {"per_page": 100})
+        page = list(response.context["page_obj"].object_list)
+        self.assertEqual(len(page), 100)
+        sql = "\n".join(q["sql"] for q in ctx.captured_queries)
+        # 목록에 없는 긴 칼럼 (계약 메모/배송지, 품목 과세구분)
+        for column in ("collect_note", "ship_addr", "ship_item", "ship_phone", "vat_mode"):
+            self.assertNotIn(f'."{column}"', sql)
+        # 사진은 장수만 서브쿼리로 (사진 행 전체를 읽는 조회 없음)
+        for column in ("original", "thumb", "medium"):
+            self.assertNotIn(f'"expenses_contractimage"."{column}"', sql)
+
+        # 100행 페이지에 실제로 실린 값 크기: 메모(10KB × 100)가 섞이면 1MB 를 넘음
+        def loaded(obj):
+            return [v for k, v in obj.__dict__.items() if not k.startswith("_")]
+
+        values = [v for c in page for obj in (c, *c.items.all()) for v in loaded(obj)]
+        self.assertLess(sum(len(str(v)) for v in values), 100 * 1024)
+
+
+class SaveItemsQueryTests(BaseTestCase):
+    """save_items 쿼리 수가 품목 줄 수와 무관하게 일정한지 (추가/수정/삭제 섞어서)"""
+
+    SCENARIOS = {
+        # 이름: (기존 줄 수, 저장할 줄 목록)
+        "insert": lambda n: (0, [item_row(name=f"새{i}") for i in range(n)]),
+        "update+insert": lambda n: (n, [item_row(name=f"수정{i}", sell=2000) for i in range(n)]
+                                    + [item_row(name=f"새{i}") for i in range(n)]),
+        "update+delete": lambda n: (2 * n, [item_row(name=f"수정{i}", buy=700) for i in range(n)]),
+        "update+keep+delete": lambda n: (2 * n, [item_row(name=f"품목{i}") for i in range(n)]
+                                         + [item_row(name=f"수정{i}", qty=2) for i in range(n - 1)]),
+    }
+
+    def setUp(self):
+        super().setUp()
+        # 그날 첫 저장은 일자별 집계 행을 새로 만드는 쿼리가 더 나가므로 미리 한 건
+        make_contract(self.admin, rows=[item_row()])
+
+    def prepare(self, scenario, n):
+        existing, rows = self.SCENARIOS[scenario](n)
+        return make_contract(self.admin, rows=[item_row(name=f"품목{i}") for i in range(existing)]), rows
+
+    def assert_saved(self, contract, rows):
+        names = list(contract.items.order_by("id").values_list("name", flat=True))
+        self.assertEqual(names, [r["name"] for r in rows])
+
+    def test_query_count_is_constant(self):
+        for scenario in self.SCENARIOS:
+            with self.subTest(scenario):
+                contract, rows = self.prepare(scenario, 3)
+                with CaptureQueriesContext(connection) as ctx:
+                    save_items(contract, rows)
+                self.assert_saved(contract, rows)
+
+                contract, rows = self.prepare(scenario, 50)
+                with self.assertNumQueries(len(ctx.captured_queries)):
+                    save_items(contract, rows)
+                self.assert_saved(contract, rows)
+
+
+class ContractTotalsTests(BaseTestCase):
+    """save_items 가 저장한 계약 합계(sell_sum/buy_sum/profit/margin_rate)가 품목으로 계산한 값과 같은지"""
+
+    def assert_totals(self, contract, sell, buy):
+        expected = totals.compute(Decimal(sell), Decimal(buy))
+        contract.refresh_from_db()
+        self.assertEqual({f: getattr(contract, f) for f in totals.FIELDS}, expected)
+        items = contract.items.all()
+        self.assertEqual(
+            expected, totals.compute(sum(i.sell_total for i in items), sum(i.buy_total for i in items))
+        )
+        self.assertEqual(totals.verify(), [])
+
+    def test_store_follows_item_edits_and_deletes(self):
+        contract = make_contract(self.admin, rows=[item_row(sell=1000, buy=600), item_row(sell=3000, buy=1000)])
+        self.assert_totals(contract, 4000, 1600)
+        self.assertEqual(contract.margin_rate, Decimal("60.0000"))
+
+        save_items(contract, [item_row(sell=1000, buy=600), item_row(sell=2000, buy=1900)])  # 수정
+        self.assert_totals(contract, 3000, 2500)
+
+        save_items(contract, [item_row(sell=1000, buy=1200)])  # 삭제 (손실)
+        self.assert_totals(contract, 1000, 1200)
+        self.assertEqual(contract.profit, Decimal("-200"))
+
+        save_items(contract, [item_row(sell=1000, buy=1200), item_row(sell=500, buy=0)])  # 추가
+        self.assert_totals(contract, 1500, 1200)
+
+        save_items(contract, [])  # 전부 삭제 → 매출 0 이면 이익율 없음
+        self.assert_totals(contract, 0, 0)
+        self.assertIsNone(contract.margin_rate)
+
+    def test_verify_reports_stale_totals(self):
+        contract = make_contract(self.admin, rows=[item_row(sell=1000, buy=600)])
+        ContractItem.objects.filter(contract=contract).update(sell_total=5000)  # save_items 를 거치지 않은 변경
+        self.assertEqual([pk for pk, _raw, _stored in totals.verify()], [contract.pk])
+        totals.refresh(contract)
+        self.assert_totals(contract, 5000, 600)
+
+
+def _png_bytes(size=(4, 4)):
+    bio = io.BytesIO()
+    PILImage.new("RGB", size, "white").save(bio, format="PNG")
+    return bio.getvalue()
+
+
+PNG = _png_bytes()
+PNG_SHA256 = hashlib.sha256(PNG).hexdigest()
+
+
+class DirectUploadTests(BaseTestCase):
+    """사진 직접 업로드: 토큰 발급 → 로컬 업로드 엔드포인트 → 저장 시 확인"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other = User.objects.create_user("other", password="pw")
+
+    def issue(self, user=None, filename="photo.png"):
+        return directupload.issue(user or self.admin, filename, "image/png", size=len(PNG), sha256=PNG_SHA256)
+
+    def upload(self, token, content=PNG, content_type="image/png"):
+        return self.client.post(
+            reverse("expenses:contract_upload_local", args=[token]),
+            {"file": SimpleUploadedFile("photo.png", content, content_type=content_type)},
+        )
+
+    def test_round_trip(self):
+        response = self.client.post(reverse("expenses:contract_upload_targets"), {
+            "filename": ["a.png", "b.jpg"], "content_type": ["image/png", "image/jpeg"], "size": ["10", "20"],
+            "sha256": [PNG_SHA256, "ab" * 32],
+        })
+        self.assertEqual(response.status_code, 200)
+        targets = response.json()["uploads"]
+        self.assertEqual(len(targets), 2)
+        self.assertTrue(targets[0]["key"].startswith("contracts/orig/"))
+        self.assertEqual(targets[0]["url"], reverse("expenses:contract_upload_local", args=[targets[0]["token"]]))
+
+        response = self.upload(targets[0]["token"])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["key"], targets[0]["key"])
+        self.assertTrue(default_storage.exists(targets[0]["key"]))
+
+        uploads, errors = directupload.verify_uploads([targets[0]["token"], targets[0]["token"]], self.admin)
+        self.assertEqual(errors, {})
+        self.assertEqual(len(uploads), 1)
+        self.assertEqual(uploads[0]["name"], targets[0]["key"])
+        self.assertEqual(uploads[0]["size"], len(PNG))
+        self.assertEqual(uploads[0]["filename"], "a.png")
+        self.assertEqual(uploads[0]["digest"], PNG_SHA256)
+
+    def test_targets_rejects_non_image_and_oversize(self):
+        url = reverse("expenses:contract_upload_targets")
+        ok = {"filename": "a.png", "content_type": "image/png", "size": "10", "sha256": PNG_SHA256}
+        self.assertEqual(self.client.post(url, ok).status_code, 200)
+        for bad in (
+            {"filename": "a.pdf", "content_type": "application/pdf"},
+            {"size": str(directupload.max_size() + 1)},
+            {"sha256": "not-a-digest"},
+            {"sha256": []},
+            {"filename": ["a.png"] * 11, "content_type": ["image/png"] * 11, "sha256": [PNG_SHA256] * 11},
+        ):
+            with self.subTest(bad=bad):
+                self.assertEqual(self.client.post(url, {**ok, **bad}).status_code, 400)
+
+    def test_forged_token(self):
+        target = self.issue()
+        forged = signing.dumps({"k": "contracts/orig/evil.png", "u": self.admin.pk, "n": "x", "t": "image/png"},
+                               salt="another.salt")
+        for token in (forged, target["token"][:-2] + "xx"):
+            with self.subTest(token=token):
+                self.assertEqual(self.upload(token).status_code, 400)
+                with self.assertRaises(ValueError):
+                    directupload.save_local(token, self.admin, SimpleUploadedFile("p.png", PNG, "image/png"))
+                _uploads, errors = directupload.verify_uploads([token], self.admin)
+                self.assertEqual(len(errors["images"]), 1)
+        self.assertFalse(default_storage.exists("contracts/orig/evil.png"))
+
+    def test_token_of_another_user(self):
+        target = self.issue(user=self.other)
+        response = self.upload(target["token"])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(default_storage.exists(target["key"]))
+
+        # 다른 사람이 올려 둔 파일도 내 계약에는 붙일 수 없음
+        directupload.save_local(target["token"], self.other, SimpleUploadedFile("p.png", PNG, "image/png"))
+        uploads, errors = directupload.verify_uploads([target["token"]], self.admin)
+        self.assertEqual(uploads, [])
+        self.assertEqual(len(errors["images"]), 1)
+
+    def test_oversize_file(self):
+        target = self.issue()
+        with override_settings(CONTRACT_IMAGE_MAX_UPLOAD_SIZE=len(PNG) - 1):
+            response = self.upload(target["token"])
+            self.assertEqual(response.status_code, 400)
+            self.assertFalse(default_storage.exists(target["key"]))
+
+            # 스토리지에 직접 들어간 큰 파일(S3 정책 우회 등)도 저장 시 거부
+            default_storage.save(target["key"], ContentFile(PNG))
+            uploads, errors = directupload.verify_uploads([target["token"]], self.admin)
+        self.assertEqual(uploads, [])
+        self.assertIn("MB", errors["images"][0])
+
+    def test_content_must_match_sha256(self):
+        target = self.issue()
+        response = self.upload(target["token"], content=PNG + b"tampered")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(default_storage.exists(target["key"]))
+
+    def test_non_image_upload(self):
+        target = self.issue()
+        response = self.upload(target["token"], content=b"%PDF-1.4", content_type="application/pdf")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(default_storage.exists(target["key"]))
+
+    def test_missing_upload(self):
+        target = self.issue()
+        uploads, errors = directupload.verify_uploads([target["token"]], self.admin)
+        self.assertEqual(uploads, [])
+        self.assertIn("업로드가 끝나지 않았습니다", errors["images"][0])
+
+        response = self.client.post(reverse("expenses:contract_upload_local", args=[target["token"]]))
+        self.assertEqual(response.status_code, 400)
+
+    def test_replayed_token(self):
+        target = self.issue()
+        self.assertEqual(self.upload(target["token"]).status_code, 201)
+        with default_storage.open(target["key"], "rb") as f:
+            first = f.read()
+
+        response = self.upload(target["token"])
+        self.assertEqual(response.status_code, 400)
+        with default_storage.open(target["key"], "rb") as f:
+            self.assertEqual(f.read(), first)
+        # 같은 경로에 접미사 붙은 사본(<uuid>_xxxx.png)도 남기지 않음
+        folder, filename = target["key"].rsplit("/", 1)
+        stem = filename.rsplit(".", 1)[0]
+        _dirs, files = default_storage.listdir(folder)
+        self.assertEqual([f for f in files if f.startswith(stem)], [filename])
+
+    def test_expired_upload_url(self):
+        target = self.issue()
+        later = time.time() + directupload.URL_EXPIRE_SECONDS + 1
+        with mock.patch("django.core.signing.time.time", return_value=later):
+            self.assertEqual(self.upload(target["token"]).status_code, 400)
+        self.assertFalse(default_storage.exists(target["key"]))
+
+
+class ImageStoreTests(BaseTestCase):
+    """사진 내용(sha256) 기준 저장: 중복 재사용, 참조 수, 마지막 참조 삭제 시 파일 정리, 파생본 공유"""
+
+    def setUp(self):
+        super().setUp()
+        self.c1 = make_contract(self.admin)
+        self.c2 = make_contract(self.admin)
+
+    def attach(self, contract, content=PNG):
+        with self.captureOnCommitCallbacks(execute=True):
+            return imagestore.attach(contract, SimpleUploadedFile("a.png", content, content_type="image/png"))
+
+    def jobs_of(self, kind):
+        return list(Job.objects.filter(kind=kind).values_list("payload", flat=True))
+
+    def test_same_content_shares_one_blob(self):
+        img1 = self.attach(self.c1)
+        img2 = self.attach(self.c2)
+        self.assertEqual(img1.blob_id, img2.blob_id)
+        self.assertEqual(img1.original.name, img2.original.name)
+        self.assertEqual(ImageBlob.objects.get().refcount, 2)
+        self.assertEqual(ImageBlob.objects.get().sha256, PNG_SHA256)
+        # 파생본 생성은 처음 사진만, 두 번째는 준비되면 복사하는 작업
+        self.assertEqual(len(self.jobs_of(signals.DERIVATIVES_JOB)), 1)
+        self.assertEqual(len(self.jobs_of(signals.COPY_DERIVATIVES_JOB)), 1)
+
+        other = self.attach(self.c2, content=_png_bytes(size=(5, 5)))
+        self.assertNotEqual(other.blob_id, img1.blob_id)
+
+    def test_release_deletes_files_with_last_reference(self):
+        img1 = self.attach(self.c1)
+        img2 = self.attach(self.c2)
+        signals.generate_derivatives(img1.pk)
+        blob = ImageBlob.objects.get()
+        names = [blob.original, blob.thumb, blob.medium]
+        self.assertTrue(all(default_storage.exists(n) for n in names))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            img1.delete()
+        self.assertEqual(ImageBlob.objects.get().refcount, 1)
+        self.assertTrue(all(default_storage.exists(n) for n in names))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            img2.delete()
+        self.assertFalse(ImageBlob.objects.exists())
+        self.assertFalse(any(default_storage.exists(n) for n in names))
+
+    def test_attach_stored_duplicate_discards_new_upload(self):
+        first = default_storage.save("contracts/orig/x/first.png", ContentFile(PNG))
+        second = default_storage.save("contracts/orig/x/second.png", ContentFile(PNG))
+        with self.captureOnCommitCallbacks(execute=True):
+            img1 = imagestore.attach_stored(self.c1, first, PNG_SHA256, "a.png", len(PNG))
+        with self.captureOnCommitCallbacks(execute=True):
+            img2 = imagestore.attach_stored(self.c2, second, PNG_SHA256, "b.png", len(PNG))
+        self.assertEqual(img2.original.name, first)
+        self.assertEqual(img2.filename, "b.png")
+        self.assertEqual(ImageBlob.objects.get().refcount, 2)
+        self.assertTrue(default_storage.exists(first))
+        self.assertFalse(default_storage.exists(second))
+        self.assertEqual(img1.blob_id, img2.blob_id)
+
+    def test_pending_reuse_missed_by_bulk_update_gets_copied(self):
+        img1 = self.attach(self.c1)
+        stale_blob = ImageBlob.objects.get()  # 재사용하는 요청이 읽은 시점엔 아직 pending
+        # 파생본 작업의 일괄 갱신이 두 번째 사진 행보다 먼저 지나감
+        signals.generate_derivatives(img1.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            img2 = imagestore._reuse(self.c2, stale_blob, "b.png")
+        img2.refresh_from_db()
+        self.assertEqual(img2.deriv_status, "pending")
+        self.assertEqual(img2.thumb.name, "")
+
+        (payload,) = self.jobs_of(signals.COPY_DERIVATIVES_JOB)
+        signals.copy_derivatives(**payload)
+        img2.refresh_from_db()
+        blob = ImageBlob.objects.get()
+        self.assertEqual(img2.deriv_status, "ready")
+        self.assertEqual((img2.thumb.name, img2.medium.name), (blob.thumb, blob.medium))
+
+    def test_copy_waits_then_generates_itself(self):
+        self.attach(self.c1)
+        img2 = self.attach(self.c2)
+        Job.objects.all().delete()
+
+        signals.copy_derivatives(img2.pk)
+        (job,) = Job.objects.filter(kind=signals.COPY_DERIVATIVES_JOB)
+        self.assertEqual(job.payload["rounds"], 1)
+        self.assertGreater(job.run_after, timezone.now())
+
+        signals.copy_derivatives(img2.pk, rounds=signals.COPY_MAX_ROUNDS)
+        self.assertEqual(self.jobs_of(signals.DERIVATIVES_JOB), [{"image_id": img2.pk}])
+
+        ImageBlob.objects.update(deriv_status="failed")
+        Job.objects.all().delete()
+        signals.copy_derivatives(img2.pk)
+        self.assertEqual(self.jobs_of(signals.DERIVATIVES_JOB), [{"image_id": img2.pk}])
+
+
+@override_settings(
+    STORAGES={"default": {"BACKEND": "storages.backends.s3.S3Storage", "OPTIONS": {
+        "bucket_name": "test-bucket", "access_key": "test", "secret_key": "test", "region_name": "ap-northeast-2",
+    }}},
+)
+class DirectUploadS3Tests(BaseTestCase):
+    """S3: presigned POST 에 sha256 조건을 넣고, 저장 시에는 HeadObject 만 (본문을 읽지 않음)"""
+
+    def setUp(self):
+        super().setUp()
+        from botocore.stub import Stubber
+
+        self.target = directupload.issue(self.admin, "a.png", "image/png", size=len(PNG), sha256=PNG_SHA256)
+        self.client_s3 = default_storage.bucket.meta.client
+        self.stub = Stubber(self.client_s3)
+        self.stub.activate()
+        self.addCleanup(self.stub.deactivate)
+
+    def expect_head(self, checksum, size=len(PNG)):
+        response = {"ContentLength": size}
+        if checksum:
+            response["ChecksumSHA256"] = checksum
+        self.stub.add_response("head_object", response, {
+            "Bucket": "test-bucket", "Key": self.target["key"], "ChecksumMode": "ENABLED",
+        })
+
+    def test_presigned_post_requires_checksum(self):
+        b64 = base64.b64encode(hashlib.sha256(PNG).digest()).decode()
+        self.assertEqual(self.target["fields"]["x-amz-checksum-sha256"], b64)
+        policy = json.loads(base64.b64decode(self.target["fields"]["policy"]))
+        self.assertIn({"x-amz-checksum-sha256": b64}, policy["conditions"])
+
+    def test_verify_uses_head_object_only(self):
+        self.expect_head(base64.b64encode(hashlib.sha256(PNG).digest()).decode())
+        with mock.patch.object(default_storage, "open") as storage_open:
+            uploads, errors = directupload.verify_uploads([self.target["token"]], self.admin)
+        storage_open.assert_not_called()
+        self.stub.assert_no_pending_responses()
+        self.assertEqual(errors, {})
+        self.assertEqual(uploads[0]["digest"], PNG_SHA256)
+        self.assertEqual(uploads[0]["size"], len(PNG))
+
+    def test_checksum_mismatch_or_missing(self):
+        for checksum in (base64.b64encode(b"x" * 32).decode(), None):
+            with self.subTest(checksum=checksum):
+                self.expect_head(checksum)
+                uploads, errors = directupload.verify_uploads([self.target["token"]], self.admin)
+                self.assertEqual(uploads, [])
+                self.assertEqual(len(errors["images"]), 1)
+
+    def test_missing_object(self):
+        self.stub.add_client_error("head_object", "404", http_status_code=404)
+        uploads, errors = directupload.verify_uploads([self.target["token"]], self.admin)
+        self.assertEqual(uploads, [])
+        self.assertIn("업로드가 끝나지 않았습니다", errors["images"][0])
+
+
+@override_settings(
+    STORAGES={"default": {"BACKEND": "storages.backends.s3.S3Storage", "OPTIONS": {
+        "bucket_name": "test-bucket", "access_key": "test", "secret_key": "test", "region_name": "ap-northeast-2",
+        "querystring_auth": True, "querystring_expire": 7200,
+    }}},
+    SIGNED_URL_MIN_VALIDITY=3600,
+)
+class SignedUrlCacheTests(BaseTestCase):
+    """서명 URL 을 재사용하다가 만료 - SIGNED_URL_MIN_VALIDITY 시점이 되면 다시 서명하는지"""
+
+    NOW = 1_800_000_000
+
+    def setUp(self):
+        super().setUp()
+        signedurls._lru.clear()
+        self.addCleanup(signedurls._lru.clear)
+        self.clock = mock.patch.object(signedurls, "time").start()
+        self.clock.time.return_value = self.NOW
+        self.sign = mock.patch.object(default_storage, "url", wraps=default_storage.url).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def at(self, seconds):
+        self.clock.time.return_value = self.NOW + seconds
+
+    def test_cached_url_is_reused(self):
+        first = signedurls.urls(["contracts/thumb/a.jpg", "contracts/thumb/b.jpg", ""])
+        self.assertEqual(self.sign.call_count, 2)
+        self.assertIn("X-Amz-Expires=7200", first["contracts/thumb/a.jpg"])
+
+        self.at(60)
+        self.assertEqual(signedurls.url("contracts/thumb/a.jpg"), first["contracts/thumb/a.jpg"])
+        # 다른 프로세스(LRU 비어 있음)도 공유 캐시의 URL 을 그대로 사용
+        signedurls._lru.clear()
+        self.assertEqual(signedurls.urls(["contracts/thumb/a.jpg", "contracts/thumb/b.jpg"]), first)
+        self.assertEqual(self.sign.call_count, 2)
+
+    def test_resigned_before_min_validity(self):
+        first = signedurls.url("contracts/thumb/a.jpg")
+        # 유효 7200초 - 최소 여유 3600초 = 3600초까지만 재사용
+        self.at(3599)
+        self.assertEqual(signedurls.url("contracts/thumb/a.jpg"), first)
+        signedurls._lru.clear()
+        self.assertEqual(signedurls.url("contracts/thumb/a.jpg"), first)
+        self.assertEqual(self.sign.call_count, 1)
+
+        self.at(3600)
+        signedurls.url("contracts/thumb/a.jpg")
+        self.assertEqual(self.sign.call_count, 2)
+        # 새로 서명한 URL 은 다시 3600초 동안 재사용 (공유 캐시에 남은 이전 URL 로 돌아가지 않음)
+        signedurls._lru.clear()
+        self.at(7100)
+        signedurls.url("contracts/thumb/a.jpg")
+        self.assertEqual(self.sign.call_count, 2)
+
+    @override_settings(SIGNED_URL_MIN_VALIDITY=6000)
+    def test_margin_is_capped_at_half_the_expiry(self):
+        signedurls.url("contracts/thumb/a.jpg")
+        self.at(3599)
+        signedurls.url("contracts/thumb/a.jpg")
+        self.assertEqual(self.sign.call_count, 1)
+        self.at(3600)
+        signedurls.url("contracts/thumb/a.jpg")
+        self.assertEqual(self.sign.call_count, 2)
+
+
+class ExportImageCacheTests(BaseTestCase):
+    """엑셀 사진 캐시: 동시에 만들어도 접미사 붙은 사본이 남지 않는지"""
+
+    def setUp(self):
+        super().setUp()
+        self.source = default_storage.save("contracts/thumb/cache-test.png", ContentFile(PNG))
+        self.cache_name = "contracts/export/cache-test_200.png"
+
+    def tearDown(self):
+        for name in (self.source, self.cache_name):
+            default_storage.delete(name)
+
+    def cached_copies(self):
+        _dirs, files = default_storage.listdir("contracts/export")
+        return [f for f in files if f.startswith("cache-test_200")]
+
+    def test_concurrent_miss_keeps_single_copy(self):
+        real_read = exports._read
+
+        def miss_cache(name):
+            if name == self.cache_name:
+                raise FileNotFoundError(name)
+            return real_read(name)
+
+        with mock.patch.object(exports, "_read", side_effect=miss_cache):
+            # 첫 번째가 저장한 뒤 두 번째가 캐시 확인(exists)으로 건너뜀
+            self.assertIsNotNone(exports.export_png_bytes((self.source,), self.cache_name))
+            self.assertIsNotNone(exports.export_png_bytes((self.source,), self.cache_name))
+            # exists 확인과 save 사이에 다른 스레드가 먼저 저장한 경우
+            real_exists = default_storage.exists
+            checks = []
+
+            def stale_exists(name):
+                checks.append(name)
+                return False if len(checks) == 1 else real_exists(name)
+
+            with mock.patch.object(default_storage, "exists", side_effect=stale_exists):
+                self.assertIsNotNone(exports.export_png_bytes((self.source,), self.cache_name))
+        self.assertEqual(self.cached_copies(), ["cache-test_200.png"])
+
+
+class StorageGcTests(BaseTestCase):
+    """사진 교체/삭제 시 스토리지 파일은 커밋된 뒤에만 지워지고, 롤백되면 남는지"""
+
+    def setUp(self):
+        super().setUp()
+        storagegc._pending().clear()
+        self.contract = make_contract(self.admin)
+
+    def tearDown(self):
+        storagegc._pending().clear()
+
+    def make_image(self, name):
+        name = default_storage.save(f"contracts/orig/gc/{name}", ContentFile(PNG))
+        self.addCleanup(default_storage.delete, name)
+        return ContractImage.objects.create(contract=self.contract, original=name)
+
+    def orphans(self):
+        return set(StorageOrphan.objects.values_list("name", flat=True))
+
+    def test_delete_removes_file_after_commit(self):
+        image = self.make_image("delete.png")
+        name = image.original.name
+        with self.captureOnCommitCallbacks(execute=True):
+            image.delete()
+            # 커밋 전: 기록만 있고 파일은 그대로
+            self.assertIn(name, self.orphans())
+            self.assertTrue(default_storage.exists(name))
+        self.assertFalse(default_storage.exists(name))
+        self.assertEqual(self.orphans(), set())
+
+    def test_replace_removes_old_file_after_commit(self):
+        image = self.make_image("old.png")
+        old = image.original.name
+        new = default_storage.save("contracts/orig/gc/new.png", ContentFile(PNG))
+        self.addCleanup(default_storage.delete, new)
+        with self.captureOnCommitCallbacks(execute=True):
+            image.original.name = new
+            image.save()
+            self.assertIn(old, self.orphans())
+            self.assertTrue(default_storage.exists(old))
+        self.assertFalse(default_storage.exists(old))
+        self.assertTrue(default_storage.exists(new))
+        self.assertEqual(self.orphans(), set())
+
+    def test_rollback_leaves_no_orphan(self):
+        image = self.make_image("rollback.png")
+        pk, name = image.pk, image.original.name
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                image.delete()
+                raise RuntimeError("rollback")
+        self.assertEqual(callbacks, [])
+        self.assertEqual(self.orphans(), set())
+        self.assertTrue(ContractImage.objects.filter(pk=pk).exists())
+        self.assertTrue(default_storage.exists(name))
+
+        # 롤백된 이름이 스레드에 남아 있어도 다음 커밋이 그 파일을 지우지 않음
+        other = self.make_image("other.png")
+        with self.captureOnCommitCallbacks(execute=True):
+            other.delete()
+        self.assertFalse(default_storage.exists(other.original.name))
+        self.assertTrue(default_storage.exists(name))
+
+    def test_sweep_deletes_object_and_row(self):
+        names = [default_storage.save(f"contracts/orig/gc/sweep{i}.png", ContentFile(PNG)) for i in range(3)]
+        StorageOrphan.objects.bulk_create([StorageOrphan(name=n) for n in names])
+        self.assertEqual(storagegc.sweep(), (3, 0))
+        self.assertFalse(any(default_storage.exists(n) for n in names))
+        self.assertEqual(self.orphans(), set())
+
+    def test_storage_delete_failure_is_logged(self):
+        StorageOrphan.objects.create(name="contracts/orig/missing.png")
+        with mock.patch.object(storagegc, "delete_many", return_value={"contracts/orig/missing.png": "boom"}), \
+                self.assertLogs("expenses.storagegc", "WARNING") as logs:
+            self.assertEqual(storagegc.sweep(), (0, 1))
+        self.assertIn("contracts/orig/missing.png", logs.output[0])
+        self.assertEqual(StorageOrphan.objects.get().attempts, 1)
+
+
+class ContractSheetWriterTests(BaseTestCase):
+    """write-only 로 쓴 엑셀을 다시 열어 병합/사진 위치/금액 서식이 유지되는지"""
+
+    def write(self, contracts):
+        out = io.BytesIO()
+        with tempfile.TemporaryDirectory() as workdir:
+            writer = exports.ContractSheetWriter(workdir)
+            for c, png_list in contracts:
+                writer.add_contract(c, list(c.items.order_by("id")), png_list)
+            writer.save(out)
+        out.seek(0)
+        return load_workbook(out)["계약목록"]
+
+    def test_merges_image_anchor_and_number_format(self):
+        multi = make_contract(self.admin, customer="여러품목",
+                              rows=[item_row(name=f"품목{i}", sell=1000 * (i + 1)) for i in range(3)])
+        single = make_contract(self.admin, customer="한품목", rows=[item_row()])
+        multi.refresh_from_db()
+        single.refresh_from_db()
+        ws = self.write([(multi, [PNG]), (single, [])])
+
+        # 헤더 1행, 여러품목 2~4행, 한품목 5행
+        self.assertEqual(ws["C2"].value, "여러품목")
+        self.assertEqual([ws.cell(r, 10).value for r in range(2, 6)], ["품목0", "품목1", "품목2", "품목"])
+        merged = {str(r) for r in ws.merged_cells.ranges}
+        expected = {f"{get_column_letter(col)}2:{get_column_letter(col)}4" for col in exports.MERGED_COLS}
+        self.assertEqual(merged, expected)
+        self.assertIn("R2:R4", merged)
+        self.assertNotIn("J2:J4", merged)
+
+        # 사진은 병합된 사진 칸(R2)에 고정
+        self.assertEqual(len(ws._images), 1)
+        anchor = ws._images[0].anchor._from
+        self.assertEqual((anchor.col + 1, anchor.row + 1), (exports.PHOTO_COL, 2))
+
+        # 금액 칸(이익금액, 매출/매입 단가·금액)은 krw 서식 그대로
+        for row in (2, 3, 5):
+            for col in (13, 14, 15, 16):
+                self.assertEqual(ws.cell(row, col).number_format, '#,##0.00"원"')
+        self.assertEqual(ws["H2"].number_format, '#,##0.00"원"')
+        self.assertEqual(ws["N4"].value, 3000)
+
+
+class KeysetPaginationTests(BaseTestCase):
+    """페이지 링크 커서(?cursor=)로 찾아간 페이지가 처음부터 OFFSET 으로 센 페이지와 같은지"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        base = datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc)
+        rows = Contract.objects.bulk_create([
+            Contract(writer=cls.admin, customer_company=f"c{i}", contract_no=f"P{i}") for i in range(35)
+        ])
+        # 같은 시각이 여럿이어도 id 로 순서가 정해지는지 보려고 3건씩 같은 시각
+        for i, c in enumerate(rows):
+            Contract.objects.filter(pk=c.pk).update(created_at=base + datetime.timedelta(minutes=i // 3))
+
+    def qs(self):
+        return Contract.objects.order_by("-created_at", "-id")
+
+    def ids(self, page_obj):
+        return [c.pk for c in page_obj.object_list]
+
+    def expected(self, number, per_page=10):
+        return list(self.qs().values_list("pk", flat=True)[(number - 1) * per_page:number * per_page])
+
+    def test_cursor_pages_match_offset_pages(self):
+        first = KeysetPaginator(self.qs(), 10).get_page(1)
+        for number in (1, 2, 3, 4):
+            with self.subTest(page=number):
+                page_obj = KeysetPaginator(self.qs(), 10, cursor=first.cursor).get_page(number)
+                self.assertEqual(self.ids(page_obj), self.expected(number))
+
+        # 3 페이지에서 만든 링크로 앞쪽 페이지로 돌아가기
+        third = KeysetPaginator(self.qs(), 10, cursor=first.cursor).get_page(3)
+        for number in (1, 2, 3, 4):
+            with self.subTest(back_from=3, page=number):
+                page_obj = KeysetPaginator(self.qs(), 10, cursor=third.cursor).get_page(number)
+                self.assertEqual(self.ids(page_obj), self.expected(number))
+
+    def test_next_page_seeks_without_offset(self):
+        second = KeysetPaginator(self.qs(), 10).get_page(2)
+        with CaptureQueriesContext(connection) as ctx:
+            page_obj = KeysetPaginator(self.qs(), 10, cursor=second.cursor).get_page(3)
+        self.assertEqual(self.ids(page_obj), self.expected(3))
+        select = [q["sql"] for q in ctx.captured_queries if "COUNT(" not in q["sql"]]
+        self.assertEqual(len(select), 1)
+        self.assertNotIn("OFFSET", select[0])
+
+    def test_bad_cursor_falls_back_to_offset(self):
+        for cursor in ("", "x", "0.1.1", "1.2"):
+            with self.subTest(cursor=cursor):
+                page_obj = KeysetPaginator(self.qs(), 10, cursor=cursor).get_page(2)
+                self.assertEqual(self.ids(page_obj), self.expected(2))
+
+    @override_settings(CONTRACT_LIST_COUNT_CAP=5)
+    def test_count_is_capped(self):
+        paginator = KeysetPaginator(self.qs(), 2)
+        paginator.get_page(1)
+        # 1 블록(10페이지 × 2건) + 1 행까지만 셈
+        self.assertTrue(paginator.count_capped)
+        self.assertEqual(paginator.count_text, "20+")
+        self.assertEqual(paginator.num_pages, 11)
+
+        paginator = KeysetPaginator(self.qs(), 100)
+        paginator.get_page(1)
+        self.assertFalse(paginator.count_capped)
+        self.assertEqual(paginator.count_text, "35")
+
+    def test_page_links_carry_cursor(self):
+        response = self.client.get("/expenses/contracts/list/", {"q_customer": "c"})
+        cursor = response.context["page_obj"].cursor
+        self.assertContains(response, f"?page=2&cursor={cursor}&q_customer=c")
+        response = self.client.get("/expenses/contracts/list/", {"q_customer": "c", "page": 2, "cursor": cursor})
+        self.assertEqual([c.pk for c in response.context["page_obj"].object_list], self.expected(2))
+        self.assertNotIn("cursor", response.context["qs"])
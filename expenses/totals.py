@@ -0,0 +1,92 @@
+# expenses/totals.py
+"""
+계약 품목 합계(sell_sum/buy_sum/profit/margin_rate) 계산/저장
+
+품목이 바뀌는 곳(expenses.items.save_items)에서 같은 트랜잭션 안에 갱신하므로
+목록/엑셀/마진통계는 품목을 조인하지 않고 Contract 칼럼만 읽으면 된다.
+전체 재계산/검증: python manage.py rebuild_contract_totals [--verify]
+"""
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db.models import DecimalField, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Contract, ContractItem
+
+ZERO = Decimal("0")
+RATE_Q = Decimal("0.0001")
+FIELDS = ("sell_sum", "buy_sum", "profit", "margin_rate")
+
+_AMOUNT = DecimalField(max_digits=18, decimal_places=2)
+
+
+def compute(sell_sum, buy_sum):
+    """매출/매입 합계 → {sell_sum, buy_sum, profit, margin_rate}"""
+    sell_sum = Decimal(sell_sum or 0)
+    buy_sum = Decimal(buy_sum or 0)
+    profit = sell_sum - buy_sum
+    margin_rate = (
+        (profit / sell_sum * Decimal("100")).quantize(RATE_Q, rounding=ROUND_HALF_UP)
+        if sell_sum > 0 else None
+    )
+    return {"sell_sum": sell_sum, "buy_sum": buy_sum, "profit": profit, "margin_rate": margin_rate}
+
+
+def from_rows(rows):
+    """품목 dict(expenses.items.parse_item_rows) 리스트로 계산 — 쿼리 없음"""
+    return compute(
+        sum((r["sell_total"] for r in rows), ZERO),
+        sum((r["buy_total"] for r in rows), ZERO),
+    )
+
+
+def _item_sums():
+    return ContractItem.objects.filter(contract__isnull=False).order_by().values("contract_id").annotate(
+        sell=Coalesce(Sum("sell_total", output_field=_AMOUNT), Value(ZERO, output_field=_AMOUNT)),
+        buy=Coalesce(Sum("buy_total", output_field=_AMOUNT), Value(ZERO, output_field=_AMOUNT)),
+    )
+
+
+def store(contract, values):
+    """계산 결과를 인스턴스와 DB 에 반영 (save() 를 거치지 않는 UPDATE 한 번, updated_at 포함)"""
+    values = {**values, "updated_at": timezone.now()}
+    for f, v in values.items():
+        setattr(contract, f, v)
+    Contract.objects.filter(pk=contract.pk).update(**values)
+
+
+def refresh(contract):
+    """DB 의 품목으로 다시 계산해 저장 (품목을 save_items 밖에서 바꾼 경우용)"""
+    row = _item_sums().filter(contract_id=contract.pk).order_by("contract_id").first() or {}
+    store(contract, compute(row.get("sell"), row.get("buy")))
+
+
+def raw_totals():
+    """{contract_id: 품목에서 계산한 값} — 품목 없는 계약은 0"""
+    sums = {r["contract_id"]: (r["sell"], r["buy"]) for r in _item_sums()}
+    return {
+        pk: compute(*sums.get(pk, (ZERO, ZERO)))
+        for pk in Contract.objects.values_list("pk", flat=True)
+    }
+
+
+def rebuild(batch_size=500):
+    """모든 계약 합계 재계산. 갱신한 계약 수 반환"""
+    objs = []
+    for pk, values in raw_totals().items():
+        objs.append(Contract(pk=pk, **values))
+    Contract.objects.bulk_update(objs, FIELDS, batch_size=batch_size)
+    return len(objs)
+
+
+def verify():
+    """저장된 합계와 품목 계산값이 다른 계약: [(contract_id, 계산값, 저장값)]"""
+    raw = raw_totals()
+    stored = {r["pk"]: r for r in Contract.objects.values("pk", *FIELDS)}
+    diffs = []
+    for pk, values in raw.items():
+        have = {f: stored[pk][f] for f in FIELDS}
+        if have != values:
+            diffs.append((pk, values, have))
+    return diffs
@@ -0,0 +1,39 @@
+# expenses/uploadhandlers.py
+"""
+업로드 파일을 받으면서 sha256 을 함께 계산하는 업로드 핸들러
+
+settings.FILE_UPLOAD_HANDLERS 에 기본 핸들러 대신 등록 → request.FILES 의 파일에 .sha256 이 붙음
+(사진 중복 저장 방지: expenses.imagestore.attach 가 다시 읽지 않고 이 값을 사용)
+"""
+import hashlib
+
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+
+
+class _HashingMixin:
+    def new_file(self, *args, **kwargs):
+        # 메모리 핸들러는 new_file 에서 StopFutureHandlers 를 던지므로 먼저 준비
+        self._sha256 = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def _hash_chunk(self, raw_data):
+        self._sha256.update(raw_data)
+
+    def file_complete(self, file_size):
+        f = super().file_complete(file_size)
+        if f is not None:
+            f.sha256 = self._sha256.hexdigest()
+        return f
+
+
+class HashingMemoryFileUploadHandler(_HashingMixin, MemoryFileUploadHandler):
+    def receive_data_chunk(self, raw_data, start):
+        if self.activated:
+            self._hash_chunk(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+
+class HashingTemporaryFileUploadHandler(_HashingMixin, TemporaryFileUploadHandler):
+    def receive_data_chunk(self, raw_data, start):
+        self._hash_chunk(raw_data)
+        return super().receive_data_chunk(raw_data, start)
@@ -11,9 +11,13 @@ urlpatterns = [
     path("reports/<int:pk>/delete/", views.report_delete, name="report_delete"),
 
     path("contracts/add/", views.add_contract, name="add_contract"),
+    path("contracts/uploads/", views.contract_upload_targets, name="contract_upload_targets"),
+    path("contracts/uploads/<str:token>/", views.contract_upload_local, name="contract_upload_local"),
     path("contracts/list/", views.contract_list, name="contract_list"),
     path("contracts/<int:pk>/", views.contract_detail, name="contract_detail"),
     path("contracts/<int:pk>/edit/", views.contract_edit, name="contract_edit"),
     path("contracts/<int:pk>/delete/", views.contract_delete, name="contract_delete"),
     path("contracts/export/", views.contract_export, name="contract_export"),
+    path("contracts/export/<int:pk>/", views.contract_export_status, name="contract_export_status"),
+    path("contracts/export/<int:pk>/download/", views.contract_export_download, name="contract_export_download"),
 ]
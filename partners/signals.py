@@ -0,0 +1,44 @@
+# partners/signals.py
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from accounts import kpis
+from expenses import searchindex
+
+from .models import PurchasePartner, PurchasePartnerContact, SalesPartner, SalesPartnerContact
+
+
+# ---------- 거래처명/담당자명 부분일치 검색 색인 동기화 ----------
+@receiver(post_save, sender=SalesPartner)
+def reindex_sales_partner(sender, instance, created=False, **kwargs):
+    searchindex.reindex("sales.name", instance.pk)
+    if created:
+        kpis.invalidate()  # 대시보드 매출처 수
+
+
+@receiver(post_save, sender=PurchasePartner)
+def reindex_purchase_partner(sender, instance, **kwargs):
+    searchindex.reindex("purchase.name", instance.pk)
+
+
+@receiver(post_delete, sender=SalesPartner)
+def drop_sales_partner(sender, instance, **kwargs):
+    searchindex.drop(["sales.name", "sales.contact"], instance.pk)
+    kpis.invalidate()
+
+
+@receiver(post_delete, sender=PurchasePartner)
+def drop_purchase_partner(sender, instance, **kwargs):
+    searchindex.drop(["purchase.name", "purchase.contact"], instance.pk)
+
+
+@receiver(post_save, sender=SalesPartnerContact)
+@receiver(post_delete, sender=SalesPartnerContact)
+def reindex_sales_contacts(sender, instance, **kwargs):
+    searchindex.reindex("sales.contact", instance.partner_id)
+
+
+@receiver(post_save, sender=PurchasePartnerContact)
+@receiver(post_delete, sender=PurchasePartnerContact)
+def reindex_purchase_contacts(sender, instance, **kwargs):
+    searchindex.reindex("purchase.contact", instance.partner_id)
@@ -19,6 +19,8 @@ from django.contrib.auth.decorators import login_required
 from django.urls import reverse
 from django.utils.http import url_has_allowed_host_and_scheme
 
+from expenses import searchindex
+
 @login_required
 def api_partner_detail(request, pk):
     p = SalesPartner.objects.filter(pk=pk).prefetch_related("contacts").first()
@@ -68,9 +70,9 @@ def sales_partner_list(request):
     q_name = (request.GET.get("q_name") or "").strip()
     q_contact = (request.GET.get("q_contact") or "").strip()  # 폼에 있으니 함께 유지
     if q_name:
-        qs = qs.filter(name__icontains=q_name)
+        qs = qs.filter(searchindex.contains("sales.name", q_name, "name"))
     if q_contact:
-        qs = qs.filter(contacts__name__icontains=q_contact).distinct()
+        qs = qs.filter(searchindex.narrow("sales.contact", q_contact), contacts__name__icontains=q_contact).distinct()
 
     per_page_options = [10, 20, 30, 50, 100]
     try:
@@ -211,9 +213,9 @@ def purchase_partner_list(request):
     q_name = (request.GET.get("q_name") or "").strip()
     q_contact = (request.GET.get("q_contact") or "").strip()
     if q_name:
-        qs = qs.filter(name__icontains=q_name)
+        qs = qs.filter(searchindex.contains("purchase.name", q_name, "name"))
     if q_contact:
-        qs = qs.filter(contacts__name__icontains=q_contact).distinct()
+        qs = qs.filter(searchindex.narrow("purchase.contact", q_contact), contacts__name__icontains=q_contact).distinct()
 
     per_page_options = [10, 20, 30, 50, 100]
     try:
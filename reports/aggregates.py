@@ -0,0 +1,158 @@
+# reports/aggregates.py
+"""
+월별 매출/매입 계약통계 / 매입처 월별 계산서 공통 집계
+
+ContractItem 을 파이썬에서 한 줄씩 돌지 않고,
+계약 등록일(contract.created_at) 기준 일자별 GROUP BY 한 번으로 합계를 구한다.
+매입처 월별 계산서는 (매입처, 품목명) GROUP BY 한 번 → 소계/합계는 그 결과 행으로 접어 올린다.
+"""
+import datetime
+from decimal import Decimal
+
+from django.db.models import DecimalField, Min, Q, Sum, Value
+from django.db.models.functions import Coalesce, NullIf, Trim, TruncDate
+
+TEN  = Decimal("0.10")
+ZERO = Decimal("0")
+
+_AMOUNT = DecimalField(max_digits=18, decimal_places=2)
+
+
+def _sum(field, **extra):
+    return Coalesce(Sum(field, output_field=_AMOUNT, **extra), Value(ZERO, output_field=_AMOUNT))
+
+
+def daily_amount_rows(items, amount_field):
+    """
+    일자별 (day, supply, separate) 행 반환 (한 달이면 최대 31행)
+    - supply   : amount_field 합계 (세전 금액)
+    - separate : 그 중 VAT별도(separate) 품목 금액 합계 → 부가세 = separate * 10%
+    - 일자는 기존 뷰의 created_at.date() 와 같도록 UTC 기준으로 자른다
+    """
+    return (
+        items.order_by()
+        .annotate(day=TruncDate("contract__created_at", tzinfo=datetime.timezone.utc))
+        .values("day")
+        .annotate(
+            supply=_sum(amount_field),
+            separate=_sum(amount_field, filter=Q(vat_mode__iexact="separate")),
+        )
+        .order_by("day")
+    )
+
+
+def summarize_daily(rows):
+    """
+    일자별 행 → 템플릿 컨텍스트(daily_json 용 dict + 월 합계)
+    - daily_amount_rows() 행: 부가세 = (VAT별도 공급가액 합계 * 10%)
+      품목별로 10%를 곱해 더하던 기존 방식과 값이 정확히 같다.
+    - reports.rollup.daily_rows() 행: 집계 테이블에 저장된 vat 그대로 사용
+    """
+    daily = {}
+    month_total = month_supply = month_vat = ZERO
+
+    for r in rows:
+        supply = Decimal(r["supply"] or 0)
+        vat    = Decimal(r["vat"] or 0) if "vat" in r else Decimal(r["separate"] or 0) * TEN
+        total  = supply + vat
+
+        daily[r["day"].isoformat()] = {
+            "total":  int(total),
+            "supply": int(supply),
+            "vat":    int(vat),
+        }
+        month_supply += supply
+        month_vat    += vat
+        month_total  += total
+
+    return {
+        "daily": dict(sorted(daily.items())),
+        "month_total":  int(month_total),
+        "month_supply": int(month_supply),
+        "month_vat":    int(month_vat),
+    }
+
+
+def daily_amounts(items, amount_field):
+    """ContractItem 쿼리셋 → 일자별/월 합계 (쿼리 1회)"""
+    return summarize_daily(daily_amount_rows(items, amount_field))
+
+
+# ---------------- 매입처 월별 계산서 ----------------
+NO_VENDOR = "(미지정)"
+VAT_RATE  = Decimal("1.1")
+
+
+def vendor_key(field="vendor"):
+    """매입처명 정규화 식: 앞뒤 공백 제거, 비어 있으면 '(미지정)'"""
+    return Coalesce(NullIf(Trim(field), Value("")), Value(NO_VENDOR))
+
+
+def purchase_invoice_rows(items):
+    """
+    (매입처, 품목명)별 행 반환 — 같은 매입처/품목의 여러 줄은 한 행으로 합침
+    - vendor   : 앞뒤 공백 제거, 비어 있으면 '(미지정)'
+    - total    : 매입합계(buy_total) 합
+    - separate : 그 중 VAT별도(separate) 품목의 합 → 공급가액 = separate/1.1 + (total - separate)
+    - first_id : 품목 순서(처음 나온 품목 id) 유지용
+    """
+    return (
+        items.order_by()
+        .annotate(vendor_key=vendor_key())
+        .values("vendor_key", "name")
+        .annotate(
+            qty=Coalesce(Sum("qty"), Value(0)),
+            total=_sum("buy_total"),
+            separate=_sum("buy_total", filter=Q(vat_mode__iexact="separate")),
+            first_id=Min("id"),
+        )
+        .order_by("first_id")
+    )
+
+
+def summarize_purchase_invoice(rows):
+    """
+    purchase_invoice_rows() 행 → 매입처별 그룹(rows + subtotal) + 전체 합계 (ROLLUP 을 파이썬에서 접음)
+    - VAT별도: 공급가액 = 합계/1.1, 부가세 = 차액 / 그 외: 공급가액 = 합계, 부가세 = 0
+    """
+    groups = {}
+    sum_total = sum_supply = sum_vat = ZERO
+
+    for r in rows:
+        total    = Decimal(r["total"] or 0)
+        separate = Decimal(r["separate"] or 0)
+        sep_supply = separate / VAT_RATE
+        supply = sep_supply + (total - separate)
+        vat    = separate - sep_supply
+
+        g = groups.setdefault(r["vendor_key"], {
+            "rows": [],
+            "subtotal": {"qty": 0, "total": ZERO, "supply": ZERO, "vat": ZERO},
+        })
+        g["rows"].append({
+            "name":   r["name"] or "",
+            "qty":    r["qty"],
+            "total":  total,
+            "supply": supply,
+            "vat":    vat,
+        })
+        g["subtotal"]["qty"]    += r["qty"]
+        g["subtotal"]["total"]  += total
+        g["subtotal"]["supply"] += supply
+        g["subtotal"]["vat"]    += vat
+
+        sum_total  += total
+        sum_supply += supply
+        sum_vat    += vat
+
+    # 출력용 리스트 (매입처명 정렬 + 번호)
+    groups_out = [
+        {"no": i, "vendor": vendor, **groups[vendor]}
+        for i, vendor in enumerate(sorted(groups), start=1)
+    ]
+    return {
+        "groups": groups_out,
+        "sum_total":  int(sum_total),
+        "sum_supply": int(sum_supply),
+        "sum_vat":    int(sum_vat),
+    }
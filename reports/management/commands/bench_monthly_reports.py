@@ -0,0 +1,143 @@
+# reports/management/commands/bench_monthly_reports.py
+"""
+월별 매출/매입 계약통계 집계 벤치마크
+
+기존 방식(ContractItem 전체를 파이썬 루프로 합산)과
+reports.aggregates.daily_amounts(GROUP BY 1회)를 같은 데이터로 비교한다.
+시딩한 데이터는 트랜잭션 롤백으로 모두 지워진다.
+
+    python manage.py bench_monthly_reports --items 100000
+"""
+import datetime
+import random
+import time
+from collections import defaultdict
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from expenses.models import Contract, ContractItem
+from reports.aggregates import TEN, ZERO, daily_amounts
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _legacy_loop(qs, amount_field):
+    """reports.views 에 있던 기존 루프 그대로"""
+    daily = defaultdict(lambda: {"total": ZERO, "supply": ZERO, "vat": ZERO})
+    month_total = month_supply = month_vat = ZERO
+
+    for it in qs.select_related("contract"):
+        key = it.contract.created_at.date().isoformat()
+        supply = (getattr(it, amount_field) or ZERO)
+        if (it.vat_mode or "").lower() == "separate":
+            vat = supply * TEN
+            total = supply + vat
+        else:
+            vat = ZERO
+            total = supply
+
+        daily[key]["supply"] += supply
+        daily[key]["vat"]    += vat
+        daily[key]["total"]  += total
+
+        month_supply += supply
+        month_vat    += vat
+        month_total  += total
+
+    return {
+        "daily": dict(sorted(
+            (k, {"total": int(v["total"]), "supply": int(v["supply"]), "vat": int(v["vat"])})
+            for k, v in daily.items()
+        )),
+        "month_total":  int(month_total),
+        "month_supply": int(month_supply),
+        "month_vat":    int(month_vat),
+    }
+
+
+class Command(BaseCommand):
+    help = "월별 계약통계: 파이썬 루프 vs DB GROUP BY 집계 속도 비교 (시딩 데이터는 롤백)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--items", type=int, default=100_000, help="시딩할 품목 수 (기본 100000)")
+        parser.add_argument("--per-contract", type=int, default=5, help="계약당 품목 수 (기본 5)")
+        parser.add_argument("--year", type=int, default=2001, help="시딩 연도 (기존 데이터와 겹치지 않게)")
+        parser.add_argument("--month", type=int, default=1)
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **opts):
+        try:
+            with transaction.atomic():
+                self._run(**opts)
+                raise _Rollback
+        except _Rollback:
+            self.stdout.write("시딩 데이터 롤백 완료")
+
+    def _run(self, items, per_contract, year, month, repeat, **_):
+        rnd = random.Random(42)
+        user = get_user_model().objects.create(username=f"bench-{time.time_ns()}")
+
+        n_contracts = max(1, items // per_contract)
+        Contract.objects.bulk_create(
+            [Contract(writer=user, customer_company=f"매출처{i % 300}") for i in range(n_contracts)],
+            batch_size=1000,
+        )
+        contracts = list(Contract.objects.filter(writer=user).values_list("id", flat=True))
+
+        # 계약 등록일을 한 달 전체에 고르게 분산
+        days = (datetime.date(year + month // 12, month % 12 + 1, 1) - datetime.date(year, month, 1)).days
+        by_day = defaultdict(list)
+        for cid in contracts:
+            by_day[rnd.randrange(days)].append(cid)
+        for d, ids in by_day.items():
+            ts = datetime.datetime(year, month, d + 1, rnd.randrange(24), tzinfo=datetime.timezone.utc)
+            Contract.objects.filter(id__in=ids).update(created_at=ts)
+
+        vat_modes = ["separate", "separate", "included", "exempt"]
+        batch = []
+        for i in range(items):
+            batch.append(ContractItem(
+                contract_id=contracts[i % len(contracts)],
+                name=f"품목{i % 500}",
+                qty=rnd.randint(1, 50),
+                sell_total=Decimal(rnd.randint(100, 5_000_000)) / 100,
+                buy_total=Decimal(rnd.randint(100, 4_000_000)) / 100,
+                vendor=f"매입처{i % 120}",
+                vat_mode=vat_modes[i % len(vat_modes)],
+            ))
+            if len(batch) >= 5000:
+                ContractItem.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            ContractItem.objects.bulk_create(batch)
+
+        qs = ContractItem.objects.filter(
+            contract__created_at__year=year,
+            contract__created_at__month=month,
+        )
+        self.stdout.write(f"시딩: 계약 {len(contracts)}건 / 품목 {items}건 ({year}-{month:02d})")
+
+        for field in ("sell_total", "buy_total"):
+            legacy, legacy_t = self._time(lambda: _legacy_loop(qs, field), repeat)
+            fast, fast_t = self._time(lambda: daily_amounts(qs, field), repeat)
+            if legacy != fast:
+                raise CommandError(f"{field}: 집계 결과가 기존 루프와 다릅니다.")
+            self.stdout.write(
+                f"{field:<10} loop {legacy_t * 1000:8.1f} ms | group by {fast_t * 1000:8.1f} ms "
+                f"| x{legacy_t / fast_t if fast_t else 0:.1f} | {len(fast['daily'])}일 결과 동일"
+            )
+
+    @staticmethod
+    def _time(fn, repeat):
+        best, result = None, None
+        for _ in range(max(1, repeat)):
+            t0 = time.perf_counter()
+            result = fn()
+            dt = time.perf_counter() - t0
+            best = dt if best is None else min(best, dt)
+        return result, best
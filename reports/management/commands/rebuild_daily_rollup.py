@@ -0,0 +1,29 @@
+# reports/management/commands/rebuild_daily_rollup.py
+"""
+일자별 매출/매입 집계(DailyRollup) 재생성 + 원본 대조
+
+    python manage.py rebuild_daily_rollup            # 전체 재생성 후 검증
+    python manage.py rebuild_daily_rollup --verify   # 재생성 없이 검증만
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from reports import rollup
+
+
+class Command(BaseCommand):
+    help = "DailyRollup 을 ContractItem 원본에서 다시 만들고, 원본과 일치하는지 검증"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--verify", action="store_true", help="재생성하지 않고 검증만 수행")
+
+    def handle(self, *args, **opts):
+        if not opts["verify"]:
+            n = rollup.rebuild()
+            self.stdout.write(f"집계 행 {n}개 재생성")
+
+        diffs = rollup.verify()
+        for key, raw, stored in diffs[:50]:
+            self.stderr.write(f"불일치 {key}: 원본={raw} 집계={stored}")
+        if diffs:
+            raise CommandError(f"집계 불일치 {len(diffs)}건")
+        self.stdout.write(self.style.SUCCESS("집계 테이블이 원본과 일치합니다."))
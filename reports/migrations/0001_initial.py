@@ -0,0 +1,36 @@
+# Generated by Django 5.2.5 on 2026-10-17 05:56
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('vat_mode', models.CharField(max_length=10)),
+                ('item_count', models.IntegerField(default=0)),
+                ('sell_supply', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('sell_vat', models.DecimalField(decimal_places=3, default=0, max_digits=18)),
+                ('sell_total', models.DecimalField(decimal_places=3, default=0, max_digits=18)),
+                ('buy_supply', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('buy_vat', models.DecimalField(decimal_places=3, default=0, max_digits=18)),
+                ('buy_total', models.DecimalField(decimal_places=3, default=0, max_digits=18)),
+                ('writer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'writer', 'vat_mode'), name='uniq_rollup_day_writer_vat')],
+            },
+        ),
+    ]
@@ -0,0 +1,49 @@
+import datetime
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import Count, DecimalField, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+
+TEN = Decimal("0.10")
+
+
+def backfill(apps, schema_editor):
+    ContractItem = apps.get_model("expenses", "ContractItem")
+    DailyRollup = apps.get_model("reports", "DailyRollup")
+    amount = DecimalField(max_digits=18, decimal_places=2)
+
+    rows = (
+        ContractItem.objects.filter(contract__isnull=False)
+        .order_by()
+        .annotate(day=TruncDate("contract__created_at", tzinfo=datetime.timezone.utc))
+        .values("day", "contract__writer_id", "vat_mode")
+        .annotate(
+            n=Count("id"),
+            sell=Coalesce(Sum("sell_total", output_field=amount), Value(Decimal("0"), output_field=amount)),
+            buy=Coalesce(Sum("buy_total", output_field=amount), Value(Decimal("0"), output_field=amount)),
+        )
+    )
+    objs = []
+    for r in rows:
+        rate = TEN if (r["vat_mode"] or "").lower() == "separate" else Decimal("0")
+        sell, buy = Decimal(r["sell"]), Decimal(r["buy"])
+        objs.append(DailyRollup(
+            day=r["day"], writer_id=r["contract__writer_id"], vat_mode=r["vat_mode"],
+            item_count=r["n"],
+            sell_supply=sell, sell_vat=sell * rate, sell_total=sell + sell * rate,
+            buy_supply=buy, buy_vat=buy * rate, buy_total=buy + buy * rate,
+        ))
+    DailyRollup.objects.bulk_create(objs, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reports", "0001_initial"),
+        ("expenses", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,29 @@
+from django.conf import settings
 from django.db import models
 
-# Create your models here.
+
+class DailyRollup(models.Model):
+    """
+    일자(계약 등록일) × 작성자 × VAT구분 별 매출/매입 합계 (보고서용 집계 테이블)
+    - expenses 쪽에서 품목이 바뀔 때마다 reports.rollup 이 증분 반영
+    - 전체 재계산/검증: python manage.py rebuild_daily_rollup [--verify]
+    """
+    day      = models.DateField()
+    writer   = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+")
+    vat_mode = models.CharField(max_length=10)
+
+    item_count  = models.IntegerField(default=0)
+    sell_supply = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    sell_vat    = models.DecimalField(max_digits=18, decimal_places=3, default=0)
+    sell_total  = models.DecimalField(max_digits=18, decimal_places=3, default=0)
+    buy_supply  = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    buy_vat     = models.DecimalField(max_digits=18, decimal_places=3, default=0)
+    buy_total   = models.DecimalField(max_digits=18, decimal_places=3, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["day", "writer", "vat_mode"], name="uniq_rollup_day_writer_vat"),
+        ]
+
+    def __str__(self):
+        return f"{self.day} / {self.writer_id} / {self.vat_mode}"
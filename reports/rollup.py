@@ -0,0 +1,174 @@
+# reports/rollup.py
+"""
+DailyRollup 증분 유지
+
+계약 하나의 품목이 바뀌면, 바뀌기 전/후의 (VAT구분별) 합계 차이만큼
+해당 (일자, 작성자, VAT구분) 행에 더하고 뺀다. 행 단위 UPDATE ... SET x = x + d 이므로
+같은 날 여러 계약이 동시에 저장돼도 서로 덮어쓰지 않는다.
+
+    with tracking(contract):
+        ...품목 삭제/재작성...
+"""
+import datetime
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, F, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+
+from expenses.models import ContractItem
+
+from . import trendcube
+from .models import DailyRollup
+
+TEN  = Decimal("0.10")
+ZERO = Decimal("0")
+
+_AMOUNT = DecimalField(max_digits=18, decimal_places=2)
+_MEASURES = ("item_count", "sell_supply", "sell_vat", "sell_total", "buy_supply", "buy_vat", "buy_total")
+
+
+def _sum(field):
+    return Coalesce(Sum(field, output_field=_AMOUNT), Value(ZERO, output_field=_AMOUNT))
+
+
+def rollup_day(created_at):
+    """보고서와 같은 기준(UTC 날짜)으로 계약 등록일 → 집계 일자"""
+    return created_at.astimezone(datetime.timezone.utc).date()
+
+
+def _measures(vat_mode, count, sell, buy):
+    """VAT구분별 공급가액 합계 → 집계 행 값 (VAT별도만 10% 부가세)"""
+    rate = TEN if (vat_mode or "").lower() == "separate" else ZERO
+    sell, buy = Decimal(sell or 0), Decimal(buy or 0)
+    return {
+        "item_count":  count,
+        "sell_supply": sell,
+        "sell_vat":    sell * rate,
+        "sell_total":  sell + sell * rate,
+        "buy_supply":  buy,
+        "buy_vat":     buy * rate,
+        "buy_total":   buy + buy * rate,
+    }
+
+
+def contribution(contract_id):
+    """계약 하나가 집계에 기여하는 값: {vat_mode: measures} (쿼리 1회)"""
+    if not contract_id:
+        return {}
+    rows = (
+        ContractItem.objects.filter(contract_id=contract_id)
+        .order_by()
+        .values("vat_mode")
+        .annotate(n=Count("id"), sell=_sum("sell_total"), buy=_sum("buy_total"))
+    )
+    return {r["vat_mode"]: _measures(r["vat_mode"], r["n"], r["sell"], r["buy"]) for r in rows}
+
+
+def _add(day, writer_id, vat_mode, delta):
+    key = {"day": day, "writer_id": writer_id, "vat_mode": vat_mode}
+    incr = {k: F(k) + v for k, v in delta.items()}
+    if DailyRollup.objects.filter(**key).update(**incr):
+        return
+    try:
+        with transaction.atomic():
+            DailyRollup.objects.create(**key, **delta)
+    except IntegrityError:
+        # 다른 요청이 같은 행을 먼저 만들었으면 증분으로 다시 반영
+        DailyRollup.objects.filter(**key).update(**incr)
+
+
+def apply_delta(contract, before, after):
+    """contribution() 전/후 값의 차이를 집계 테이블에 반영"""
+    if not contract.writer_id or not contract.created_at:
+        return
+    day = rollup_day(contract.created_at)
+    # 추이 큐브: 합계가 그대로여도(매입처명만 변경 등) 그 월은 다시 읽도록
+    month = trendcube.month_of(contract.created_at)
+    transaction.on_commit(lambda: trendcube.mark_dirty(month))
+    touched = False
+    for vat_mode in set(before) | set(after):
+        old = before.get(vat_mode) or {}
+        new = after.get(vat_mode) or {}
+        delta = {k: (new.get(k) or 0) - (old.get(k) or 0) for k in _MEASURES}
+        if any(delta.values()):
+            _add(day, contract.writer_id, vat_mode, delta)
+            touched = True
+    if touched:
+        DailyRollup.objects.filter(day=day, writer_id=contract.writer_id, item_count__lte=0).delete()
+
+
+@contextmanager
+def tracking(contract):
+    """블록 안에서 바뀐 계약 품목을 블록이 끝날 때 집계에 반영"""
+    before = contribution(contract.pk)
+    yield
+    apply_delta(contract, before, contribution(contract.pk))
+
+
+def raw_rollup_rows():
+    """원본(ContractItem) 기준 전체 집계: {(day, writer_id, vat_mode): measures}"""
+    rows = (
+        ContractItem.objects.filter(contract__isnull=False)
+        .order_by()
+        .annotate(day=TruncDate("contract__created_at", tzinfo=datetime.timezone.utc))
+        .values("day", "contract__writer_id", "vat_mode")
+        .annotate(n=Count("id"), sell=_sum("sell_total"), buy=_sum("buy_total"))
+    )
+    return {
+        (r["day"], r["contract__writer_id"], r["vat_mode"]): _measures(r["vat_mode"], r["n"], r["sell"], r["buy"])
+        for r in rows
+    }
+
+
+@transaction.atomic
+def rebuild():
+    """집계 테이블 전체 재생성. 생성한 행 수 반환"""
+    raw = raw_rollup_rows()
+    DailyRollup.objects.all().delete()
+    DailyRollup.objects.bulk_create(
+        [DailyRollup(day=d, writer_id=w, vat_mode=v, **m) for (d, w, v), m in raw.items()],
+        batch_size=1000,
+    )
+    return len(raw)
+
+
+def verify():
+    """집계 테이블과 원본 비교 → 불일치 목록 [(key, 원본, 집계)]"""
+    raw = raw_rollup_rows()
+    stored = {
+        (r.day, r.writer_id, r.vat_mode): {k: getattr(r, k) for k in _MEASURES}
+        for r in DailyRollup.objects.all()
+    }
+    diffs = []
+    for key in sorted(set(raw) | set(stored), key=str):
+        a, b = raw.get(key), stored.get(key)
+        if a is None or b is None or any(Decimal(a[k]) != Decimal(b[k]) for k in _MEASURES):
+            diffs.append((key, a, b))
+    return diffs
+
+
+def daily_rows(year, month, writer_id=None, side="sell"):
+    """보고서용 일자별 (day, supply, vat, total) — 집계 테이블에서 최대 31행"""
+    qs = DailyRollup.objects.filter(day__year=year, day__month=month)
+    if writer_id:
+        qs = qs.filter(writer_id=writer_id)
+    return (
+        qs.order_by("day")
+        .values("day")
+        .annotate(
+            supply=Sum(f"{side}_supply"),
+            vat=Sum(f"{side}_vat"),
+            total=Sum(f"{side}_total"),
+        )
+    )
+
+
+def period_totals(date_from, date_to_excl):
+    """기간 합계 (매출/매입 공급가액) — 대시보드 KPI용"""
+    agg = DailyRollup.objects.filter(day__gte=date_from, day__lt=date_to_excl).aggregate(
+        sales_total=Sum("sell_supply"),
+        buy_total=Sum("buy_supply"),
+    )
+    return Decimal(agg["sales_total"] or 0), Decimal(agg["buy_total"] or 0)
@@ -0,0 +1,14 @@
+# reports/signals.py
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+
+from expenses.models import Contract
+
+from . import rollup
+
+
+# ---------- 계약 삭제 시 일자별 집계에서 해당 계약 몫 차감 ----------
+@receiver(pre_delete, sender=Contract)
+def rollup_on_contract_delete(sender, instance: Contract, **kwargs):
+    # pre_delete 시점엔 품목이 아직 남아 있으므로 여기서 기여분을 계산해 빼준다
+    rollup.apply_delta(instance, rollup.contribution(instance.pk), {})
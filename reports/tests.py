@@ -1,3 +1,73 @@
+import datetime
+from decimal import Decimal
+
+from django.contrib.auth.models import User
 from django.test import TestCase
 
-# Create your tests here.
+from expenses.items import save_items
+from expenses.models import Contract
+
+from . import rollup
+from .models import DailyRollup
+
+
+def item_row(sell, buy, vat_mode="separate", name="품목"):
+    return {
+        "name": name, "qty": 1, "spec": "", "vendor": "매입처", "vat_mode": vat_mode,
+        "sell_unit": Decimal(sell), "sell_total": Decimal(sell),
+        "buy_unit": Decimal(buy), "buy_total": Decimal(buy),
+    }
+
+
+class DailyRollupDeltaTests(TestCase):
+    """저장/수정/삭제를 증분(apply_delta)으로 반영한 집계가 rebuild() 결과와 같은지"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.kim = User.objects.create_user("kim", password="pw")
+        cls.lee = User.objects.create_user("lee", password="pw")
+
+    def make_contract(self, writer, day, rows):
+        contract = Contract.objects.create(writer=writer, customer_company="매출처")
+        Contract.objects.filter(pk=contract.pk).update(
+            created_at=datetime.datetime(2026, 3, day, 23, 30, tzinfo=datetime.timezone.utc)
+        )
+        contract.refresh_from_db()
+        save_items(contract, rows)
+        return contract
+
+    def snapshot(self):
+        return {
+            (r.day, r.writer_id, r.vat_mode): tuple(getattr(r, k) for k in rollup._MEASURES)
+            for r in DailyRollup.objects.all()
+        }
+
+    def assert_matches_rebuild(self):
+        self.assertEqual(rollup.verify(), [])
+        incremental = self.snapshot()
+        rollup.rebuild()
+        self.assertEqual(incremental, self.snapshot())
+
+    def test_save_edit_delete(self):
+        a = self.make_contract(self.kim, 1, [item_row(1000, 600), item_row(500, 100, "included")])
+        b = self.make_contract(self.kim, 1, [item_row(2000, 1500)])
+        c = self.make_contract(self.lee, 2, [item_row(300, 100, "exempt"), item_row(700, 200)])
+        self.assert_matches_rebuild()
+        self.assertEqual(DailyRollup.objects.get(day="2026-03-01", writer=self.kim, vat_mode="separate").item_count, 2)
+
+        # 금액 수정 + 품목 추가, VAT구분 변경, 품목 삭제
+        save_items(a, [item_row(1200, 600), item_row(500, 100, "included"), item_row(90, 10, "exempt")])
+        save_items(b, [item_row(2000, 1500, "included")])
+        save_items(c, [item_row(700, 200)])
+        self.assert_matches_rebuild()
+        self.assertFalse(DailyRollup.objects.filter(day="2026-03-02", vat_mode="exempt").exists())
+
+        # 품목 전부 삭제, 계약 삭제
+        save_items(b, [])
+        a.delete()
+        self.assert_matches_rebuild()
+        self.assertEqual(set(self.snapshot()), {(datetime.date(2026, 3, 2), self.lee.pk, "separate")})
+
+        c.delete()
+        self.assert_matches_rebuild()
+        self.assertFalse(DailyRollup.objects.exists())
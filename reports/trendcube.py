@@ -0,0 +1,301 @@
+# reports/trendcube.py
+"""
+다년도 추이 보고서용 메모리 큐브 (월 × 작성자 × 매입처 × 측정값, NumPy 배열)
+
+- 처음 조회할 때 ContractItem 을 (월, 작성자, 매입처) GROUP BY 한 번으로 읽어 배열에 채워 두고,
+  이후 요청은 배열 슬라이스/합계만 하므로 3년 범위도 DB 를 다시 읽지 않는다.
+- 품목이 바뀌면 reports.rollup.apply_delta 가 그 계약의 월을 mark_dirty() 로 표시 →
+  다음 조회 때 표시된 월만 다시 읽어 해당 월 슬라이스만 교체 (증분 갱신)
+- 표시는 캐시의 월별 카운터(incr)로 남기므로 캐시를 공유하는 프로세스(CACHE_LOCATION)끼리 전파된다.
+  locmem 처럼 프로세스별 캐시면 TREND_CUBE_MAX_STALENESS 초마다 전체를 다시 읽는다.
+- 월은 일자별 집계(reports.rollup)와 같은 UTC 기준
+
+NumPy 는 선택 의존성: 없으면 load() 에서 CubeUnavailable
+"""
+import datetime
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.db.models.functions import TruncMonth
+
+from expenses.models import ContractItem
+
+from .aggregates import TEN, _sum, vendor_key
+
+MEASURES = ("sell", "buy", "sell_vat", "buy_vat")
+GEN_KEY = "reports:trend:gen"
+GROUPS = {"month": 1, "quarter": 3, "year": 12}
+
+_lock = threading.Lock()
+_cube = None
+
+
+class CubeUnavailable(Exception):
+    pass
+
+
+def _np():
+    try:
+        import numpy
+    except ImportError as e:
+        raise CubeUnavailable("추이 보고서에는 numpy 가 필요합니다 (pip install numpy)") from e
+    return numpy
+
+
+# ---------------- 월 키 ----------------
+def month_of(created_at):
+    """계약 등록일 → 'YYYY-MM' (UTC 기준)"""
+    return created_at.astimezone(datetime.timezone.utc).strftime("%Y-%m")
+
+
+def _ordinal(month):
+    """'YYYY-MM' → 연속 정수 (월 인덱스 계산용)"""
+    y, m = month.split("-")
+    return int(y) * 12 + int(m) - 1
+
+
+def _label(ordinal):
+    return f"{ordinal // 12:04d}-{ordinal % 12 + 1:02d}"
+
+
+def _month_key(month):
+    return f"reports:trend:month:{month}"
+
+
+def mark_dirty(month):
+    """해당 월 품목이 바뀌었음을 표시 (커밋 후 호출)"""
+    for key in (_month_key(month), GEN_KEY):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, 0, None)
+            cache.incr(key)
+
+
+# ---------------- 원본 읽기 ----------------
+def _rows(month=None):
+    """(월, 작성자, 매입처)별 매출/매입 공급가액 + VAT별도분 합계"""
+    qs = ContractItem.objects.filter(contract__isnull=False, contract__writer__isnull=False)
+    if month is not None:
+        o = _ordinal(month)
+        start = datetime.datetime(o // 12, o % 12 + 1, 1, tzinfo=datetime.timezone.utc)
+        end = datetime.datetime((o + 1) // 12, (o + 1) % 12 + 1, 1, tzinfo=datetime.timezone.utc)
+        qs = qs.filter(contract__created_at__gte=start, contract__created_at__lt=end)
+    separate = Q(vat_mode__iexact="separate")
+    return (
+        qs.order_by()
+        .annotate(
+            month=TruncMonth("contract__created_at", tzinfo=datetime.timezone.utc),
+            vendor_key=vendor_key(),
+        )
+        .values("month", "contract__writer_id", "vendor_key")
+        .annotate(
+            sell=_sum("sell_total"),
+            buy=_sum("buy_total"),
+            sell_sep=_sum("sell_total", filter=separate),
+            buy_sep=_sum("buy_total", filter=separate),
+        )
+    )
+
+
+class TrendCube:
+    """
+    data[월, 작성자, 매입처, 측정값] — 월 축은 first_month 부터 빈틈없이 연속
+    writers/vendors 는 축 순서대로의 작성자 id / 매입처명
+    """
+
+    def __init__(self):
+        np = _np()
+        self.first = None            # 첫 달 ordinal
+        self.writers, self.vendors = [], []
+        self.writer_index, self.vendor_index = {}, {}
+        self.data = np.zeros((0, 0, 0, len(MEASURES)))
+        self.seen_gen = None
+        self.seen_months = {}
+        self.loaded_at = 0.0
+
+    # ---- 축 확장 ----
+    def _grow(self, months=(), writers=(), vendors=()):
+        np = _np()
+        for w in writers:
+            if w not in self.writer_index:
+                self.writer_index[w] = len(self.writers)
+                self.writers.append(w)
+        for v in vendors:
+            if v not in self.vendor_index:
+                self.vendor_index[v] = len(self.vendors)
+                self.vendors.append(v)
+
+        ords = [_ordinal(m) for m in months]
+        if self.first is not None:
+            ords += [self.first, self.first + self.data.shape[0] - 1]
+        first = min(ords) if ords else None
+        n = (max(ords) - first + 1) if ords else 0
+        head = (self.first - first) if self.first is not None else 0
+        shape = (n, len(self.writers), len(self.vendors), len(MEASURES))
+        if shape != self.data.shape:
+            data = np.zeros(shape)
+            m, w, v, _k = self.data.shape
+            data[head:head + m, :w, :v] = self.data
+            self.data = data
+        self.first = first
+
+    def _fill(self, rows, month=None):
+        np = _np()
+        rows = list(rows)
+        months = {r["month"].strftime("%Y-%m") for r in rows}
+        if month is not None:
+            months.add(month)
+        self._grow(months, [r["contract__writer_id"] for r in rows], [r["vendor_key"] for r in rows])
+        if month is not None:
+            self.data[_ordinal(month) - self.first] = 0
+        if not rows:
+            return
+
+        mi = np.array([_ordinal(r["month"].strftime("%Y-%m")) - self.first for r in rows])
+        wi = np.array([self.writer_index[r["contract__writer_id"]] for r in rows])
+        vi = np.array([self.vendor_index[r["vendor_key"]] for r in rows])
+        ten = float(TEN)
+        vals = np.array([
+            (float(r["sell"]), float(r["buy"]), float(r["sell_sep"]) * ten, float(r["buy_sep"]) * ten)
+            for r in rows
+        ])
+        np.add.at(self.data, (mi, wi, vi), vals)
+
+    # ---- 적재/갱신 ----
+    def load(self):
+        self.seen_gen = cache.get(GEN_KEY)
+        self._fill(_rows())
+        self.seen_months = self._month_gens(self.months())
+        if cache.get(GEN_KEY) != self.seen_gen:
+            # 읽는 동안 표시된 월이 있음 → 어느 월인지 모르므로 표시가 남은 월은 다음 조회 때 다시 읽음
+            self.seen_months = {}
+        self.loaded_at = time.monotonic()
+        return self
+
+    def _month_gens(self, months):
+        got = cache.get_many([_month_key(m) for m in months])
+        return {m: got.get(_month_key(m)) for m in months}
+
+    def refresh(self):
+        """mark_dirty() 된 월만 다시 읽음. 반환: 다시 읽은 월 목록"""
+        gen = cache.get(GEN_KEY)
+        if gen == self.seen_gen:
+            return []
+        months = set(self.months()) | {month_of(datetime.datetime.now(datetime.timezone.utc))}
+        gens = self._month_gens(months)
+        dirty = sorted(m for m in months if gens[m] != self.seen_months.get(m))
+        for m in dirty:
+            self._fill(_rows(m), month=m)
+        self.seen_months.update(gens)
+        self.seen_gen = gen
+        return dirty
+
+    # ---- 조회 ----
+    def months(self):
+        return [_label(self.first + i) for i in range(self.data.shape[0])] if self.first is not None else []
+
+    def window(self, end_month, n):
+        """end_month 까지 n 개월 (큐브 범위 밖은 0) → (n, W, V, K) 배열"""
+        np = _np()
+        start = _ordinal(end_month) - n + 1
+        out = np.zeros((n,) + self.data.shape[1:])
+        if self.first is None:
+            return out
+        lo = max(start, self.first)
+        hi = min(start + n, self.first + self.data.shape[0])
+        if lo < hi:
+            out[lo - start:hi - start] = self.data[lo - self.first:hi - self.first]
+        return out
+
+
+def get_cube():
+    """프로세스당 한 번 적재, 이후에는 바뀐 월만 갱신"""
+    global _cube
+    max_age = getattr(settings, "TREND_CUBE_MAX_STALENESS", 900)
+    with _lock:
+        if _cube is None or time.monotonic() - _cube.loaded_at > max_age:
+            _cube = TrendCube().load()
+        else:
+            _cube.refresh()
+        return _cube
+
+
+# ---------------- 보고서 ----------------
+def _measure(arr, measure):
+    """(…, K) → (…) 측정값 하나. margin = 매출 - 매입"""
+    if measure == "margin":
+        return arr[..., MEASURES.index("sell")] - arr[..., MEASURES.index("buy")]
+    return arr[..., MEASURES.index(measure)]
+
+
+def _rollup(arr, step):
+    """월 축(0번)을 step 개월 단위로 합침"""
+    np = _np()
+    return np.add.reduceat(arr, list(range(0, arr.shape[0], step)), axis=0) if step > 1 else arr
+
+
+def _yoy(cur, prev):
+    return [round((c - p) / p * 100, 2) if p else None for c, p in zip(cur, prev)]
+
+
+def trend(end_month, months=12, by="writer", measure="sell", group="month",
+          writer_id=None, vendor=None, top=10):
+    """
+    end_month 까지 months 개월 추이 + 전년 같은 기간 대비 증감률
+    - by: writer | vendor | total
+    - group: month | quarter | year (months 는 단위의 배수여야 함)
+    """
+    cube = get_cube()
+    step = GROUPS[group]
+    cur = cube.window(end_month, months)
+    prev = cube.window(_label(_ordinal(end_month) - 12), months)
+
+    # 작성자/매입처 필터 (축 하나만 남김)
+    for axis, key, index in ((1, writer_id, cube.writer_index), (2, vendor, cube.vendor_index)):
+        if key is None:
+            continue
+        pick = [index[key]] if key in index else []
+        cur, prev = cur.take(pick, axis=axis), prev.take(pick, axis=axis)
+
+    cur, prev = _rollup(_measure(cur, measure), step), _rollup(_measure(prev, measure), step)
+    labels = [_label(_ordinal(end_month) - months + 1 + i) for i in range(0, months, step)]
+
+    total = cur.sum(axis=(1, 2))
+    prev_total = prev.sum(axis=(1, 2))
+    out = {
+        "periods": labels,
+        "group": group,
+        "measure": measure,
+        "total": [round(float(x)) for x in total],
+        "prev_total": [round(float(x)) for x in prev_total],
+        "yoy": _yoy(total.tolist(), prev_total.tolist()),
+        "sum": round(float(total.sum())),
+        "prev_sum": round(float(prev_total.sum())),
+        "series": [],
+    }
+    out["sum_yoy"] = _yoy([out["sum"]], [out["prev_sum"]])[0]
+
+    if by in ("writer", "vendor"):
+        axis, keys = (2, cube.writers) if by == "writer" else (1, cube.vendors)
+        per = cur.sum(axis=axis)           # (기간, 작성자|매입처)
+        per_prev = prev.sum(axis=axis)
+        if writer_id is not None and by == "writer":
+            keys = [writer_id]
+        elif vendor is not None and by == "vendor":
+            keys = [vendor]
+        sums = per.sum(axis=0)
+        prev_sums = per_prev.sum(axis=0)
+        order = [i for i in sums.argsort()[::-1][:top] if sums[i] or prev_sums[i]]
+        for i in order:
+            out["series"].append({
+                "key": keys[i],
+                "values": [round(float(x)) for x in per[:, i]],
+                "sum": round(float(sums[i])),
+                "prev_sum": round(float(prev_sums[i])),
+                "yoy": _yoy([float(sums[i])], [float(prev_sums[i])])[0],
+            })
+    return out
@@ -9,4 +9,5 @@ urlpatterns = [
     path("monthly-sales-contract/", views.monthly_sales_contract, name="monthly_sales_contract"),
     path("margin-static/", views.margin_static, name="margin_static"),
     path("monthly-purchase-invoice/", views.monthly_purchase_invoice, name="monthly_purchase_invoice"),
+    path("trend/", views.trend_report, name="trend"),
 ]
\ No newline at end of file
@@ -1,22 +1,34 @@
 # reports/views.py
 import json
 from decimal import Decimal, ROUND_HALF_UP
-from collections import defaultdict
 from datetime import date
 
-from django.db.models import Sum, Value, DecimalField, Q
-from django.db.models.functions import Coalesce
+from django.contrib.auth.decorators import login_required
+from django.db.models import Q
+from django.http import JsonResponse
 from django.shortcuts import render
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 
 from expenses.models import ContractItem, Contract
 
+from accounts.principal import get_principal
+
+from . import rollup, trendcube
+from .aggregates import daily_amounts, purchase_invoice_rows, summarize_daily, summarize_purchase_invoice
+
 
 TEN   = Decimal("0.10")
 ZERO  = Decimal("0")
 
 
+def _int_or_none(v):
+    try:
+        return int(v) if v else None
+    except (TypeError, ValueError):
+        return None
+
+
 def monthly_sales_contract(request):
     today = timezone.localdate()
     year  = int(request.GET.get("year")  or today.year)
@@ -25,11 +37,9 @@ def monthly_sales_contract(request):
     q_customer = (request.GET.get("q_customer") or "").strip()
     owner_id   = request.GET.get("owner") or None
 
-    qs = (
-        ContractItem.objects
-        .select_related("contract")
-        .filter(contract__created_at__year=year,
-                contract__created_at__month=month)
+    qs = ContractItem.objects.filter(
+        contract__created_at__year=year,
+        contract__created_at__month=month,
     )
     if q_customer:
         qs = qs.filter(contract__customer_company__icontains=q_customer)
@@ -42,47 +52,19 @@ def monthly_sales_contract(request):
         except (TypeError, ValueError):
             pass
 
-    daily = defaultdict(lambda: {"total": ZERO, "supply": ZERO, "vat": ZERO})
-    month_total  = ZERO
-    month_supply = ZERO
-    month_vat    = ZERO
-
-    for it in qs:
-        created_dt = it.contract.created_at
-        key = (created_dt.date() if hasattr(created_dt, "date") else created_dt).isoformat()
-
-        supply = (it.sell_total or ZERO)  # 세전 매출금액
-        if (it.vat_mode or "").lower() == "separate":
-            vat = supply * TEN
-            total = supply + vat
-        else:
-            vat   = ZERO
-            total = supply
-
-        daily[key]["supply"] += supply
-        daily[key]["vat"]    += vat
-        daily[key]["total"]  += total
-
-        month_supply += supply
-        month_vat    += vat
-        month_total  += total
-
-    daily_sorted = dict(sorted(
-        (k, {
-            "total":  int(v["total"]),
-            "supply": int(v["supply"]),
-            "vat":    int(v["vat"]),
-        })
-        for k, v in daily.items()
-    ))
+    # 매출처 검색이 없으면 일자별 집계 테이블(DailyRollup)에서 바로 읽음
+    if q_customer:
+        agg = daily_amounts(qs, "sell_total")  # 세전 매출금액 기준
+    else:
+        agg = summarize_daily(rollup.daily_rows(year, month, _int_or_none(owner_id), side="sell"))
 
     context = {
         "year": year,
         "month": month,
-        "daily_json": json.dumps(daily_sorted, ensure_ascii=False),
-        "month_total":  int(month_total),
-        "month_supply": int(month_supply),
-        "month_vat":    int(month_vat),
+        "daily_json": json.dumps(agg["daily"], ensure_ascii=False),
+        "month_total":  agg["month_total"],
+        "month_supply": agg["month_supply"],
+        "month_vat":    agg["month_vat"],
         "sales_people": get_user_model().objects.filter(is_active=True)
                            .order_by("first_name", "username"),
     }
@@ -104,11 +86,9 @@ def monthly_purchase_contract(request):
     q_customer = (request.GET.get("q_customer") or "").strip()
     owner_id   = request.GET.get("owner") or None
 
-    qs = (
-        ContractItem.objects
-        .select_related("contract")
-        .filter(contract__created_at__year=year,
-                contract__created_at__month=month)
+    qs = ContractItem.objects.filter(
+        contract__created_at__year=year,
+        contract__created_at__month=month,
     )
     if q_customer:
         qs = qs.filter(
@@ -123,44 +103,18 @@ def monthly_purchase_contract(request):
         except (TypeError, ValueError):
             pass
 
-    daily = defaultdict(lambda: {"total": ZERO, "supply": ZERO, "vat": ZERO})
-    month_total = month_supply = month_vat = ZERO
-
-    for it in qs:
-        day_key = it.contract.created_at.date().isoformat()
-
-        supply = (it.buy_total or ZERO)  # 세전 매입금액
-        if (it.vat_mode or "").lower() == "separate":
-            vat = supply * TEN
-            total = supply + vat
-        else:
-            vat   = ZERO
-            total = supply
-
-        daily[day_key]["supply"] += supply
-        daily[day_key]["vat"]    += vat
-        daily[day_key]["total"]  += total
-
-        month_supply += supply
-        month_vat    += vat
-        month_total  += total
-
-    daily_sorted = dict(sorted(
-        (k, {
-            "total":  int(v["total"]),
-            "supply": int(v["supply"]),
-            "vat":    int(v["vat"]),
-        })
-        for k, v in daily.items()
-    ))
+    if q_customer:
+        agg = daily_amounts(qs, "buy_total")  # 세전 매입금액 기준
+    else:
+        agg = summarize_daily(rollup.daily_rows(year, month, _int_or_none(owner_id), side="buy"))
 
     context = {
         "year": year,
         "month": month,
-        "daily_json": json.dumps(daily_sorted, ensure_ascii=False),
-        "month_total":  int(month_total),
-        "month_supply": int(month_supply),
-        "month_vat":    int(month_vat),
+        "daily_json": json.dumps(agg["daily"], ensure_ascii=False),
+        "month_total":  agg["month_total"],
+        "month_supply": agg["month_supply"],
+        "month_vat":    agg["month_vat"],
         "sales_people": get_user_model().objects.filter(is_active=True)
                            .order_by("first_name", "username"),
     }
@@ -171,9 +125,7 @@ def margin_static(request):
     """
     기간 내 등록된 계약 건별 매출/매입/마진/마진율 표 + 합계
     - 기준일: contract.created_at.date()
-    - 매출금액: sum(items.sell_total)
-    - 매입금액: sum(items.buy_total)
-    - 마진금액/마진율: 계약에 저장된 값(있으면) 사용, 없으면 즉석 계산
+    - 매출금액/매입금액/마진금액/마진율: 계약에 저장된 합계 칼럼(expenses.totals) 사용
     """
     today = timezone.localdate()
 
@@ -190,17 +142,7 @@ def margin_static(request):
     qs = (
         Contract.objects
         .filter(created_at__date__gte=date_from, created_at__date__lte=date_to)
-        .select_related("writer", "sales_owner")
-        .annotate(
-            sales_amount    = Coalesce(
-                Sum("items__sell_total"),
-                Value(0, output_field=DecimalField(max_digits=18, decimal_places=2))
-            ),
-            purchase_amount = Coalesce(
-                Sum("items__buy_total"),
-                Value(0, output_field=DecimalField(max_digits=18, decimal_places=2))
-            ),
-        )
+        .only("created_at", "sell_sum", "buy_sum", "profit", "margin_rate")
         .order_by("created_at", "id")
     )
 
@@ -220,22 +162,11 @@ def margin_static(request):
     rate_sum = ZERO
     rate_cnt = 0
 
-    has_profit_field = hasattr(Contract, "profit")
-    has_margin_field = hasattr(Contract, "margin_rate")
-
     for c in qs:
-        sales = c.sales_amount or ZERO
-        buy   = c.purchase_amount or ZERO
-
-        if has_profit_field and c.profit is not None:
-            margin_amt = Decimal(c.profit)
-        else:
-            margin_amt = (sales - buy)
-
-        if has_margin_field and c.margin_rate is not None:
-            margin_rate = Decimal(c.margin_rate)
-        else:
-            margin_rate = (margin_amt / sales * Decimal("100")) if sales else ZERO
+        sales       = c.sell_sum
+        buy         = c.buy_sum
+        margin_amt  = c.profit
+        margin_rate = c.margin_rate if c.margin_rate is not None else ZERO
 
         rows.append({
             "day":    c.created_at.date(),
@@ -272,7 +203,7 @@ def monthly_purchase_invoice(request):
     """
     매입처 월별 보고서
     - 필터: year/month (연도 2019~2025로 한정)
-    - 집계: 매입품목 단위로 (매입처→품목) 묶고, 매입처별 소계 + 전체 합계
+    - 집계: (매입처, 품목)별로 SQL 에서 묶고(같은 품목 여러 줄은 한 행), 매입처별 소계 + 전체 합계
     - VAT별도(separate): 공급가액 = 합계/1.1, 부가세 = 차액
       면세(exempt): 공급가액 = 합계, 부가세 = 0
     """
@@ -289,72 +220,78 @@ def monthly_purchase_invoice(request):
     start = date(year, month, 1)
     end   = date(year + (1 if month == 12 else 0), (month % 12) + 1, 1)
 
-    items = (
-        ContractItem.objects
-        .select_related("contract")
-        .filter(contract__created_at__date__gte=start,
-                contract__created_at__date__lt=end)
+    items = ContractItem.objects.filter(
+        contract__created_at__date__gte=start,
+        contract__created_at__date__lt=end,
     )
 
-    def split_supply_vat(total, vat_mode):
-        total = Decimal(total or 0)
-        if (vat_mode or "").lower() == "separate":
-            supply = total / Decimal("1.1")
-            vat    = total - supply
-        else:
-            supply = total
-            vat    = ZERO
-        return supply, vat
-
-    groups = defaultdict(lambda: {
-        "rows": [],
-        "subtotal": {"qty": 0, "total": ZERO, "supply": ZERO, "vat": ZERO},
-    })
-    sum_total  = ZERO
-    sum_supply = ZERO
-    sum_vat    = ZERO
-
-    for it in items:
-        vendor = (it.vendor or "").strip() or "(미지정)"
-        qty    = it.qty or 0
-        total  = Decimal(it.buy_total or 0)
-        supply, vat = split_supply_vat(total, it.vat_mode)
-
-        g = groups[vendor]
-        g["rows"].append({
-            "name":   it.name or "",
-            "qty":    qty,
-            "total":  total,
-            "supply": supply,
-            "vat":    vat,
-        })
-        g["subtotal"]["qty"]    += qty
-        g["subtotal"]["total"]  += total
-        g["subtotal"]["supply"] += supply
-        g["subtotal"]["vat"]    += vat
-
-        sum_total  += total
-        sum_supply += supply
-        sum_vat    += vat
-
-    # 출력용 리스트 (매입처명 정렬 + 번호)
-    groups_out = []
-    for i, vendor in enumerate(sorted(groups.keys()), start=1):
-        g = groups[vendor]
-        groups_out.append({
-            "no": i,
-            "vendor": vendor,
-            "rows": g["rows"],
-            "subtotal": g["subtotal"],
-        })
+    # (매입처, 품목)별 GROUP BY 한 번 → 매입처 소계/전체 합계는 그 행으로 계산
+    invoice = summarize_purchase_invoice(purchase_invoice_rows(items))
 
     context = {
         "year": year,
         "month": month,
-        "groups": groups_out,
-        "sum_total":  int(sum_total),
-        "sum_supply": int(sum_supply),
-        "sum_vat":    int(sum_vat),
+        **invoice,
         "YEARS": list(range(2019, 2026)),
     }
-    return render(request, "monthly_purchase_invoice.html", context)
\ No newline at end of file
+    return render(request, "monthly_purchase_invoice.html", context)
+
+
+@login_required
+def trend_report(request):
+    """
+    다년도 추이 (JSON) — reports.trendcube 메모리 큐브에서 계산
+    - end=YYYY-MM (기본: 이번 달), months=12|24|36 (1~120)
+    - by=writer|vendor|total, measure=sell|buy|margin|sell_vat|buy_vat
+    - group=month|quarter|year, writer=<id>, vendor=<매입처명>, top=N (기본 10, 최대 50)
+    - 각 기간/항목별 전년 같은 기간 대비 증감률(yoy, %)
+    """
+    if not get_principal(request.user).is_manager:
+        return JsonResponse({"error": "권한이 없습니다."}, status=403)
+
+    g = request.GET
+    end = g.get("end") or trendcube.month_of(timezone.now())
+    months = _int_or_none(g.get("months")) or 12
+    by = g.get("by") or "writer"
+    measure = g.get("measure") or "sell"
+    group = g.get("group") or "month"
+    top = min(_int_or_none(g.get("top")) or 10, 50)
+
+    errors = []
+    try:
+        year, month = (int(x) for x in end.split("-"))
+        if not (1 <= month <= 12 and 2000 <= year <= 2100):
+            raise ValueError
+        end = f"{year:04d}-{month:02d}"
+    except ValueError:
+        errors.append("end 는 YYYY-MM 형식이어야 합니다.")
+    if by not in ("writer", "vendor", "total"):
+        errors.append("by 는 writer/vendor/total 중 하나입니다.")
+    if measure not in trendcube.MEASURES + ("margin",):
+        errors.append("measure 값이 올바르지 않습니다.")
+    if group not in trendcube.GROUPS:
+        errors.append("group 은 month/quarter/year 중 하나입니다.")
+    elif not (1 <= months <= 120) or months % trendcube.GROUPS[group]:
+        errors.append("months 는 1~120 이고 group 단위의 배수여야 합니다.")
+    if errors:
+        return JsonResponse({"errors": errors}, status=400)
+
+    try:
+        data = trendcube.trend(
+            end, months=months, by=by, measure=measure, group=group,
+            writer_id=_int_or_none(g.get("writer")), vendor=(g.get("vendor") or "").strip() or None, top=top,
+        )
+    except trendcube.CubeUnavailable as e:
+        return JsonResponse({"error": str(e)}, status=503)
+
+    if by == "writer":
+        names = {
+            u.pk: (u.first_name or u.username)
+            for u in get_user_model().objects.filter(pk__in=[s["key"] for s in data["series"]])
+        }
+        for s in data["series"]:
+            s["label"] = names.get(s["key"], str(s["key"]))
+    else:
+        for s in data["series"]:
+            s["label"] = s["key"]
+    return JsonResponse(data)